@@ -4,21 +4,13 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect, render
 
-from decimal import Decimal
-
-from apps.inventory.services import ProductService
+from apps.inventory.services import InventoryStatsService, PayablesAgingService, ProductService, with_precio_iva
 from apps.sales.services import SaleService
 
 product_service = ProductService()
 sale_service = SaleService()
-
-
-def _attach_precio_iva(productos):
-    iva_factor = Decimal("1.15")
-    for p in productos:
-        base = p.costo_unitario or Decimal(0)
-        p.precio_iva = (base * iva_factor).quantize(Decimal("0.01"))
-    return productos
+payables_aging = PayablesAgingService()
+inventory_stats = InventoryStatsService()
 
 
 @login_required
@@ -31,28 +23,19 @@ def home(request):
 
 @login_required
 def inventario(request):
-    products = list(product_service.list_products(include_deleted=True))
-    _attach_precio_iva(products)
-    total_stock = sum(p.cantidad or 0 for p in products)
-    stock_bajo = len([p for p in products if (p.cantidad or 0) < 10])
-    categorias = sorted({p.tipo_armazon for p in products if p.tipo_armazon})
-    marcas = sorted({p.marca for p in products if p.marca})
-    stats = {
-        "total_productos": len(products),
-        "total_stock": total_stock,
-        "stock_bajo": stock_bajo,
-        "categorias": len(categorias),
-    }
+    products = with_precio_iva(product_service.list_products(include_deleted=True))
+    stats = inventory_stats.summary(include_deleted=True)
     return render(
         request,
         "inventario.html",
         {
-        "productos": products,
-        "stats": stats,
-        "categorias": categorias,
-        "marcas": marcas,
-    },
-)
+            "productos": products,
+            "stats": stats,
+            "categorias": inventory_stats.facet_values("tipo_armazon", include_deleted=True),
+            "marcas": inventory_stats.facet_values("marca", include_deleted=True),
+            "umbral_stock_bajo": stats["umbral_stock_bajo"],
+        },
+    )
 
 
 @login_required
@@ -73,15 +56,23 @@ def historial_ventas_redirect(request):
 
 @login_required
 def dashboard(request):
-    productos = list(product_service.list_products(include_deleted=False))
-    _attach_precio_iva(productos)
+    stats = inventory_stats.summary()
+    ventas_hoy = sale_service.daily_summary()
+    # Las cuentas por pagar sólo se muestran (y se calculan) para administradores.
+    pagos = payables_aging.aging() if request.session.get("rol") == "Administrador" else None
     ventas = list(sale_service.get_all_sales_with_details()[:5])
     return render(
         request,
         "dashboard.html",
         {
-            "productos_en_stock": len(productos),
-            "total_ventas_hoy": 0,
+            "productos_en_stock": stats["total_productos"],
+            "stock_total_productos": stats["total_stock"],
+            "umbral_stock_bajo": stats["umbral_stock_bajo"],
+            "total_ventas_hoy": ventas_hoy["total"],
+            "productos_vendidos_hoy": ventas_hoy["unidades"],
             "ventas_recientes": ventas,
+            "pagos_pendientes": pagos["total"] if pagos else 0,
+            "compras_con_saldo": pagos["compras"] if pagos else 0,
+            "cuentas_por_pagar": pagos,
         },
     )
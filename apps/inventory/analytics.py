@@ -0,0 +1,239 @@
+"""
+Analítica de rotación de productos: más vendidos, velocidad de venta, días de
+cobertura y sugerencias de reposición por proveedor.
+
+Las ventas diarias por producto se traen con una sola consulta agrupada
+(``detalle_ventas`` x día) y se vuelcan a una matriz NumPy productos x días;
+todos los cálculos posteriores son operaciones vectorizadas sobre esa matriz,
+sin bucles por producto.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.sales.models import SaleDetail
+
+from .models import Product
+
+DEFAULT_DIAS = 90
+DEFAULT_VENTANA = 28
+DEFAULT_COBERTURA = 30
+DEFAULT_PLAZO_ENTREGA = 7
+TENDENCIA_VENTANA = 7
+
+
+def _start_of_day(value: date) -> datetime:
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """
+    Media móvil por fila (unidades/día) sobre ``window`` días, con sumas
+    acumuladas: columna ``j`` = promedio de los días ``j .. j + window - 1``.
+    """
+    window = max(min(window, matrix.shape[1]), 1)
+    acumulado = np.cumsum(matrix, axis=1, dtype=np.float64)
+    acumulado = np.concatenate([np.zeros((matrix.shape[0], 1)), acumulado], axis=1)
+    return (acumulado[:, window:] - acumulado[:, :-window]) / window
+
+
+def velocity_metrics(
+    matrix: np.ndarray, stock: np.ndarray, ventana: int, cobertura: int, plazo_entrega: int
+) -> dict:
+    """
+    Métricas por producto a partir de la matriz productos x días y el stock:
+    unidades del período, velocidad (media móvil de ``ventana`` días al cierre
+    y de los últimos 7 días), días de cobertura y unidades sugeridas.
+    """
+    if not matrix.shape[0]:
+        vacio = np.zeros(0)
+        return {
+            "unidades": vacio,
+            "velocidad": vacio,
+            "velocidad_reciente": vacio,
+            "dias_cobertura": vacio,
+            "sugerido": np.zeros(0, dtype=np.int64),
+        }
+    velocidad = rolling_mean(matrix, ventana)[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dias_cobertura = np.where(velocidad > 0, stock / velocidad, np.inf)
+    return {
+        "unidades": matrix.sum(axis=1),
+        "velocidad": velocidad,
+        "velocidad_reciente": rolling_mean(matrix, TENDENCIA_VENTANA)[:, -1],
+        "dias_cobertura": dias_cobertura,
+        "sugerido": np.ceil(np.maximum(velocidad * (plazo_entrega + cobertura) - stock, 0)).astype(np.int64),
+    }
+
+
+@dataclass
+class VelocityReport:
+    """
+    Resultado del análisis; los arreglos están alineados con ``productos``.
+    ``dias_cobertura`` es ``inf`` para productos sin ventas en la ventana.
+    """
+
+    desde: date
+    hasta: date
+    ventana: int
+    productos: list
+    unidades: np.ndarray
+    velocidad: np.ndarray
+    velocidad_reciente: np.ndarray
+    stock: np.ndarray
+    dias_cobertura: np.ndarray
+    sugerido: np.ndarray
+
+
+class ProductVelocityService:
+    def daily_matrix(self, producto_ids: np.ndarray, desde: date, dias: int) -> np.ndarray:
+        """
+        Unidades vendidas por producto (filas, en el orden de ``producto_ids``,
+        que debe venir ordenado) y día (columnas, desde ``desde``).
+        """
+        rows = (
+            SaleDetail.objects.filter(
+                venta__fecha_venta__gte=_start_of_day(desde),
+                venta__fecha_venta__lt=_start_of_day(desde + timedelta(days=dias)),
+            )
+            .annotate(dia=TruncDate("venta__fecha_venta"))
+            .values("producto_id", "dia")
+            .annotate(unidades=Sum("cantidad"))
+            .order_by()
+            .values_list("producto_id", "dia", "unidades")
+        )
+        matrix = np.zeros((len(producto_ids), dias), dtype=np.float64)
+        datos = list(rows)
+        if not datos or not len(producto_ids):
+            return matrix
+
+        ids = np.fromiter((row[0] or 0 for row in datos), dtype=np.int64, count=len(datos))
+        columnas = np.fromiter(((row[1] - desde).days for row in datos), dtype=np.int64, count=len(datos))
+        unidades = np.fromiter((row[2] or 0 for row in datos), dtype=np.float64, count=len(datos))
+
+        # Ventas de productos fuera del análisis (inactivos o borrados) se descartan.
+        filas = np.searchsorted(producto_ids, ids)
+        filas = np.minimum(filas, len(producto_ids) - 1)
+        validas = (producto_ids[filas] == ids) & (columnas >= 0) & (columnas < dias)
+        np.add.at(matrix, (filas[validas], columnas[validas]), unidades[validas])
+        return matrix
+
+    def compute(
+        self,
+        dias: int = DEFAULT_DIAS,
+        ventana: int = DEFAULT_VENTANA,
+        cobertura: int = DEFAULT_COBERTURA,
+        plazo_entrega: int = DEFAULT_PLAZO_ENTREGA,
+        hasta: Optional[date] = None,
+    ) -> VelocityReport:
+        """
+        Analiza los últimos ``dias`` días hasta ``hasta`` (hoy por defecto).
+
+        - velocidad: media móvil de ``ventana`` días al cierre del período.
+        - días de cobertura: ``Product.cantidad`` / velocidad.
+        - sugerido: unidades para cubrir ``plazo_entrega + cobertura`` días a
+          la velocidad actual, descontando el stock.
+        """
+        hasta = hasta or timezone.localdate()
+        desde = hasta - timedelta(days=dias - 1)
+        productos = list(
+            Product.objects.filter(estado=True)
+            .order_by("producto_id")
+            .values(
+                "producto_id",
+                "nombre",
+                "codigo",
+                "marca",
+                "tipo_armazon",
+                "cantidad",
+                "costo_unitario",
+                "proveedor_id",
+                "proveedor__razon_social",
+            )
+        )
+        producto_ids = np.fromiter((p["producto_id"] for p in productos), dtype=np.int64, count=len(productos))
+        matrix = self.daily_matrix(producto_ids, desde, dias)
+
+        stock = np.fromiter((max(p["cantidad"] or 0, 0) for p in productos), dtype=np.float64, count=len(productos))
+        metricas = velocity_metrics(matrix, stock, ventana, cobertura, plazo_entrega)
+
+        return VelocityReport(
+            desde=desde,
+            hasta=hasta,
+            ventana=min(ventana, dias),
+            productos=productos,
+            stock=stock,
+            **metricas,
+        )
+
+    def _serialize(self, report: VelocityReport, idx: int) -> dict:
+        producto = report.productos[idx]
+        cobertura = report.dias_cobertura[idx]
+        return {
+            "producto_id": producto["producto_id"],
+            "nombre": producto["nombre"],
+            "codigo": producto["codigo"],
+            "marca": producto["marca"],
+            "tipo_armazon": producto["tipo_armazon"],
+            "stock": int(report.stock[idx]),
+            "unidades": int(report.unidades[idx]),
+            "velocidad": round(float(report.velocidad[idx]), 3),
+            "velocidad_reciente": round(float(report.velocidad_reciente[idx]), 3),
+            "dias_cobertura": round(float(cobertura), 1) if np.isfinite(cobertura) else None,
+            "sugerido": int(report.sugerido[idx]),
+        }
+
+    def top_sellers(self, report: VelocityReport, limit: int = 20) -> list:
+        """Productos con más unidades vendidas en el período (desempate por id)."""
+        vendidos = np.flatnonzero(report.unidades > 0)
+        orden = vendidos[np.lexsort((vendidos, -report.unidades[vendidos]))][:limit]
+        return [self._serialize(report, int(idx)) for idx in orden]
+
+    def reorder_by_supplier(self, report: VelocityReport) -> list:
+        """
+        Sugerencias de reposición agrupadas por proveedor, ordenadas por costo
+        estimado; dentro de cada proveedor, primero lo que se agota antes.
+        """
+        if not report.productos:
+            return []
+        proveedores = np.fromiter(
+            (p["proveedor_id"] or 0 for p in report.productos), dtype=np.int64, count=len(report.productos)
+        )
+        costos = np.fromiter(
+            (float(p["costo_unitario"] or 0) for p in report.productos), dtype=np.float64, count=len(report.productos)
+        )
+        pendientes = np.flatnonzero(report.sugerido > 0)
+        if not len(pendientes):
+            return []
+
+        claves, grupo = np.unique(proveedores[pendientes], return_inverse=True)
+        unidades = np.bincount(grupo, weights=report.sugerido[pendientes], minlength=len(claves))
+        valor = np.bincount(grupo, weights=report.sugerido[pendientes] * costos[pendientes], minlength=len(claves))
+        orden_productos = pendientes[np.lexsort((pendientes, report.dias_cobertura[pendientes], grupo))]
+        grupo_ordenado = np.searchsorted(claves, proveedores[orden_productos])
+
+        nombres = {
+            p["proveedor_id"]: p["proveedor__razon_social"] for p in report.productos if p["proveedor_id"]
+        }
+        resultado = []
+        for g in np.argsort(-valor, kind="stable"):
+            miembros = orden_productos[grupo_ordenado == g]
+            proveedor_id = int(claves[g]) or None
+            resultado.append(
+                {
+                    "proveedor_id": proveedor_id,
+                    "proveedor": nombres.get(proveedor_id) or "Sin proveedor",
+                    "productos": [self._serialize(report, int(idx)) for idx in miembros],
+                    "unidades_sugeridas": int(unidades[g]),
+                    "costo_estimado": round(float(valor[g]), 2),
+                }
+            )
+        return resultado
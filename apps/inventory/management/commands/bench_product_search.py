@@ -0,0 +1,106 @@
+"""
+Mide la latencia de ProductSearchService.search con catálogos sintéticos de
+distintos tamaños (por defecto 10.000 y 100.000 productos).
+
+Los productos se insertan dentro de una transacción que se revierte al final,
+así que puede ejecutarse contra la base de datos real. Conviene haber aplicado
+antes la migración de índices (inventory.0002_product_search_indexes).
+
+    python manage.py bench_product_search --sizes 10000 100000 --repeat 20
+"""
+
+from __future__ import annotations
+
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.inventory.models import Product
+from apps.inventory.services import ProductSearchService
+
+MARCAS = ["Ray-Ban", "Oakley", "Vogue", "Essilor", "Hoya", "Zeiss", "Rodenstock", "Carrera", "Polaroid", "Nike"]
+TIPOS = ["Armazón metálico", "Armazón acetato", "Lente monofocal", "Lente progresivo", "Lente de contacto", "Estuche", "Líquido"]
+COLORES = ["negro", "carey", "azul", "dorado", "plateado", "rojo", "transparente"]
+DISTRIBUIDORES = ["Óptica Andina S.A.", "Distribuidora Visión", "Lentes del Pacífico", "Importadora Quito"]
+
+# (etiqueta, consulta): prefijo de código, prefijo de nombre, varias
+# palabras, subcadena poco selectiva y un término sin resultados.
+QUERIES = [
+    ("código", "BX-0042"),
+    ("prefijo", "Ray"),
+    ("palabras", "progresivo azul"),
+    ("subcadena", "ac"),
+    ("sin resultados", "zzzz"),
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _product(idx: int, rng: random.Random) -> Product:
+    marca = rng.choice(MARCAS)
+    tipo = rng.choice(TIPOS)
+    return Product(
+        nombre=f"{marca} {tipo} {rng.choice(COLORES)} {idx}",
+        codigo=f"BX-{idx:06d}",
+        marca=marca,
+        tipo_armazon=tipo,
+        distribuidor=rng.choice(DISTRIBUIDORES),
+        cantidad=rng.randint(0, 200),
+        costo_unitario=Decimal(rng.randint(500, 20000)) / 100,
+        estado=True,
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark de latencia de la búsqueda de productos con 10k/100k productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["sizes"])
+        repeat = max(options["repeat"], 1)
+        service = ProductSearchService()
+        rng = random.Random(42)
+        rows = []
+        try:
+            with transaction.atomic():
+                inserted = 0
+                for size in sizes:
+                    start = time.perf_counter()
+                    while inserted < size:
+                        batch = range(inserted, min(size, inserted + options["batch_size"]))
+                        Product.objects.bulk_create([_product(idx, rng) for idx in batch])
+                        inserted = batch.stop
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"ANALYZE {Product._meta.db_table}")
+                    self.stdout.write(f"{size} productos cargados en {time.perf_counter() - start:.1f} s")
+
+                    for label, query in QUERIES:
+                        timings = []
+                        found = 0
+                        for _ in range(repeat):
+                            start = time.perf_counter()
+                            page, _cursor = service.search(query, limit=options["limit"])
+                            timings.append((time.perf_counter() - start) * 1000)
+                            found = len(page)
+                        timings.sort()
+                        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                        rows.append((size, label, query, found, statistics.median(timings), p95))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"motor: {connection.vendor}")
+        self.stdout.write(f"{'productos':>9} {'caso':<15} {'consulta':<18} {'filas':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for size, label, query, found, p50, p95 in rows:
+            self.stdout.write(f"{size:>9} {label:<15} {query:<18} {found:>5} {p50:>8.2f} {p95:>8.2f}")
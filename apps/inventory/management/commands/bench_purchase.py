@@ -0,0 +1,120 @@
+"""
+Compara el registro de compras por línea (flujo heredado) con el registro en
+bloque de PurchaseService.create_purchase, midiendo consultas SQL y latencia.
+
+El registro en bloque debe ejecutar el mismo número de consultas sin importar
+cuántas líneas tenga la compra; si no es así el comando termina con error, por
+lo que sirve como verificación en CI. Todo se revierte al final.
+
+    python manage.py bench_purchase --sizes 1 10 100 --repeat 5
+"""
+
+from __future__ import annotations
+
+import math
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.inventory.models import Compra, CompraDetalle, MovimientoStock, Product, Proveedor
+from apps.inventory.services import DETAIL_BATCH_SIZE, PurchaseService
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_purchase(service: PurchaseService, header: dict, detalles) -> None:
+    """Reproduce el patrón anterior: totales dos veces y 3 consultas por línea."""
+    proveedor = Proveedor.objects.filter(proveedor_id=header.get("proveedor_id")).first()
+    with transaction.atomic():
+        compra = Compra.objects.create(proveedor=proveedor, **service._compute_totals(header, detalles)["header"])
+        for det_payload in service._compute_totals(header, detalles)["detalles"]:
+            producto = Product.objects.filter(producto_id=det_payload.pop("producto_id")).first()
+            detalle = CompraDetalle.objects.create(compra=compra, producto=producto, **det_payload)
+            producto.cantidad = (producto.cantidad or 0) + detalle.cantidad
+            producto.save()
+
+
+def _insert_batches(model, size: int) -> int:
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    batch = min(DETAIL_BATCH_SIZE, connection.ops.bulk_batch_size(fields, [None] * size) or size)
+    return math.ceil(size / max(batch, 1))
+
+
+def _detail_batches(size: int) -> int:
+    # Detalles de la compra y movimientos del libro de stock: uno por línea.
+    return _insert_batches(CompraDetalle, size) + _insert_batches(MovimientoStock, size)
+
+
+class Command(BaseCommand):
+    help = "Benchmark de registro de compras por línea vs. en bloque (consultas y latencia)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[1, 10, 100])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"]
+        repeat = max(options["repeat"], 1)
+        service = PurchaseService()
+        rows = []
+        try:
+            with transaction.atomic():
+                proveedor = Proveedor.objects.create(
+                    codigo_proveedor="BENCH-COMPRA",
+                    razon_social="bench-compra",
+                    rut="bench-compra",
+                )
+                products = [
+                    Product.objects.create(nombre=f"bench-compra-{idx}", cantidad=0, estado=True)
+                    for idx in range(max(sizes))
+                ]
+                header = {"proveedor_id": proveedor.proveedor_id, "abono": Decimal("0")}
+                for size in sizes:
+                    detalles = [
+                        {
+                            "producto_id": p.producto_id,
+                            "cantidad": Decimal(2),
+                            "precio_unitario": Decimal("10.00"),
+                            "tarifa_iva": Decimal("0.15"),
+                            "descuento": Decimal(0),
+                        }
+                        for p in products[:size]
+                    ]
+                    for label, runner in (
+                        ("por línea", lambda: _legacy_purchase(service, header, [dict(d) for d in detalles])),
+                        ("en bloque", lambda: service.create_purchase(header, [dict(d) for d in detalles])),
+                    ):
+                        timings = []
+                        queries = 0
+                        for _ in range(repeat):
+                            with CaptureQueriesContext(connection) as ctx:
+                                start = time.perf_counter()
+                                runner()
+                                timings.append((time.perf_counter() - start) * 1000)
+                            queries = len(ctx.captured_queries)
+                        rows.append((size, label, queries, statistics.median(timings)))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'líneas':>7} {'modo':<10} {'consultas':>9} {'mediana ms':>11}")
+        for size, label, queries, median_ms in rows:
+            self.stdout.write(f"{size:>7} {label:<10} {queries:>9} {median_ms:>11.2f}")
+
+        # Descontando los lotes de los INSERT por línea (el backend limita los
+        # parámetros por sentencia), el número de consultas debe ser constante.
+        bulk_counts = {
+            queries - _detail_batches(size)
+            for size, label, queries, _ms in rows
+            if label == "en bloque"
+        }
+        if len(bulk_counts) > 1:
+            raise CommandError(
+                f"El registro en bloque no usa un número fijo de consultas: {sorted(bulk_counts)}"
+            )
@@ -0,0 +1,173 @@
+"""
+Benchmark de la analítica de rotación (apps.inventory.analytics) sobre un año
+sintético de ventas: mide la consulta de series diarias, el cálculo
+vectorizado con NumPy y, como referencia, el mismo cálculo con bucles en
+Python, verificando que ambos coincidan. Todo se revierte al final.
+
+    python manage.py bench_velocity --products 2000 --lines-per-day 300
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import LegacyUser
+from apps.inventory.analytics import (
+    DEFAULT_COBERTURA,
+    DEFAULT_PLAZO_ENTREGA,
+    ProductVelocityService,
+    velocity_metrics,
+)
+from apps.inventory.models import Product, Proveedor
+from apps.sales.models import Sale, SaleDetail
+
+BATCH_SIZE = 500
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _python_velocity(productos, rows, desde, dias, ventana):
+    """Cálculo equivalente con diccionarios y bucles, como referencia."""
+    series = {p["producto_id"]: [0.0] * dias for p in productos}
+    for producto_id, dia, unidades in rows:
+        serie = series.get(producto_id)
+        if serie is not None:
+            serie[(dia - desde).days] += unidades or 0
+    resultado = []
+    for p in productos:
+        serie = series[p["producto_id"]]
+        medias = [sum(serie[j : j + ventana]) / ventana for j in range(dias - ventana + 1)]
+        velocidad = medias[-1]
+        stock = max(p["cantidad"] or 0, 0)
+        cobertura = stock / velocidad if velocidad > 0 else math.inf
+        sugerido = math.ceil(max(velocidad * (DEFAULT_PLAZO_ENTREGA + DEFAULT_COBERTURA) - stock, 0))
+        resultado.append((velocidad, cobertura, sugerido))
+    return resultado
+
+
+class Command(BaseCommand):
+    help = "Benchmark de velocidad de venta y reposición (NumPy vs. bucles en Python)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--suppliers", type=int, default=25)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--lines-per-day", type=int, default=300)
+        parser.add_argument("--ventana", type=int, default=28)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        usuario = LegacyUser.objects.order_by("usuario_id").first()
+        if usuario is None:
+            raise CommandError("Se necesita al menos un usuario en la tabla usuarios.")
+        rng = random.Random(options["seed"])
+        dias, ventana = options["days"], options["ventana"]
+        service = ProductVelocityService()
+        hoy = timezone.localdate()
+        timings = {}
+
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                proveedores = [
+                    Proveedor.objects.create(
+                        codigo_proveedor=f"BENCH-VEL-{idx}", razon_social=f"bench-vel-{idx}", rut=f"bench-vel-{idx}"
+                    )
+                    for idx in range(options["suppliers"])
+                ]
+                productos = Product.objects.bulk_create(
+                    [
+                        Product(
+                            nombre=f"bench-vel-{idx}",
+                            cantidad=rng.randint(0, 120),
+                            costo_unitario=Decimal(rng.randint(5, 80)),
+                            proveedor=rng.choice(proveedores),
+                            estado=True,
+                        )
+                        for idx in range(options["products"])
+                    ],
+                    batch_size=BATCH_SIZE,
+                )
+                # Popularidad sesgada (Zipf aproximado) para que haya "más vendidos".
+                pesos = [1 / (rank + 1) for rank in range(len(productos))]
+                ventas = Sale.objects.bulk_create(
+                    [
+                        Sale(
+                            usuario=usuario,
+                            total=0,
+                            estado="completada",
+                            fecha_venta=timezone.now() - timedelta(days=offset),
+                        )
+                        for offset in range(dias)
+                    ],
+                    batch_size=BATCH_SIZE,
+                )
+                detalles = []
+                for venta in ventas:
+                    for producto in rng.choices(productos, weights=pesos, k=options["lines_per_day"]):
+                        detalles.append(
+                            SaleDetail(
+                                venta=venta,
+                                producto=producto,
+                                cantidad=rng.randint(1, 3),
+                                precio_unitario=1,
+                                subtotal=1,
+                            )
+                        )
+                SaleDetail.objects.bulk_create(detalles, batch_size=BATCH_SIZE)
+                timings["datos sintéticos"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                report = service.compute(dias=dias, ventana=ventana, hasta=hoy)
+                timings["total (consultas + cálculo)"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                producto_ids = np.fromiter((p["producto_id"] for p in report.productos), dtype=np.int64)
+                matrix = service.daily_matrix(producto_ids, report.desde, dias)
+                timings["consulta de series + matriz"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                velocity_metrics(matrix, report.stock, ventana, DEFAULT_COBERTURA, DEFAULT_PLAZO_ENTREGA)
+                timings["métricas NumPy"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                top = service.top_sellers(report, 20)
+                reposicion = service.reorder_by_supplier(report)
+                timings["top + reposición NumPy"] = time.perf_counter() - start
+
+                # La referencia parte de las mismas filas agrupadas, para
+                # comparar sólo el cálculo.
+                rows = [
+                    (int(producto_ids[i]), report.desde + timedelta(days=int(j)), matrix[i, j])
+                    for i, j in zip(*np.nonzero(matrix))
+                ]
+                start = time.perf_counter()
+                esperado = _python_velocity(report.productos, rows, report.desde, dias, min(ventana, dias))
+                timings["métricas con bucles Python"] = time.perf_counter() - start
+
+                velocidad = np.array([v for v, _c, _s in esperado])
+                sugerido = np.array([s for _v, _c, s in esperado])
+                if not np.allclose(velocidad, report.velocidad) or not np.array_equal(sugerido, report.sugerido):
+                    raise CommandError("El cálculo vectorizado no coincide con la referencia en Python.")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(
+            f"{options['products']} productos, {dias} días, {len(detalles)} líneas de venta, "
+            f"{len(reposicion)} proveedores con reposición, top 1: {top[0]['nombre'] if top else '-'}"
+        )
+        self.stdout.write(f"{'fase':<32} {'ms':>10}")
+        for fase, segundos in timings.items():
+            self.stdout.write(f"{fase:<32} {segundos * 1000:>10.1f}")
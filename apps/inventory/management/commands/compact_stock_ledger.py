@@ -0,0 +1,47 @@
+"""
+Compacta el libro de movimientos de stock: escribe un snapshot por producto
+con movimientos desde la compactación anterior, para que el saldo a una fecha
+sólo tenga que sumar los movimientos recientes. Pensado para ejecutarse de
+forma periódica (cron), por ejemplo cada noche:
+
+    python manage.py compact_stock_ledger
+
+La migración 0008 registra los saldos de apertura al desplegar el libro;
+``--seed`` vuelve a cuadrarlo con ``Product.cantidad`` (movimientos de
+apertura por la diferencia) si hiciera falta.
+"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import StockLedgerService
+
+
+class Command(BaseCommand):
+    help = "Compacta el libro de movimientos de stock en snapshots por producto."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            action="store_true",
+            help="Antes de compactar, cuadra el libro con Product.cantidad mediante movimientos de apertura.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        ledger = StockLedgerService()
+        batch_size = max(options["batch_size"], 1)
+
+        if options["seed"]:
+            start = time.perf_counter()
+            seeded = ledger.seed_from_products(batch_size=batch_size)
+            self.stdout.write(f"Movimientos de apertura: {seeded} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+        start = time.perf_counter()
+        created = ledger.compact(batch_size=batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(f"Snapshots creados: {created} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        )
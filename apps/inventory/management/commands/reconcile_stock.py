@@ -0,0 +1,119 @@
+"""
+Verifica que ``productos.cantidad`` coincida con lo comprado menos lo vendido
+más lo cargado a mano (``compras_detalle`` - ``detalle_ventas`` + movimientos
+``inicial`` y ``ajuste`` del libro de stock) y, opcionalmente, lo corrige.
+
+Las diferencias se calculan con una sola consulta agrupada y se escriben en
+CSV a medida que llegan del cursor, así que la memoria no crece con el número
+de productos ni de líneas de detalle. Con ``--repair`` las correcciones se
+aplican después, por lotes, cada uno en su propia transacción.
+
+    python manage.py reconcile_stock --output diferencias.csv
+    python manage.py reconcile_stock --output diferencias.csv --repair --batch-size 1000
+
+Los productos con saldo de ``apertura`` en el libro (stock anterior al libro,
+de origen desconocido) se informan con ``reparable`` en falso y ``--repair``
+no los toca.
+"""
+
+from __future__ import annotations
+
+import csv
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import StockReconciliationService
+
+CSV_HEADERS = [
+    "producto_id",
+    "codigo",
+    "nombre",
+    "cantidad",
+    "comprado",
+    "vendido",
+    "manual",
+    "esperado",
+    "diferencia",
+    "reparable",
+]
+
+
+class Command(BaseCommand):
+    help = "Concilia Product.cantidad con compras y ventas; exporta diferencias a CSV y puede repararlas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="-", help="Archivo CSV de diferencias ('-' para stdout).")
+        parser.add_argument("--repair", action="store_true", help="Corrige Product.cantidad al valor esperado.")
+        parser.add_argument(
+            "--allow-negative",
+            action="store_true",
+            help="Repara también productos cuyo stock esperado es negativo (por defecto se omiten).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Productos por UPDATE al reparar.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Filas por lectura del cursor.")
+
+    @contextmanager
+    def _open_output(self, path: str):
+        if path == "-":
+            yield sys.stdout
+        else:
+            with open(path, "w", encoding="utf-8", newline="") as handle:
+                yield handle
+
+    def handle(self, *args, **options):
+        service = StockReconciliationService()
+        batch_size = max(options["batch_size"], 1)
+        # El informe va a stderr para no mezclarse con el CSV cuando sale por stdout.
+        report = self.stderr
+
+        found = 0
+        pending = 0
+        skipped_opening = 0
+        # Las correcciones se guardan en un temporal (no en memoria) y se
+        # aplican al terminar la lectura, sin escribir sobre ``productos``
+        # mientras el cursor sigue abierto.
+        with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as spool:
+            start = time.perf_counter()
+            with self._open_output(options["output"]) as output:
+                writer = csv.writer(output)
+                writer.writerow(CSV_HEADERS)
+                spool_writer = csv.writer(spool)
+                for row in service.iter_discrepancies(chunk_size=max(options["chunk_size"], 1)):
+                    writer.writerow([row[header] for header in CSV_HEADERS])
+                    found += 1
+                    if not row["reparable"]:
+                        skipped_opening += 1
+                    elif options["repair"] and (row["esperado"] >= 0 or options["allow_negative"]):
+                        spool_writer.writerow([row["producto_id"], row["diferencia"]])
+                        pending += 1
+            report.write(f"verificación: {found} productos con diferencias ({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+            if not options["repair"]:
+                return
+
+            start = time.perf_counter()
+            repaired = 0
+            batches = 0
+            spool.seek(0)
+            batch = {}
+            for producto_id, diferencia in csv.reader(spool):
+                batch[int(producto_id)] = int(diferencia)
+                if len(batch) >= batch_size:
+                    repaired += service.repair(batch)
+                    batches += 1
+                    batch = {}
+            if batch:
+                repaired += service.repair(batch)
+                batches += 1
+            report.write(
+                f"reparación: {repaired} de {pending} productos en {batches} lotes "
+                f"({(time.perf_counter() - start) * 1000:.1f} ms)"
+            )
+            if skipped_opening:
+                report.write(f"omitidos por saldo de apertura: {skipped_opening}")
+            if pending + skipped_opening < found:
+                report.write(f"omitidos por stock esperado negativo: {found - pending - skipped_opening}")
@@ -0,0 +1,135 @@
+# Generated by Django 5.0.4 on 2026-10-17 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compra',
+            fields=[
+                ('compra_id', models.AutoField(primary_key=True, serialize=False)),
+                ('numero_factura', models.CharField(blank=True, max_length=50, null=True)),
+                ('ruc_ci', models.CharField(blank=True, max_length=20, null=True)),
+                ('fecha_pedido', models.DateField(blank=True, null=True)),
+                ('fecha_pago', models.DateField(blank=True, null=True)),
+                ('forma_pago', models.CharField(blank=True, max_length=50, null=True)),
+                ('plazo_pago', models.CharField(blank=True, max_length=50, null=True)),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('subtotal_general', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('subtotal_tarifa_15', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('subtotal_tarifa_5', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('subtotal_tarifa_0', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('descuento_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('iva_15', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('iva_5', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_pagar', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('abono', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('elaborado_codigo', models.CharField(blank=True, max_length=50, null=True)),
+                ('elaborado_nombre', models.CharField(blank=True, max_length=150, null=True)),
+                ('autorizado_codigo', models.CharField(blank=True, max_length=50, null=True)),
+                ('autorizado_nombre', models.CharField(blank=True, max_length=150, null=True)),
+                ('recibido_codigo', models.CharField(blank=True, max_length=50, null=True)),
+                ('recibido_nombre', models.CharField(blank=True, max_length=150, null=True)),
+                ('estado', models.CharField(blank=True, max_length=20, null=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Compra',
+                'verbose_name_plural': 'Compras',
+                'db_table': 'compras',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CompraDetalle',
+            fields=[
+                ('detalle_id', models.AutoField(primary_key=True, serialize=False)),
+                ('marca', models.CharField(blank=True, max_length=100, null=True)),
+                ('codigo', models.CharField(blank=True, max_length=100, null=True)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tarifa_iva', models.DecimalField(decimal_places=4, default=0, max_digits=5)),
+                ('descuento', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Detalle de compra',
+                'verbose_name_plural': 'Detalles de compra',
+                'db_table': 'compras_detalle',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('producto_id', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField(blank=True, null=True)),
+                ('nombre', models.CharField(max_length=200)),
+                ('distribuidor', models.CharField(blank=True, max_length=200, null=True)),
+                ('marca', models.CharField(blank=True, max_length=100, null=True)),
+                ('rubro', models.CharField(blank=True, max_length=100, null=True)),
+                ('material', models.CharField(blank=True, max_length=100, null=True)),
+                ('tipo_armazon', models.CharField(blank=True, max_length=100, null=True)),
+                ('codigo', models.CharField(blank=True, max_length=50, null=True)),
+                ('diametro_1', models.CharField(blank=True, max_length=50, null=True)),
+                ('diametro_2', models.CharField(blank=True, max_length=50, null=True)),
+                ('color', models.CharField(blank=True, max_length=100, null=True)),
+                ('cantidad', models.IntegerField(blank=True, null=True)),
+                ('costo_unitario', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('costo_total', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('costo_venta_1', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('costo_venta_2', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('estado', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Producto',
+                'verbose_name_plural': 'Productos',
+                'db_table': 'productos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Proveedor',
+            fields=[
+                ('proveedor_id', models.AutoField(primary_key=True, serialize=False)),
+                ('codigo_proveedor', models.CharField(max_length=20, unique=True)),
+                ('razon_social', models.CharField(max_length=255)),
+                ('nombre_comercial', models.CharField(blank=True, max_length=255, null=True)),
+                ('rut', models.CharField(max_length=12, unique=True)),
+                ('direccion', models.TextField(blank=True, null=True)),
+                ('telefono', models.CharField(blank=True, max_length=20, null=True)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('sitio_web', models.CharField(blank=True, max_length=255, null=True)),
+                ('categoria_productos', models.TextField(blank=True, null=True)),
+                ('condiciones_pago', models.CharField(default='Contado', max_length=50)),
+                ('plazo_pago_dias', models.IntegerField(default=0)),
+                ('descuento_volumen', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('representante_nombre', models.CharField(blank=True, max_length=255, null=True)),
+                ('representante_telefono', models.CharField(blank=True, max_length=20, null=True)),
+                ('representante_email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('estado', models.BooleanField(default=True)),
+                ('fecha_registro', models.DateTimeField(blank=True, db_column='fecha_registro', null=True)),
+                ('fecha_actualizacion', models.DateTimeField(blank=True, db_column='fecha_actualizacion', null=True)),
+            ],
+            options={
+                'verbose_name': 'Proveedor',
+                'verbose_name_plural': 'Proveedores',
+                'db_table': 'proveedores',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+"""
+Índices para la búsqueda de productos (ProductSearchService).
+
+La tabla ``productos`` es heredada (managed = False), por lo que los índices se
+crean con SQL explícito y sólo si la tabla existe.
+
+- PostgreSQL: índices GIN con pg_trgm sobre ``UPPER(col)``, que es la
+  expresión que genera Django para ``icontains``/``istartswith``; sirven tanto
+  para prefijos como para subcadenas y similitud. Si la extensión no puede
+  instalarse (permisos), se crean índices B-tree con ``text_pattern_ops``, que
+  al menos cubren las búsquedas por prefijo.
+- SQLite: índices ``COLLATE NOCASE``, aprovechables por ``LIKE 'x%'``.
+"""
+
+import logging
+
+from django.db import migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+TABLE = "productos"
+COLUMNS = ("nombre", "codigo", "marca", "distribuidor")
+
+
+def _has_table(schema_editor) -> bool:
+    return TABLE in schema_editor.connection.introspection.table_names()
+
+
+def _enable_trigram(schema_editor) -> bool:
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        return True
+    except Exception:
+        logger.warning("No se pudo habilitar pg_trgm; se usarán índices B-tree por prefijo.")
+        return False
+
+
+def create_indexes(apps, schema_editor):
+    if not _has_table(schema_editor):
+        return
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        trigram = _enable_trigram(schema_editor)
+        for column in COLUMNS:
+            if trigram:
+                schema_editor.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_{column}_trgm "
+                    f"ON {TABLE} USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+                )
+            else:
+                schema_editor.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_{column}_prefijo "
+                    f"ON {TABLE} ((UPPER({column}::text)) text_pattern_ops)"
+                )
+    elif vendor == "sqlite":
+        for column in COLUMNS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_{column}_nocase ON {TABLE} ({column} COLLATE NOCASE)"
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    if not _has_table(schema_editor):
+        return
+    for column in COLUMNS:
+        for suffix in ("trgm", "prefijo", "nocase"):
+            schema_editor.execute(f"DROP INDEX IF EXISTS idx_{TABLE}_{column}_{suffix}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,57 @@
+"""
+Agrega ``productos.proveedor_id`` (indexado) y lo completa a partir del texto
+libre ``distribuidor`` comparándolo con ``proveedores.razon_social``.
+
+Las tablas son heredadas (managed = False), así que la columna se agrega con
+SQL explícito y sólo si la tabla existe y aún no tiene la columna.
+"""
+
+from django.db import migrations
+
+BACKFILL_SQL = """
+UPDATE productos
+SET proveedor_id = (
+    SELECT MIN(p.proveedor_id)
+    FROM proveedores p
+    WHERE UPPER(TRIM(p.razon_social)) = UPPER(TRIM(productos.distribuidor))
+)
+WHERE proveedor_id IS NULL AND distribuidor IS NOT NULL AND TRIM(distribuidor) <> ''
+"""
+
+
+def _columns(schema_editor, table):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        return {col.name for col in connection.introspection.get_table_description(cursor, table)}
+
+
+def add_proveedor(apps, schema_editor):
+    tables = schema_editor.connection.introspection.table_names()
+    if "productos" not in tables or "proveedores" not in tables:
+        return
+    if "proveedor_id" not in _columns(schema_editor, "productos"):
+        schema_editor.execute(
+            "ALTER TABLE productos ADD COLUMN proveedor_id integer NULL "
+            "REFERENCES proveedores (proveedor_id)"
+        )
+    schema_editor.execute("CREATE INDEX IF NOT EXISTS idx_productos_proveedor ON productos (proveedor_id)")
+    schema_editor.execute(BACKFILL_SQL)
+
+
+def remove_proveedor(apps, schema_editor):
+    if "productos" not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS idx_productos_proveedor")
+    if "proveedor_id" in _columns(schema_editor, "productos"):
+        schema_editor.execute("ALTER TABLE productos DROP COLUMN proveedor_id")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_product_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_proveedor, remove_proveedor),
+    ]
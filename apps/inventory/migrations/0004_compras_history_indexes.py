@@ -0,0 +1,31 @@
+"""
+Índice para filtrar el historial de compras por fecha de pedido
+(PurchaseService.filter_purchases). ``compras`` es una tabla heredada, así que
+se crea con SQL explícito y sólo si la tabla existe. El filtro por proveedor ya
+tiene idx_compras_proveedor.
+"""
+
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    if "compras" not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute("CREATE INDEX IF NOT EXISTS idx_compras_fecha_pedido ON compras (fecha_pedido)")
+
+
+def drop_indexes(apps, schema_editor):
+    if "compras" not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS idx_compras_fecha_pedido")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_product_proveedor"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
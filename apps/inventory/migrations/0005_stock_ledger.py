@@ -0,0 +1,48 @@
+# Generated by Django 5.0.4 on 2026-10-17 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_compras_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('movimiento_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('compra', 'Compra'), ('venta', 'Venta'), ('ajuste', 'Ajuste'), ('inicial', 'Saldo inicial')], max_length=20)),
+                ('cantidad', models.IntegerField()),
+                ('referencia_id', models.IntegerField(blank=True, null=True)),
+                ('fecha', models.DateTimeField()),
+                ('producto', models.ForeignKey(db_column='producto_id', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimientos', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de stock',
+                'verbose_name_plural': 'Movimientos de stock',
+                'db_table': 'movimientos_stock',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='idx_movimientos_stock_prod'), models.Index(fields=['tipo', 'referencia_id'], name='idx_movimientos_stock_ref')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('snapshot_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField()),
+                ('hasta_movimiento_id', models.BigIntegerField()),
+                ('fecha', models.DateTimeField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(db_column='producto_id', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='snapshots_stock', to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de stock',
+                'verbose_name_plural': 'Snapshots de stock',
+                'db_table': 'snapshots_stock',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='idx_snapshots_stock_prod'), models.Index(fields=['hasta_movimiento_id'], name='idx_snapshots_stock_hasta')],
+            },
+        ),
+    ]
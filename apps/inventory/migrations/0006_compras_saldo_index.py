@@ -0,0 +1,30 @@
+"""
+Índice para la antigüedad de saldos por pagar (PayablesAgingService), que
+agrupa por proveedor las compras con ``saldo > 0``. ``compras`` es una tabla
+heredada, así que se crea con SQL explícito y sólo si la tabla existe.
+"""
+
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    if "compras" not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute("CREATE INDEX IF NOT EXISTS idx_compras_proveedor_saldo ON compras (proveedor_id, saldo)")
+
+
+def drop_indexes(apps, schema_editor):
+    if "compras" not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS idx_compras_proveedor_saldo")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0005_stock_ledger"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
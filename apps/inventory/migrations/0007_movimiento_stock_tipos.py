@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-17 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_compras_saldo_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='tipo',
+            field=models.CharField(choices=[('compra', 'Compra'), ('venta', 'Venta'), ('ajuste', 'Ajuste'), ('inicial', 'Saldo inicial'), ('apertura', 'Apertura del libro'), ('conciliacion', 'Conciliación')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,41 @@
+"""
+Saldos de apertura del libro de movimientos de stock: por cada producto, un
+movimiento ``apertura`` por la diferencia entre ``productos.cantidad`` y la
+suma de sus movimientos (lo mismo que ``StockLedgerService.seed_from_products``
+y ``compact_stock_ledger --seed``). Sin esto el libro sólo conoce los cambios
+posteriores al despliegue y ``/productos/stock/`` devuelve saldos negativos.
+
+Es un único INSERT ... SELECT y no inserta nada para los productos que ya
+cuadran, así que también sirve en bases donde el libro ya tenía movimientos.
+Si la tabla heredada ``productos`` no existe (bases nuevas, pruebas), no hace
+nada.
+"""
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def seed_opening_balances(apps, schema_editor):
+    if "productos" not in schema_editor.connection.introspection.table_names():
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO movimientos_stock (producto_id, tipo, cantidad, referencia_id, fecha) "
+            "SELECT p.producto_id, 'apertura', COALESCE(p.cantidad, 0) - COALESCE(m.saldo, 0), NULL, %s "
+            "FROM productos p LEFT JOIN ("
+            "SELECT producto_id, SUM(cantidad) AS saldo FROM movimientos_stock GROUP BY producto_id"
+            ") m ON m.producto_id = p.producto_id "
+            "WHERE COALESCE(p.cantidad, 0) <> COALESCE(m.saldo, 0)",
+            [timezone.now()],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_movimiento_stock_tipos"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_opening_balances, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,16 @@ class Product(models.Model):
     fecha = models.DateTimeField(blank=True, null=True)
     nombre = models.CharField(max_length=200)
     distribuidor = models.CharField(max_length=200, blank=True, null=True)
+    # Proveedor resuelto a partir de ``distribuidor`` (texto libre heredado);
+    # columna agregada por la migración inventory.0003.
+    proveedor = models.ForeignKey(
+        "Proveedor",
+        db_column="proveedor_id",
+        on_delete=models.DO_NOTHING,
+        blank=True,
+        null=True,
+        related_name="productos",
+    )
     marca = models.CharField(max_length=100, blank=True, null=True)
     rubro = models.CharField(max_length=100, blank=True, null=True)
     material = models.CharField(max_length=100, blank=True, null=True)
@@ -130,3 +140,92 @@ class CompraDetalle(models.Model):
 
     def __str__(self) -> str:
         return f"Detalle #{self.detalle_id} de compra {self.compra_id}"
+
+
+class MovimientoStock(models.Model):
+    """
+    Libro de movimientos de inventario: sólo se insertan filas, nunca se
+    modifican. ``cantidad`` es el delta con signo (positivo en compras,
+    negativo en ventas).
+
+    ``inicial`` y ``ajuste`` son el stock cargado a mano (alta y edición de
+    productos). ``apertura`` es el saldo con el que se arrancó el libro sobre
+    un inventario existente y ``conciliacion`` las correcciones de
+    ``reconcile_stock``.
+    """
+
+    TIPO_COMPRA = "compra"
+    TIPO_VENTA = "venta"
+    TIPO_AJUSTE = "ajuste"
+    TIPO_INICIAL = "inicial"
+    TIPO_APERTURA = "apertura"
+    TIPO_CONCILIACION = "conciliacion"
+    TIPOS_MANUALES = (TIPO_INICIAL, TIPO_AJUSTE)
+    TIPOS = [
+        (TIPO_COMPRA, "Compra"),
+        (TIPO_VENTA, "Venta"),
+        (TIPO_AJUSTE, "Ajuste"),
+        (TIPO_INICIAL, "Saldo inicial"),
+        (TIPO_APERTURA, "Apertura del libro"),
+        (TIPO_CONCILIACION, "Conciliación"),
+    ]
+
+    movimiento_id = models.BigAutoField(primary_key=True)
+    # Sin restricción en la base: el libro no debe impedir el borrado físico
+    # de productos que hoy hace ProductService.delete_product.
+    producto = models.ForeignKey(
+        Product,
+        db_column="producto_id",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="movimientos",
+    )
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    cantidad = models.IntegerField()
+    referencia_id = models.IntegerField(blank=True, null=True)
+    fecha = models.DateTimeField()
+
+    class Meta:
+        db_table = "movimientos_stock"
+        verbose_name = "Movimiento de stock"
+        verbose_name_plural = "Movimientos de stock"
+        indexes = [
+            models.Index(fields=["producto", "fecha"], name="idx_movimientos_stock_prod"),
+            models.Index(fields=["tipo", "referencia_id"], name="idx_movimientos_stock_ref"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.tipo} {self.cantidad:+d} (producto {self.producto_id})"
+
+
+class SnapshotStock(models.Model):
+    """
+    Saldo compactado de un producto: incluye todos sus movimientos con
+    ``movimiento_id <= hasta_movimiento_id``. ``fecha`` es la del último
+    movimiento incluido.
+    """
+
+    snapshot_id = models.BigAutoField(primary_key=True)
+    producto = models.ForeignKey(
+        Product,
+        db_column="producto_id",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="snapshots_stock",
+    )
+    cantidad = models.IntegerField()
+    hasta_movimiento_id = models.BigIntegerField()
+    fecha = models.DateTimeField()
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "snapshots_stock"
+        verbose_name = "Snapshot de stock"
+        verbose_name_plural = "Snapshots de stock"
+        indexes = [
+            models.Index(fields=["producto", "fecha"], name="idx_snapshots_stock_prod"),
+            models.Index(fields=["hasta_movimiento_id"], name="idx_snapshots_stock_hasta"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Stock {self.cantidad} de producto {self.producto_id} al {self.fecha:%Y-%m-%d}"
@@ -1,12 +1,113 @@
 from __future__ import annotations
 
+import hashlib
+import json
+from datetime import timedelta
 from decimal import Decimal
-from typing import Iterable, Optional, Sequence
+from typing import Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
 
-from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Round, Trim, TruncDate, Upper
 from django.utils import timezone
 
-from .models import Compra, CompraDetalle, Product, Proveedor
+from apps.sales.models import SaleDetail
+from apps.shared.exports import EXPORT_CHUNK_SIZE
+from apps.shared.pagination import DEFAULT_PAGE_SIZE, paginate_keyset
+from apps.shared.versioning import bump_data_version, get_data_version
+
+from .models import Compra, CompraDetalle, MovimientoStock, Product, Proveedor, SnapshotStock
+
+
+# IVA Ecuador 15 %
+IVA_FACTOR = Decimal("1.15")
+DETAIL_BATCH_SIZE = 500
+PURCHASE_HISTORY_ORDERING = ("-compra_id",)
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+
+
+def low_stock_threshold() -> int:
+    return getattr(settings, "LOW_STOCK_THRESHOLD", DEFAULT_LOW_STOCK_THRESHOLD)
+
+
+def _supplier_key(value: Optional[str]) -> str:
+    return (value or "").strip().upper()
+
+
+def resolve_proveedores(nombres: Iterable[Optional[str]]) -> dict:
+    """
+    Resuelve nombres de distribuidor (texto libre) a ``proveedor_id``
+    comparando con la razón social, sin distinguir mayúsculas ni espacios.
+    Una sola consulta para todos los nombres.
+    """
+    claves = {_supplier_key(nombre) for nombre in nombres} - {""}
+    if not claves:
+        return {}
+    rows = (
+        Proveedor.objects.annotate(clave=Upper(Trim("razon_social")))
+        .filter(clave__in=claves)
+        .order_by("proveedor_id")
+        .values_list("clave", "proveedor_id")
+    )
+    resolved: dict = {}
+    for clave, proveedor_id in rows:
+        resolved.setdefault(clave, proveedor_id)
+    return resolved
+
+
+class PurchaseValidationError(ValueError):
+    """
+    Errores de validación de una compra; ``errores`` trae uno por línea o
+    problema detectado para mostrarlos todos juntos.
+    """
+
+    def __init__(self, errores: Sequence[str]):
+        self.errores = list(errores)
+        super().__init__(" ".join(self.errores))
+
+
+class ValidatedPurchase(NamedTuple):
+    """Resultado de ``validate_purchase``: proveedor resuelto y totales ya calculados."""
+
+    proveedor: Proveedor
+    totals: dict
+
+
+def with_precio_iva(queryset: QuerySet) -> QuerySet:
+    """
+    Anota ``precio_iva`` (costo unitario con IVA, redondeado a 2 decimales)
+    directamente en la consulta.
+    """
+    return queryset.annotate(
+        precio_iva=Round(
+            ExpressionWrapper(
+                Coalesce(F("costo_unitario"), Value(Decimal(0))) * Value(IVA_FACTOR),
+                output_field=DecimalField(max_digits=14, decimal_places=4),
+            ),
+            precision=2,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
 
 
 class ProductService:
@@ -29,7 +130,7 @@ class ProductService:
         cantidad = max(int(cantidad or 0), 0)
         costo_unitario = Decimal(costo_unitario or 0)
         # IVA Ecuador 15 %: costo_total ahora representa el costo unitario con IVA
-        costo_total = (costo_unitario * Decimal("1.15"))
+        costo_total = (costo_unitario * IVA_FACTOR)
         costo_venta_1 = costo_total * Decimal(3)
         costo_venta_2 = costo_total * Decimal(2)
         return {
@@ -52,9 +153,56 @@ class ProductService:
         payload = {**data, **self._compute_costs(cantidad, costo_unitario)}
         if not payload.get("fecha"):
             payload["fecha"] = timezone.now()
+        self._attach_proveedores([payload])
 
         with transaction.atomic():
-            return Product.objects.create(**payload)
+            product = Product.objects.create(**payload)
+            StockLedgerService().record(MovimientoStock.TIPO_INICIAL, {product.producto_id: product.cantidad})
+            bump_data_version("productos")
+            return product
+
+    def create_products(self, items: Sequence[dict]) -> list:
+        """
+        Alta en bloque (un solo INSERT) con las mismas validaciones y costos
+        derivados que ``create_product``. Devuelve los productos en el mismo
+        orden, con su ``producto_id`` asignado.
+        """
+        payloads = []
+        now = timezone.now()
+        for data in items:
+            if not data.get("nombre"):
+                raise ValueError("El nombre del producto es requerido.")
+            cantidad = int(data.get("cantidad") or 0)
+            costo_unitario = Decimal(data.get("costo_unitario") or 0)
+            if cantidad < 0 or costo_unitario < 0:
+                raise ValueError("Cantidad y costo unitario deben ser valores no negativos.")
+            payload = {**data, **self._compute_costs(cantidad, costo_unitario)}
+            if not payload.get("fecha"):
+                payload["fecha"] = now
+            payloads.append(payload)
+        if not payloads:
+            return []
+        self._attach_proveedores(payloads)
+        products = [Product(**payload) for payload in payloads]
+
+        with transaction.atomic():
+            products = Product.objects.bulk_create(products, batch_size=DETAIL_BATCH_SIZE)
+            StockLedgerService().record(
+                MovimientoStock.TIPO_INICIAL,
+                {product.producto_id: product.cantidad for product in products},
+            )
+            bump_data_version("productos")
+        return products
+
+    def _attach_proveedores(self, payloads: Sequence[dict]) -> None:
+        """
+        Completa ``proveedor_id`` desde ``distribuidor`` en los payloads que no
+        traen el proveedor explícito.
+        """
+        pending = [p for p in payloads if "proveedor" not in p and "proveedor_id" not in p]
+        resolved = resolve_proveedores(p.get("distribuidor") for p in pending)
+        for payload in pending:
+            payload["proveedor_id"] = resolved.get(_supplier_key(payload.get("distribuidor")))
 
     def update_product(self, product_id: int, data: dict) -> Optional[Product]:
         product = self.get_product(product_id)
@@ -72,12 +220,20 @@ class ProductService:
 
         if not payload.get("fecha"):
             payload["fecha"] = product.fecha
+        if "distribuidor" in payload and _supplier_key(payload["distribuidor"]) != _supplier_key(product.distribuidor):
+            self._attach_proveedores([payload])
 
+        anterior = product.cantidad or 0
         for key, value in payload.items():
             if hasattr(product, key):
                 setattr(product, key, value)
 
-        product.save()
+        with transaction.atomic():
+            product.save()
+            StockLedgerService().record(
+                MovimientoStock.TIPO_AJUSTE, {product.producto_id: (product.cantidad or 0) - anterior}
+            )
+            bump_data_version("productos")
         return product
 
     def delete_product(self, product_id: int) -> bool:
@@ -93,6 +249,8 @@ class ProductService:
             product.estado = False
             product.save(update_fields=["estado"])
             return False
+        finally:
+            bump_data_version("productos")
 
     def restore_product(self, product_id: int) -> bool:
         product = self.get_product(product_id)
@@ -100,9 +258,502 @@ class ProductService:
             return False
         product.estado = True
         product.save(update_fields=["estado"])
+        bump_data_version("productos")
         return True
 
 
+class ProductCatalogService:
+    """
+    Catálogo de productos activos para el punto de venta (id, nombre, precio y
+    código), serializado una sola vez y guardado en la caché bajo la versión
+    de datos "productos". Esa versión la incrementan las altas/ediciones/bajas
+    de productos y las compras y ventas, así que una escritura invalida el
+    catálogo sin tener que borrarlo explícitamente.
+    """
+
+    # Acota el tiempo que sobrevive un catálogo si los productos se editan
+    # directamente en la base de datos (fuera de los servicios).
+    timeout = 15 * 60
+
+    def _key(self, version: int) -> str:
+        return f"product-catalog:v{version}"
+
+    def _build(self) -> str:
+        rows = (
+            Product.objects.filter(estado=True)
+            .order_by("producto_id")
+            .values_list("producto_id", "nombre", "costo_venta_1", "costo_unitario", "codigo")
+        )
+        data = [
+            {
+                "producto_id": producto_id,
+                "nombre": nombre,
+                "precio_unitario": float(costo_venta_1 or costo_unitario or 0),
+                "codigo": codigo or "",
+            }
+            for producto_id, nombre, costo_venta_1, costo_unitario, codigo in rows.iterator()
+        ]
+        return json.dumps(data, ensure_ascii=False)
+
+    def get_catalog(self) -> Tuple[str, str]:
+        """
+        Devuelve ``(etag, json)``. El ETag es un hash del contenido, de modo
+        que dos workers que reconstruyen el mismo catálogo producen el mismo.
+        """
+        key = self._key(get_data_version("productos"))
+        entry = cache.get(key)
+        if entry is None:
+            body = self._build()
+            etag = hashlib.sha256(body.encode("utf-8")).hexdigest()[:20]
+            entry = (etag, body)
+            cache.set(key, entry, timeout=self.timeout)
+        return entry
+
+
+class ProductSearchService:
+    """
+    Búsqueda incremental de productos (autocompletado del punto de venta y de
+    compras) sobre nombre, código, marca y distribuidor.
+
+    Cada palabra de la consulta debe aparecer en alguno de los campos. Los
+    resultados se ordenan por relevancia: código exacto, prefijo de código,
+    prefijo de nombre, prefijo de marca/distribuidor y, al final, coincidencias
+    internas. En PostgreSQL con pg_trgm se agregan coincidencias aproximadas
+    (errores de tipeo) sobre el nombre. La paginación es por keyset
+    (rango, nombre, producto_id).
+    """
+
+    fields = ("nombre", "codigo", "marca", "distribuidor")
+    ordering = ("rango", "nombre", "producto_id")
+    max_terms = 5
+    _trigram: Optional[bool] = None
+
+    def _trigram_available(self) -> bool:
+        if connection.vendor != "postgresql":
+            return False
+        if ProductSearchService._trigram is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                ProductSearchService._trigram = cursor.fetchone() is not None
+        return ProductSearchService._trigram
+
+    def _terms(self, query: str) -> list:
+        return query.split()[: self.max_terms]
+
+    def _rank(self, query: str, fuzzy: bool):
+        whens = [
+            When(codigo__iexact=query, then=Value(0)),
+            When(codigo__istartswith=query, then=Value(1)),
+            When(nombre__istartswith=query, then=Value(2)),
+            When(Q(marca__istartswith=query) | Q(distribuidor__istartswith=query), then=Value(3)),
+        ]
+        if fuzzy:
+            whens.append(When(self._match(self._terms(query)), then=Value(4)))
+        return Case(*whens, default=Value(5 if fuzzy else 4), output_field=IntegerField())
+
+    def _match(self, terms) -> Q:
+        condition = Q()
+        for term in terms:
+            any_field = Q()
+            for field in self.fields:
+                any_field |= Q(**{f"{field}__icontains": term})
+            condition &= any_field
+        return condition
+
+    def search_queryset(self, query: str, distribuidor: Optional[str] = None, include_deleted: bool = False):
+        query = (query or "").strip()
+        qs = Product.objects.all()
+        if not include_deleted:
+            qs = qs.filter(estado=True)
+        if distribuidor:
+            qs = qs.filter(distribuidor=distribuidor)
+        if not query:
+            return qs.annotate(rango=Value(0, output_field=IntegerField()))
+
+        condition = self._match(self._terms(query))
+        fuzzy = self._trigram_available()
+        if fuzzy:
+            # "%>": similitud de palabra de pg_trgm; usa el índice GIN sobre UPPER(nombre).
+            condition |= Q(
+                RawSQL(
+                    f'UPPER("{Product._meta.db_table}"."nombre"::text) %%> UPPER(%s)',
+                    [query],
+                    output_field=BooleanField(),
+                )
+            )
+        return qs.filter(condition).annotate(rango=self._rank(query, fuzzy))
+
+    def search(
+        self,
+        query: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        distribuidor: Optional[str] = None,
+        include_deleted: bool = False,
+    ) -> Tuple[list, Optional[str]]:
+        qs = self.search_queryset(query, distribuidor, include_deleted).values(
+            "producto_id",
+            "nombre",
+            "codigo",
+            "marca",
+            "distribuidor",
+            "descripcion",
+            "cantidad",
+            "costo_unitario",
+            "costo_venta_1",
+            "rango",
+        )
+        return paginate_keyset(qs, self.ordering, cursor, limit)
+
+    @staticmethod
+    def serialize(row: dict) -> dict:
+        return {
+            "producto_id": row["producto_id"],
+            "nombre": row["nombre"],
+            "codigo": row["codigo"] or "",
+            "marca": row["marca"] or "",
+            "distribuidor": row["distribuidor"] or "",
+            "descripcion": row["descripcion"] or "",
+            "cantidad": row["cantidad"] or 0,
+            "costo_unitario": float(row["costo_unitario"] or 0),
+            "precio_unitario": float(row["costo_venta_1"] or row["costo_unitario"] or 0),
+        }
+
+
+class InventoryStatsService:
+    """
+    Estadísticas de inventario calculadas en la base de datos: un único
+    ``aggregate`` para totales y valorización, y consultas agrupadas para las
+    facetas, en lugar de recorrer todos los productos en Python.
+    """
+
+    money = DecimalField(max_digits=16, decimal_places=2)
+
+    def _products(self, include_deleted: bool) -> QuerySet:
+        qs = Product.objects.all()
+        return qs if include_deleted else qs.filter(estado=True)
+
+    def summary(self, include_deleted: bool = False, threshold: Optional[int] = None) -> dict:
+        threshold = low_stock_threshold() if threshold is None else threshold
+        cantidad = Coalesce(F("cantidad"), Value(0))
+        valor = ExpressionWrapper(
+            cantidad * Coalesce(F("costo_unitario"), Value(Decimal(0))),
+            output_field=self.money,
+        )
+        stats = self._products(include_deleted).aggregate(
+            total_productos=Count("producto_id"),
+            total_stock=Coalesce(Sum("cantidad"), Value(0)),
+            stock_bajo=Count("producto_id", filter=Q(cantidad__lte=threshold) | Q(cantidad__isnull=True)),
+            categorias=Count("tipo_armazon", distinct=True, filter=~Q(tipo_armazon="")),
+            marcas=Count("marca", distinct=True, filter=~Q(marca="")),
+            valor_inventario=Coalesce(Sum(valor), Value(Decimal(0)), output_field=self.money),
+        )
+        stats["valor_inventario"] = Decimal(stats["valor_inventario"]).quantize(Decimal("0.01"))
+        stats["valor_inventario_iva"] = (stats["valor_inventario"] * IVA_FACTOR).quantize(Decimal("0.01"))
+        stats["umbral_stock_bajo"] = threshold
+        return stats
+
+    def facet(self, field: str, include_deleted: bool = False) -> list:
+        """
+        Valores distintos (no vacíos) de ``field`` con su número de productos.
+        """
+        return list(
+            self._products(include_deleted)
+            .exclude(**{f"{field}__isnull": True})
+            .exclude(**{field: ""})
+            .values(field)
+            .annotate(total=Count("producto_id"))
+            .order_by(field)
+        )
+
+    def facet_values(self, field: str, include_deleted: bool = False) -> list:
+        return [row[field] for row in self.facet(field, include_deleted)]
+
+    def low_stock_products(self, threshold: Optional[int] = None, limit: Optional[int] = None) -> QuerySet:
+        threshold = low_stock_threshold() if threshold is None else threshold
+        qs = (
+            self._products(include_deleted=False)
+            .filter(Q(cantidad__lte=threshold) | Q(cantidad__isnull=True))
+            .only("producto_id", "nombre", "cantidad")
+            .order_by(F("cantidad").asc(nulls_first=True), "nombre")
+        )
+        return qs[:limit] if limit else qs
+
+
+class StockLedgerService:
+    """
+    Libro de movimientos de stock (``movimientos_stock``) con saldos
+    compactados por producto (``snapshots_stock``).
+
+    Ventas, compras y ajustes insertan un movimiento por producto en la misma
+    transacción que actualizan ``Product.cantidad``, que queda como saldo
+    materializado para las pantallas y, sobre todo, como la fila que las
+    ventas bloquean para no vender más de lo que hay: el libro no reemplaza
+    ese UPDATE. El saldo a una fecha se obtiene del
+    último snapshot anterior más los movimientos posteriores a él, de modo
+    que el costo de la consulta depende de los movimientos desde la última
+    compactación y no de toda la historia.
+    """
+
+    def record(
+        self,
+        tipo: str,
+        cantidades: dict,
+        referencia_id: Optional[int] = None,
+        fecha=None,
+    ) -> list:
+        """
+        Inserta un movimiento por producto (``{producto_id: delta}``) con un
+        único INSERT. Los deltas en cero se omiten.
+        """
+        fecha = fecha or timezone.now()
+        movimientos = [
+            MovimientoStock(
+                producto_id=producto_id,
+                tipo=tipo,
+                cantidad=int(cantidad),
+                referencia_id=referencia_id,
+                fecha=fecha,
+            )
+            for producto_id, cantidad in cantidades.items()
+            if cantidad
+        ]
+        if not movimientos:
+            return []
+        return MovimientoStock.objects.bulk_create(movimientos, batch_size=DETAIL_BATCH_SIZE)
+
+    def _vigente(self, as_of=None) -> QuerySet:
+        """Snapshot vigente del producto de la consulta externa (``OuterRef``)."""
+        vigente = SnapshotStock.objects.filter(producto_id=OuterRef("producto_id"))
+        if as_of is not None:
+            vigente = vigente.filter(fecha__lte=as_of)
+        return vigente.order_by("-hasta_movimiento_id")
+
+    def _latest_snapshots(self, as_of=None) -> QuerySet:
+        return SnapshotStock.objects.filter(snapshot_id=Subquery(self._vigente(as_of).values("snapshot_id")[:1]))
+
+    def on_hand(self, producto_ids: Optional[Iterable[int]] = None, as_of=None) -> dict:
+        """
+        Saldo por producto según el libro (``{producto_id: cantidad}``), al
+        momento actual o a la fecha ``as_of``. Usa dos consultas: los
+        snapshots vigentes y la suma de movimientos posteriores a cada uno.
+        """
+        snapshots = self._latest_snapshots(as_of)
+        desde = Coalesce(Subquery(self._vigente(as_of).values("hasta_movimiento_id")[:1]), Value(0))
+        movimientos = MovimientoStock.objects.annotate(desde=desde).filter(movimiento_id__gt=F("desde"))
+        if as_of is not None:
+            movimientos = movimientos.filter(fecha__lte=as_of)
+        if producto_ids is not None:
+            producto_ids = list(producto_ids)
+            snapshots = snapshots.filter(producto_id__in=producto_ids)
+            movimientos = movimientos.filter(producto_id__in=producto_ids)
+
+        saldos = dict(snapshots.values_list("producto_id", "cantidad"))
+        deltas = movimientos.values("producto_id").annotate(delta=Sum("cantidad")).values_list("producto_id", "delta")
+        for producto_id, delta in deltas:
+            saldos[producto_id] = saldos.get(producto_id, 0) + (delta or 0)
+        return saldos
+
+    def _horizonte(self) -> int:
+        """
+        Mayor ``movimiento_id`` hasta el que se puede compactar sin que después
+        aparezca un movimiento con un id menor.
+
+        En PostgreSQL una transacción abierta puede confirmar más tarde un id
+        menor que el máximo visible. ``LOCK TABLE ... IN SHARE MODE`` espera a
+        que terminen las transacciones que ya insertaron en el libro y frena
+        las nuevas sólo mientras se lee el máximo. En SQLite las escrituras
+        están serializadas, así que los ids se confirman en orden.
+        """
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"LOCK TABLE {connection.ops.quote_name(MovimientoStock._meta.db_table)} IN SHARE MODE"
+                    )
+            return MovimientoStock.objects.aggregate(corte=Max("movimiento_id"))["corte"] or 0
+
+    def compact(self, batch_size: int = DETAIL_BATCH_SIZE) -> int:
+        """
+        Escribe un snapshot nuevo para cada producto con movimientos desde la
+        compactación anterior, hasta ``_horizonte()``. Los movimientos no se
+        borran: el libro sigue siendo la historia completa. Devuelve el número
+        de snapshots creados.
+        """
+        corte = self._horizonte()
+        anterior = SnapshotStock.objects.aggregate(anterior=Max("hasta_movimiento_id"))["anterior"] or 0
+        if not corte or corte <= anterior:
+            return 0
+
+        # Un producto sin snapshot en la compactación anterior no tuvo
+        # movimientos antes de ella, así que basta con sumar desde ``anterior``.
+        rango = MovimientoStock.objects.filter(movimiento_id__gt=anterior, movimiento_id__lte=corte)
+        previos = dict(
+            self._latest_snapshots()
+            .filter(producto_id__in=rango.values("producto_id"))
+            .values_list("producto_id", "cantidad")
+        )
+        deltas = (
+            rango.values("producto_id")
+            .annotate(delta=Sum("cantidad"), ultima=Max("fecha"))
+            .values_list("producto_id", "delta", "ultima")
+            .order_by("producto_id")
+        )
+        creados = 0
+        lote = []
+        with transaction.atomic():
+            for producto_id, delta, ultima in deltas.iterator(chunk_size=batch_size):
+                lote.append(
+                    SnapshotStock(
+                        producto_id=producto_id,
+                        cantidad=previos.get(producto_id, 0) + (delta or 0),
+                        hasta_movimiento_id=corte,
+                        fecha=ultima,
+                    )
+                )
+                if len(lote) >= batch_size:
+                    SnapshotStock.objects.bulk_create(lote)
+                    creados += len(lote)
+                    lote = []
+            if lote:
+                SnapshotStock.objects.bulk_create(lote)
+                creados += len(lote)
+        return creados
+
+    def seed_from_products(self, batch_size: int = DETAIL_BATCH_SIZE) -> int:
+        """
+        Registra un movimiento de ``apertura`` por la diferencia entre
+        ``Product.cantidad`` y el saldo del libro, para arrancar el libro sobre
+        un inventario existente. Es idempotente: si ya cuadran no inserta nada.
+        """
+        saldos = self.on_hand()
+        fecha = timezone.now()
+        creados = 0
+        lote = []
+        with transaction.atomic():
+            productos = Product.objects.values_list("producto_id", "cantidad").order_by("producto_id")
+            for producto_id, cantidad in productos.iterator(chunk_size=batch_size):
+                diferencia = (cantidad or 0) - saldos.get(producto_id, 0)
+                if diferencia:
+                    lote.append(
+                        MovimientoStock(
+                            producto_id=producto_id,
+                            tipo=MovimientoStock.TIPO_APERTURA,
+                            cantidad=diferencia,
+                            fecha=fecha,
+                        )
+                    )
+                if len(lote) >= batch_size:
+                    MovimientoStock.objects.bulk_create(lote)
+                    creados += len(lote)
+                    lote = []
+            if lote:
+                MovimientoStock.objects.bulk_create(lote)
+                creados += len(lote)
+        return creados
+
+
+class StockReconciliationService:
+    """
+    Verifica ``Product.cantidad`` contra lo comprado menos lo vendido
+    (``compras_detalle`` y ``detalle_ventas``) más el stock cargado a mano
+    (movimientos ``inicial`` y ``ajuste`` del libro), con una sola consulta
+    que agrupa cada tabla una vez y la une a ``productos``; sólo devuelve los
+    productos que no cuadran.
+
+    Un producto con movimiento de ``apertura`` traía stock de antes del libro
+    que no se puede separar en compras, ventas y cargas manuales: se informa
+    pero no es ``reparable``.
+    """
+
+    def _discrepancies_sql(self) -> Tuple[str, list]:
+        qn = connection.ops.quote_name
+        producto_id = qn(Product._meta.pk.column)
+        cantidad = qn("cantidad")
+        tipo = qn("tipo")
+
+        def totals(model) -> str:
+            return (
+                f"SELECT {qn(model._meta.get_field('producto').column)} AS producto_id, "
+                f"SUM({qn(model._meta.get_field('cantidad').column)}) AS total "
+                f"FROM {qn(model._meta.db_table)} GROUP BY 1"
+            )
+
+        manuales = MovimientoStock.TIPOS_MANUALES
+        marcadores = ", ".join(["%s"] * len(manuales))
+        libro = (
+            f"SELECT {qn('producto_id')} AS producto_id, "
+            f"SUM(CASE WHEN {tipo} IN ({marcadores}) THEN {cantidad} ELSE 0 END) AS manual, "
+            f"SUM(CASE WHEN {tipo} = %s THEN 1 ELSE 0 END) AS aperturas "
+            f"FROM {qn(MovimientoStock._meta.db_table)} WHERE {tipo} IN ({marcadores}, %s) GROUP BY 1"
+        )
+        params = [*manuales, MovimientoStock.TIPO_APERTURA, *manuales, MovimientoStock.TIPO_APERTURA]
+        sql = (
+            f"SELECT p.{producto_id}, p.{qn('nombre')}, p.{qn('codigo')}, "
+            f"COALESCE(p.{cantidad}, 0), COALESCE(c.total, 0), COALESCE(v.total, 0), "
+            f"COALESCE(m.manual, 0), COALESCE(m.aperturas, 0) "
+            f"FROM {qn(Product._meta.db_table)} p "
+            f"LEFT JOIN ({totals(CompraDetalle)}) c ON c.producto_id = p.{producto_id} "
+            f"LEFT JOIN ({totals(SaleDetail)}) v ON v.producto_id = p.{producto_id} "
+            f"LEFT JOIN ({libro}) m ON m.producto_id = p.{producto_id} "
+            f"WHERE COALESCE(p.{cantidad}, 0) <> COALESCE(c.total, 0) - COALESCE(v.total, 0) + COALESCE(m.manual, 0) "
+            f"ORDER BY p.{producto_id}"
+        )
+        return sql, params
+
+    def iter_discrepancies(self, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+        """
+        Recorre las diferencias con un cursor del lado del servidor (en
+        PostgreSQL), trayendo ``chunk_size`` filas por vez.
+        """
+        with transaction.atomic():
+            with connection.chunked_cursor() as cursor:
+                cursor.execute(*self._discrepancies_sql())
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for producto_id, nombre, codigo, cantidad, comprado, vendido, manual, aperturas in rows:
+                        esperado = int(comprado) - int(vendido) + int(manual)
+                        yield {
+                            "producto_id": producto_id,
+                            "nombre": nombre,
+                            "codigo": codigo,
+                            "cantidad": int(cantidad),
+                            "comprado": int(comprado),
+                            "vendido": int(vendido),
+                            "manual": int(manual),
+                            "esperado": esperado,
+                            "diferencia": esperado - int(cantidad),
+                            "reparable": not aperturas,
+                        }
+
+    def repair(self, diferencias: dict) -> int:
+        """
+        Aplica ``{producto_id: diferencia}`` con un único UPDATE relativo
+        (``cantidad = COALESCE(cantidad, 0) + diferencia``): si entre la
+        verificación y la reparación se registra una venta o compra, mueve el
+        stock y lo esperado por igual y la corrección sigue siendo válida.
+        Cada corrección queda en el libro como ``conciliacion``, que no cuenta
+        como carga manual en lo esperado.
+        """
+        diferencias = {pid: delta for pid, delta in diferencias.items() if delta}
+        if not diferencias:
+            return 0
+        delta = Case(
+            *[When(producto_id=pid, then=Value(cantidad)) for pid, cantidad in diferencias.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        with transaction.atomic():
+            updated = Product.objects.filter(producto_id__in=list(diferencias)).update(
+                cantidad=Coalesce(F("cantidad"), Value(0)) + delta
+            )
+            StockLedgerService().record(MovimientoStock.TIPO_CONCILIACION, diferencias)
+            bump_data_version("productos")
+        return updated
+
+
 class PurchaseService:
     """
     Servicio para manejar cabeceras y detalles de compras.
@@ -111,34 +762,254 @@ class PurchaseService:
     def list_purchases(self) -> Iterable[Compra]:
         return Compra.objects.select_related("proveedor").prefetch_related("detalles__producto").order_by("-compra_id")
 
-    def create_purchase(self, header: dict, detalles: Sequence[dict]) -> Compra:
+    def filter_purchases(
+        self,
+        proveedor_id: Optional[int] = None,
+        fecha_desde=None,
+        fecha_hasta=None,
+        estado: Optional[str] = None,
+    ) -> QuerySet:
+        qs = Compra.objects.all()
+        if proveedor_id:
+            qs = qs.filter(proveedor_id=proveedor_id)
+        if fecha_desde:
+            qs = qs.filter(fecha_pedido__gte=fecha_desde)
+        if fecha_hasta:
+            qs = qs.filter(fecha_pedido__lte=fecha_hasta)
+        if estado:
+            qs = qs.filter(estado=estado)
+        return qs
+
+    def list_purchases_page(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        **filters,
+    ) -> Tuple[list, Optional[str]]:
+        """
+        Página del historial de compras (sólo cabeceras, proyectadas con
+        ``values()``), de la más reciente a la más antigua. Los detalles se
+        piden aparte con ``purchase_detail``.
+        """
+        qs = self.filter_purchases(**filters).values(
+            "compra_id",
+            "proveedor_id",
+            "proveedor__razon_social",
+            "numero_factura",
+            "fecha_pedido",
+            "subtotal_general",
+            "iva_15",
+            "iva_5",
+            "total_pagar",
+            "abono",
+            "saldo",
+            "estado",
+        )
+        return paginate_keyset(qs, PURCHASE_HISTORY_ORDERING, cursor=cursor, limit=limit)
+
+    @staticmethod
+    def serialize_purchase_summary(row: dict) -> dict:
+        return {
+            "compra_id": row["compra_id"],
+            "proveedor_id": row["proveedor_id"],
+            "proveedor": row["proveedor__razon_social"],
+            "numero_factura": row["numero_factura"],
+            "fecha_pedido": row["fecha_pedido"].isoformat() if row["fecha_pedido"] else None,
+            "subtotal": float(row["subtotal_general"] or 0),
+            "iva": float((row["iva_15"] or 0) + (row["iva_5"] or 0)),
+            "total": float(row["total_pagar"] or 0),
+            "abono": float(row["abono"] or 0),
+            "saldo": float(row["saldo"] or 0),
+            "estado": row["estado"],
+        }
+
+    def purchase_detail(self, compra_id: int) -> Optional[list]:
+        """
+        Líneas de una compra para cargarlas bajo demanda. Devuelve None si la
+        compra no existe.
+        """
+        detalles = list(
+            CompraDetalle.objects.filter(compra_id=compra_id)
+            .order_by("detalle_id")
+            .values(
+                "detalle_id",
+                "producto_id",
+                "producto__nombre",
+                "marca",
+                "codigo",
+                "descripcion",
+                "cantidad",
+                "precio_unitario",
+                "tarifa_iva",
+                "descuento",
+                "valor_total",
+            )
+        )
+        if not detalles and not Compra.objects.filter(compra_id=compra_id).exists():
+            return None
+        return [
+            {
+                "detalle_id": det["detalle_id"],
+                "producto_id": det["producto_id"],
+                "producto": det["producto__nombre"],
+                "marca": det["marca"],
+                "codigo": det["codigo"],
+                "descripcion": det["descripcion"],
+                "cantidad": det["cantidad"],
+                "precio_unitario": float(det["precio_unitario"] or 0),
+                "tarifa_iva": float(det["tarifa_iva"] or 0),
+                "descuento": float(det["descuento"] or 0),
+                "valor_total": float(det["valor_total"] or 0),
+            }
+            for det in detalles
+        ]
+
+    def validate_purchase(
+        self,
+        header: dict,
+        detalles: Sequence[dict],
+        nuevos_productos: Sequence[dict] = (),
+    ) -> ValidatedPurchase:
+        """
+        Valida una compra antes de registrarla: proveedor, productos
+        existentes, proveedor de cada línea y abono. Resuelve el proveedor y
+        todos los productos con una consulta cada uno y lanza
+        ``PurchaseValidationError`` con todos los problemas encontrados.
+        Devuelve el proveedor y los totales para pasarlos a ``create_purchase``
+        sin volver a buscarlos ni calcularlos.
+        """
+        proveedor = Proveedor.objects.filter(proveedor_id=header.get("proveedor_id")).first()
+        if not proveedor:
+            raise PurchaseValidationError(["Proveedor no encontrado."])
+
+        errores = []
+        razon_social = proveedor.razon_social
+        producto_ids = {det["producto_id"] for det in detalles if det.get("producto_id")}
+        productos = {
+            row["producto_id"]: row
+            for row in Product.objects.filter(producto_id__in=producto_ids).values(
+                "producto_id", "nombre", "proveedor_id", "distribuidor"
+            )
+        }
+        for linea, det in enumerate(detalles, start=1):
+            producto_id = det.get("producto_id")
+            if not producto_id:
+                continue
+            producto = productos.get(producto_id)
+            if producto is None:
+                errores.append(f"Línea {linea}: el producto {producto_id} no existe.")
+                continue
+            if producto["proveedor_id"] is not None:
+                coincide = producto["proveedor_id"] == proveedor.proveedor_id
+            else:
+                # Productos aún sin proveedor_id: se compara el texto heredado.
+                coincide = not producto["distribuidor"] or (
+                    _supplier_key(producto["distribuidor"]) == _supplier_key(razon_social)
+                )
+            if not coincide:
+                errores.append(
+                    f"Línea {linea}: el producto '{producto['nombre']}' pertenece al distribuidor "
+                    f"'{producto['distribuidor'] or 'otro proveedor'}', no a '{razon_social}'."
+                )
+
+        for data in nuevos_productos:
+            distribuidor = data.get("distribuidor")
+            if distribuidor and _supplier_key(distribuidor) != _supplier_key(razon_social):
+                errores.append(
+                    f"El producto nuevo '{data['nombre']}' indica el distribuidor '{distribuidor}', "
+                    f"no '{razon_social}'."
+                )
+
+        totals = self._compute_totals(header, detalles)
+        total = totals["header"]["total_pagar"]
+        abono = totals["header"]["abono"]
+        if abono > total:
+            errores.append(f"El abono (${abono:.2f}) no puede ser mayor al total (${total:.2f}).")
+
+        if errores:
+            raise PurchaseValidationError(errores)
+        return ValidatedPurchase(proveedor, totals)
+
+    def create_purchase(
+        self,
+        header: dict,
+        detalles: Sequence[dict],
+        proveedor: Optional[Proveedor] = None,
+        totals: Optional[dict] = None,
+    ) -> Compra:
         """
         header: dict con campos de compra.
         detalles: lista de dicts con producto_id, cantidad, precio_unitario, tarifa_iva, descuento, etc.
+        proveedor y totals: los de ``validate_purchase``, para no volver a
+        buscar el proveedor ni recalcular los totales.
+
+        Registra la compra en un número fijo de consultas sin importar cuántas
+        líneas tenga: proveedor, productos (un ``in_bulk``), cabecera,
+        detalles (``bulk_create``), un único UPDATE de stock y el INSERT de
+        los movimientos en el libro de stock.
         """
-        proveedor = Proveedor.objects.filter(proveedor_id=header.get("proveedor_id")).first()
+        if proveedor is None:
+            proveedor = Proveedor.objects.filter(proveedor_id=header.get("proveedor_id")).first()
         if not proveedor:
             raise ValueError("Proveedor no encontrado.")
 
+        if totals is None:
+            totals = self._compute_totals(header, detalles)
+        else:
+            # Las líneas de productos nuevos reciben producto_id (y marca o
+            # código por defecto) después de validar; los montos no cambian.
+            for linea, det in zip(totals["detalles"], detalles):
+                for campo in ("producto_id", "marca", "codigo", "descripcion"):
+                    linea[campo] = det.get(campo)
+            totals["detalles_por_producto"] = self._cantidades_por_producto(totals["detalles"])
+        producto_ids = {det["producto_id"] for det in totals["detalles"]}
+        productos = Product.objects.in_bulk(list(producto_ids), field_name="producto_id")
+        faltantes = sorted(str(pid) for pid in producto_ids if pid not in productos)
+        if faltantes:
+            raise ValueError(f"Producto no encontrado: {', '.join(faltantes)}.")
+
         with transaction.atomic():
-            compra = Compra.objects.create(proveedor=proveedor, **self._compute_totals(header, detalles)["header"])
-
-            # Crear detalles y actualizar inventario
-            for det_payload in self._compute_totals(header, detalles)["detalles"]:
-                producto = Product.objects.filter(producto_id=det_payload.pop("producto_id")).first()
-                if not producto:
-                    raise ValueError("Producto no encontrado.")
-                
-                # Crear el detalle de compra
-                detalle = CompraDetalle.objects.create(compra=compra, producto=producto, **det_payload)
-                
-                # Actualizar el stock del producto en el inventario
-                cantidad_anterior = producto.cantidad or 0
-                producto.cantidad = cantidad_anterior + detalle.cantidad
-                producto.save()
+            compra = Compra.objects.create(proveedor=proveedor, **totals["header"])
+            CompraDetalle.objects.bulk_create(
+                [
+                    CompraDetalle(compra=compra, producto=productos[det.pop("producto_id")], **det)
+                    for det in totals["detalles"]
+                ],
+                batch_size=DETAIL_BATCH_SIZE,
+            )
+            self._increment_stock(totals["detalles_por_producto"])
+            StockLedgerService().record(
+                MovimientoStock.TIPO_COMPRA, totals["detalles_por_producto"], referencia_id=compra.compra_id
+            )
+            bump_data_version("compras", "productos")
 
         return compra
 
+    def _increment_stock(self, cantidades: dict) -> None:
+        """
+        Suma lo comprado al inventario con un único
+        UPDATE ... SET cantidad = COALESCE(cantidad, 0) + x.
+        """
+        cantidades = {pid: cantidad for pid, cantidad in cantidades.items() if cantidad}
+        if not cantidades:
+            return
+        delta = Case(
+            *[When(producto_id=pid, then=Value(cantidad)) for pid, cantidad in cantidades.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        Product.objects.filter(producto_id__in=list(cantidades)).update(
+            cantidad=Coalesce(F("cantidad"), Value(0)) + delta
+        )
+
+    @staticmethod
+    def _cantidades_por_producto(detalles: Sequence[dict]) -> dict:
+        cantidades: dict = {}
+        for det in detalles:
+            pid = det["producto_id"]
+            cantidades[pid] = cantidades.get(pid, 0) + det["cantidad"]
+        return cantidades
+
     def _compute_totals(self, header: dict, detalles: Sequence[dict]) -> dict:
         subtotal_general = Decimal(0)
         subtotal_15 = Decimal(0)
@@ -186,6 +1057,8 @@ class PurchaseService:
                 }
             )
 
+        detalles_por_producto = self._cantidades_por_producto(detalles_out)
+
         total_pagar = subtotal_general + iva_15 + iva_5
         abono = Decimal(header.get("abono") or 0)
         saldo = total_pagar - abono
@@ -217,4 +1090,107 @@ class PurchaseService:
             "estado": header.get("estado") or "borrador",
         }
 
-        return {"header": header_out, "detalles": detalles_out}
+        return {"header": header_out, "detalles": detalles_out, "detalles_por_producto": detalles_por_producto}
+
+
+class PayablesAgingService:
+    """
+    Antigüedad de saldos de cuentas por pagar: lo adeudado en compras
+    (``Compra.saldo > 0``) por proveedor, repartido en tramos de 0-30, 31-60,
+    61-90 y más de 90 días desde la fecha de pedido. La antigüedad no
+    descuenta el plazo de pago del proveedor (``plazo_pago_dias`` se informa
+    aparte), así que no equivale a días de mora; el reporte lo indica en
+    ``base``. Un pedido con fecha futura cae en 0-30. Es una única consulta
+    agrupada (apoyada en idx_compras_proveedor_saldo) cuyo resultado se
+    guarda en la caché bajo la versión de datos "compras", así que se
+    recalcula sólo cuando se registra una compra o cambia el día.
+    """
+
+    BUCKETS = (("0_30", 0, 30), ("31_60", 31, 60), ("61_90", 61, 90))
+    BUCKET_MAS_90 = "mas_90"
+    # Fecha desde la que se cuentan los días de cada compra.
+    BASE = "fecha_pedido"
+    # Acota la vida del resultado si las compras se editan fuera de los servicios.
+    timeout = 60 * 60
+    money = DecimalField(max_digits=16, decimal_places=2)
+
+    def _key(self, version: int, hoy) -> str:
+        return f"payables-aging:{self.BASE}:v{version}:{hoy.isoformat()}"
+
+    def _sum(self, condition: Optional[Q] = None):
+        return Coalesce(Sum("saldo", filter=condition), Value(Decimal(0)), output_field=self.money)
+
+    def _build(self, hoy) -> dict:
+        # Sin fecha de pedido se usa la de registro; sin ninguna de las dos,
+        # la compra cae en el tramo más antiguo.
+        fecha = Coalesce("fecha_pedido", TruncDate("created_at"))
+        tramos = {}
+        for nombre, desde, hasta in self.BUCKETS:
+            tramos[f"tramo_{nombre}"] = self._sum(
+                Q(fecha_ref__gte=hoy - timedelta(days=hasta))
+                & (Q(fecha_ref__lte=hoy - timedelta(days=desde)) if desde else Q())
+            )
+        tramos[f"tramo_{self.BUCKET_MAS_90}"] = self._sum(
+            Q(fecha_ref__lt=hoy - timedelta(days=90)) | Q(fecha_ref__isnull=True)
+        )
+        filas = list(
+            Compra.objects.filter(saldo__gt=0)
+            .annotate(fecha_ref=fecha)
+            .values("proveedor_id", "proveedor__razon_social", "proveedor__plazo_pago_dias")
+            .annotate(total=self._sum(), compras=Count("compra_id"), mas_antigua=Min("fecha_ref"), **tramos)
+            .order_by("-total", "proveedor_id")
+        )
+        columnas = ["total", *tramos]
+        totales = {col: sum((fila[col] for fila in filas), Decimal(0)) for col in columnas}
+        totales["compras"] = sum(fila["compras"] for fila in filas)
+        proveedores = [
+            {
+                "proveedor_id": fila["proveedor_id"],
+                "proveedor": fila["proveedor__razon_social"],
+                "plazo_pago_dias": fila["proveedor__plazo_pago_dias"],
+                "compras": fila["compras"],
+                "mas_antigua": fila["mas_antigua"],
+                "total": fila["total"],
+                "tramos": {col.removeprefix("tramo_"): fila[col] for col in tramos},
+            }
+            for fila in filas
+        ]
+        return {
+            "fecha": hoy,
+            "base": self.BASE,
+            "proveedores": proveedores,
+            "total": totales["total"],
+            "compras": totales["compras"],
+            "tramos": {col.removeprefix("tramo_"): totales[col] for col in tramos},
+        }
+
+    def aging(self, hoy=None) -> dict:
+        hoy = hoy or timezone.localdate()
+        key = self._key(get_data_version("compras"), hoy)
+        report = cache.get(key)
+        if report is None:
+            report = self._build(hoy)
+            cache.set(key, report, timeout=self.timeout)
+        return report
+
+    @staticmethod
+    def serialize(report: dict) -> dict:
+        def money(value) -> float:
+            return float(value or 0)
+
+        return {
+            "fecha": report["fecha"].isoformat(),
+            "base": report["base"],
+            "total": money(report["total"]),
+            "compras": report["compras"],
+            "tramos": {nombre: money(valor) for nombre, valor in report["tramos"].items()},
+            "proveedores": [
+                {
+                    **fila,
+                    "mas_antigua": fila["mas_antigua"].isoformat() if fila["mas_antigua"] else None,
+                    "total": money(fila["total"]),
+                    "tramos": {nombre: money(valor) for nombre, valor in fila["tramos"].items()},
+                }
+                for fila in report["proveedores"]
+            ],
+        }
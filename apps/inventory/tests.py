@@ -1,2 +1,225 @@
-from django.test import TestCase
+import importlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 
+from django.db import connection
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.sales.models import Sale, SaleDetail
+from apps.shared.testing import LOCMEM_CACHE, LegacyTablesMixin
+
+from .models import Compra, CompraDetalle, MovimientoStock, Product, Proveedor, SnapshotStock
+from .services import (
+    PayablesAgingService,
+    ProductService,
+    PurchaseService,
+    StockLedgerService,
+    StockReconciliationService,
+)
+
+LEGACY_MODELS = (Proveedor, Product, Compra, CompraDetalle)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CreatePurchaseQueriesTests(LegacyTablesMixin, TestCase):
+    legacy_models = LEGACY_MODELS
+
+    # in_bulk de productos, savepoint, cabecera, detalles, UPDATE de stock,
+    # movimientos del libro y liberación del savepoint.
+    EXPECTED_QUERIES = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(
+            codigo_proveedor="PRV-TEST", razon_social="Proveedor de prueba", rut="0999999999001"
+        )
+        cls.productos = [
+            Product.objects.create(nombre=f"Producto {idx}", cantidad=5, estado=True, proveedor=cls.proveedor)
+            for idx in range(25)
+        ]
+
+    def _detalles(self, size: int) -> list:
+        return [
+            {
+                "producto_id": producto.producto_id,
+                "cantidad": Decimal(2),
+                "precio_unitario": Decimal("10.00"),
+                "tarifa_iva": Decimal("0.15"),
+                "descuento": Decimal(0),
+            }
+            for producto in self.productos[:size]
+        ]
+
+    def test_query_count_does_not_depend_on_lines(self):
+        header = {"proveedor_id": self.proveedor.proveedor_id, "abono": Decimal(0)}
+        service = PurchaseService()
+        for size in (1, len(self.productos)):
+            with self.subTest(lineas=size):
+                with self.assertNumQueries(self.EXPECTED_QUERIES):
+                    compra = service.create_purchase(header, self._detalles(size), proveedor=self.proveedor)
+                self.assertEqual(compra.detalles.count(), size)
+                self.assertEqual(MovimientoStock.objects.filter(referencia_id=compra.compra_id).count(), size)
+
+    def test_stock_is_incremented_for_every_line(self):
+        header = {"proveedor_id": self.proveedor.proveedor_id}
+        PurchaseService().create_purchase(header, self._detalles(len(self.productos)), proveedor=self.proveedor)
+        cantidades = Product.objects.filter(producto_id__in=[p.producto_id for p in self.productos])
+        self.assertEqual(set(cantidades.values_list("cantidad", flat=True)), {7})
+
+    def test_validated_totals_are_reused(self):
+        service = PurchaseService()
+        header = {"proveedor_id": self.proveedor.proveedor_id, "abono": Decimal("5.00")}
+        detalles = self._detalles(3)
+        validada = service.validate_purchase(header, detalles)
+        self.assertEqual(validada.proveedor, self.proveedor)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            compra = service.create_purchase(header, detalles, proveedor=validada.proveedor, totals=validada.totals)
+        self.assertEqual(compra.total_pagar, Decimal("69.00"))
+        self.assertEqual(compra.saldo, Decimal("64.00"))
+
+
+class StockLedgerCompactTests(LegacyTablesMixin, TestCase):
+    legacy_models = LEGACY_MODELS
+
+    def test_on_hand_is_the_same_before_and_after_compacting(self):
+        ledger = StockLedgerService()
+        ledger.record(MovimientoStock.TIPO_INICIAL, {1: 10, 2: 4})
+        ledger.record(MovimientoStock.TIPO_VENTA, {1: -3})
+        antes = ledger.on_hand()
+
+        self.assertEqual(ledger.compact(), 2)
+        self.assertEqual(ledger.on_hand(), antes)
+        self.assertEqual(ledger.compact(), 0)
+
+        ledger.record(MovimientoStock.TIPO_COMPRA, {2: 6})
+        self.assertEqual(ledger.on_hand(), {1: 7, 2: 10})
+        self.assertEqual(ledger.compact(), 1)
+        self.assertEqual(SnapshotStock.objects.filter(producto_id=2).latest("snapshot_id").cantidad, 10)
+
+
+class StockLedgerOpeningMigrationTests(LegacyTablesMixin, TestCase):
+    legacy_models = LEGACY_MODELS
+
+    def _migrar(self):
+        migration = importlib.import_module("apps.inventory.migrations.0008_stock_ledger_apertura")
+        migration.seed_opening_balances(None, SimpleNamespace(connection=connection))
+
+    def test_opening_balances_match_products(self):
+        vendido = Product.objects.create(nombre="Vendido tras el despliegue", cantidad=9, estado=True)
+        intacto = Product.objects.create(nombre="Sin movimientos", cantidad=4, estado=True)
+        Product.objects.create(nombre="Sin stock", cantidad=0, estado=True)
+        ledger = StockLedgerService()
+        ledger.record(MovimientoStock.TIPO_VENTA, {vendido.producto_id: -1})
+        self.assertEqual(ledger.on_hand(), {vendido.producto_id: -1})
+
+        self._migrar()
+        self.assertEqual(ledger.on_hand(), {vendido.producto_id: 9, intacto.producto_id: 4})
+        self.assertEqual(MovimientoStock.objects.filter(tipo=MovimientoStock.TIPO_APERTURA).count(), 2)
+
+        self._migrar()
+        self.assertEqual(ledger.seed_from_products(), 0)
+        self.assertEqual(MovimientoStock.objects.filter(tipo=MovimientoStock.TIPO_APERTURA).count(), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StockReconciliationTests(LegacyTablesMixin, TestCase):
+    legacy_models = LEGACY_MODELS + (Sale, SaleDetail)
+
+    def _diferencias(self) -> dict:
+        return {row["producto_id"]: row for row in StockReconciliationService().iter_discrepancies()}
+
+    def test_manual_stock_counts_as_expected(self):
+        productos = ProductService()
+        datos = {"costo_unitario": "2", "estado": True}
+        alta = productos.create_product({"nombre": "Alta con stock", "cantidad": 5, **datos})
+        editado = productos.create_product({"nombre": "Editado", "cantidad": 0, **datos})
+        productos.update_product(editado.producto_id, {"cantidad": 8})
+        self.assertEqual(self._diferencias(), {})
+        self.assertEqual(
+            StockLedgerService().on_hand([alta.producto_id, editado.producto_id]),
+            {alta.producto_id: 5, editado.producto_id: 8},
+        )
+
+    def test_repair_fixes_untracked_changes_once(self):
+        producto = ProductService().create_product({"nombre": "Tocado", "cantidad": 3, "costo_unitario": "1"})
+        Product.objects.filter(pk=producto.pk).update(cantidad=10)
+        fila = self._diferencias()[producto.producto_id]
+        self.assertEqual((fila["esperado"], fila["diferencia"], fila["reparable"]), (3, -7, True))
+
+        StockReconciliationService().repair({producto.producto_id: fila["diferencia"]})
+        self.assertEqual(Product.objects.get(pk=producto.pk).cantidad, 3)
+        self.assertEqual(self._diferencias(), {})
+
+    def test_opening_balance_is_reported_but_not_repairable(self):
+        producto = Product.objects.create(nombre="Anterior al libro", cantidad=12, estado=True)
+        StockLedgerService().seed_from_products()
+        fila = self._diferencias()[producto.producto_id]
+        self.assertEqual((fila["esperado"], fila["reparable"]), (0, False))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PayablesAgingTests(LegacyTablesMixin, TestCase):
+    legacy_models = LEGACY_MODELS
+    HOY = date(2024, 6, 30)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(
+            codigo_proveedor="PRV-AGING", razon_social="Proveedor", rut="0999999999002", plazo_pago_dias=30
+        )
+
+    def _compra(self, saldo, dias=None, **kwargs) -> Compra:
+        if dias is not None:
+            kwargs["fecha_pedido"] = self.HOY - timedelta(days=dias)
+        return Compra.objects.create(proveedor=self.proveedor, total_pagar=saldo, saldo=saldo, **kwargs)
+
+    def _tramos(self) -> dict:
+        # Sin caché: las compras de la prueba no pasan por los servicios.
+        return PayablesAgingService()._build(self.HOY)["tramos"]
+
+    def test_bucket_edges(self):
+        casos = (
+            (0, "0_30"),
+            (30, "0_30"),
+            (31, "31_60"),
+            (60, "31_60"),
+            (61, "61_90"),
+            (90, "61_90"),
+            (91, "mas_90"),
+        )
+        for dias, tramo in casos:
+            with self.subTest(dias=dias):
+                Compra.objects.all().delete()
+                self._compra(Decimal("10.00"), dias)
+                tramos = self._tramos()
+                self.assertEqual(tramos[tramo], Decimal("10.00"))
+                self.assertEqual(sum(tramos.values()), Decimal("10.00"))
+
+    def test_created_at_is_used_without_order_date(self):
+        registro = timezone.make_aware(datetime.combine(self.HOY - timedelta(days=45), datetime.min.time()))
+        self._compra(Decimal("7.00"), created_at=registro)
+        self._compra(Decimal("3.00"))
+        tramos = self._tramos()
+        self.assertEqual((tramos["31_60"], tramos["mas_90"]), (Decimal("7.00"), Decimal("3.00")))
+
+    def test_future_order_date_is_in_first_bucket(self):
+        self._compra(Decimal("5.00"), -10)
+        self._compra(Decimal("0.00"), 200)
+        report = PayablesAgingService().aging(hoy=self.HOY)
+        self.assertEqual(report["tramos"]["0_30"], Decimal("5.00"))
+        self.assertEqual((report["total"], report["compras"]), (Decimal("5.00"), 1))
+
+    def test_api_states_the_aging_base(self):
+        self._compra(Decimal("5.00"), 40)
+        user = User.objects.create_user("admin-web", password="x")
+        self.client.force_login(user)
+        session = self.client.session
+        session["rol"] = "Administrador"
+        session.save()
+        meta = self.client.get(reverse("product_html:antiguedad_saldos_api")).json()["meta"]
+        self.assertEqual(meta["base"], "fecha_pedido")
+        self.assertEqual((meta["total"], meta["compras"]), (5.0, 1))
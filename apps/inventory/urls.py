@@ -7,13 +7,20 @@ app_name = "product_html"
 urlpatterns = [
     path("dashboard/", views.dashboard, name="dashboard"),
     path("", views.productos, name="productos"),
+    path("buscar/", views.buscar_productos_api, name="buscar_productos_api"),
     path("eliminados/", views.productos_eliminados, name="productos_eliminados"),
     path("edit/<int:product_id>/", views.editar_producto, name="editar_producto"),
     path("delete/<int:product_id>/", views.eliminar_producto, name="eliminar_producto"),
     path("restore/<int:product_id>/", views.restaurar_producto, name="restaurar_producto"),
+    path("analitica/", views.analitica_productos_api, name="analitica_productos_api"),
+    path("stock/", views.stock_historico_api, name="stock_historico_api"),
     path("proveedores/", views.lista_proveedores, name="lista_proveedores"),
     path("exportar-excel/", views.exportar_inventario_excel, name="exportar_inventario_excel"),
     path("compras/", views.compras, name="compras"),
+    path("compras/api/", views.compras_api, name="compras_api"),
+    path("compras/antiguedad-saldos/", views.antiguedad_saldos_api, name="antiguedad_saldos_api"),
     path("compras/<int:compra_id>/", views.detalle_compra, name="detalle_compra"),
+    path("compras/<int:compra_id>/detalles/", views.detalle_compra_api, name="detalle_compra_api"),
     path("compras/exportar-excel/", views.exportar_compras_excel, name="exportar_compras_excel"),
+    path("compras/exportar-excel/trabajo/", views.exportar_compras_trabajo, name="exportar_compras_trabajo"),
 ]
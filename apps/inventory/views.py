@@ -1,26 +1,63 @@
 from __future__ import annotations
 
 import json
-from datetime import datetime
+import logging
+from datetime import datetime, time
 from decimal import Decimal
-from io import BytesIO
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
 from apps.sales.services import SaleService
-
+from apps.shared.export_jobs import register_export
+from apps.shared.exports import (
+    Column,
+    Sheet,
+    as_date,
+    as_float,
+    as_int,
+    as_text,
+    export_response,
+    requested_format,
+)
+from apps.shared.pagination import clamp_limit
+from apps.shared.views import start_export_job
+
+from .analytics import (
+    DEFAULT_COBERTURA,
+    DEFAULT_DIAS,
+    DEFAULT_PLAZO_ENTREGA,
+    DEFAULT_VENTANA,
+    ProductVelocityService,
+)
 from .models import Proveedor, Compra, CompraDetalle, Product
-from .services import ProductService, PurchaseService
-from openpyxl import Workbook
+from .services import (
+    InventoryStatsService,
+    PayablesAgingService,
+    ProductSearchService,
+    ProductService,
+    PurchaseService,
+    PurchaseValidationError,
+    StockLedgerService,
+    with_precio_iva,
+)
+
+logger = logging.getLogger(__name__)
 
 
 product_service = ProductService()
+product_search = ProductSearchService()
+product_velocity = ProductVelocityService()
+payables_aging = PayablesAgingService()
 sale_service = SaleService()
 purchase_service = PurchaseService()
+inventory_stats = InventoryStatsService()
 
 
 def _require_admin(request):
@@ -62,35 +99,31 @@ def _clean_date(value: str | None):
         return None
 
 
-def _attach_precio_iva(productos):
-    iva_factor = Decimal("1.15")
-    for p in productos:
-        base = p.costo_unitario or Decimal(0)
-        p.precio_iva = (base * iva_factor).quantize(Decimal("0.01"))
-    return productos
-
-
 @login_required
 def dashboard(request):
     redirect_response = _require_admin(request)
     if redirect_response:
         return redirect_response
 
-    productos = list(product_service.list_products())
-    _attach_precio_iva(productos)
-    stock_total = sum(p.cantidad or 0 for p in productos)
-    productos_bajo_stock = [p for p in productos if (p.cantidad or 0) <= 10]
+    stats = inventory_stats.summary()
+    ventas_hoy = sale_service.daily_summary()
+    pagos = payables_aging.aging()
     ventas_recientes = list(sale_service.get_all_sales_with_details()[:5])
 
     return render(
         request,
         "dashboard.html",
         {
-            "stock_total_productos": stock_total,
-            "productos_bajo_stock": productos_bajo_stock,
-            "total_ventas_hoy": 0,
+            "stock_total_productos": stats["total_stock"],
+            "productos_bajo_stock": inventory_stats.low_stock_products(stats["umbral_stock_bajo"]),
+            "umbral_stock_bajo": stats["umbral_stock_bajo"],
+            "valor_inventario": stats["valor_inventario"],
+            "total_ventas_hoy": ventas_hoy["total"],
+            "productos_vendidos_hoy": ventas_hoy["unidades"],
             "ventas_recientes": ventas_recientes,
-            "pagos_pendientes": 0,
+            "pagos_pendientes": pagos["total"],
+            "compras_con_saldo": pagos["compras"],
+            "cuentas_por_pagar": pagos,
         },
     )
 
@@ -125,18 +158,80 @@ def productos(request):
         except Exception as exc:
             messages.error(request, f"Ocurrió un error al crear el producto: {exc}")
 
-    products = list(product_service.list_products())
-    _attach_precio_iva(products)
+    products = with_precio_iva(product_service.list_products())
     return render(request, "productos.html", {"products": products})
 
 
+@login_required
+@require_GET
+def buscar_productos_api(request):
+    """
+    Autocompletado de productos: ``?q=`` (palabras sobre nombre, código, marca
+    y distribuidor), ``limit``, ``cursor`` y ``distribuidor`` opcional.
+    """
+    if request.session.get("rol") not in ("Administrador", "Vendedor"):
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    rows, next_cursor = product_search.search(
+        request.GET.get("q", ""),
+        limit=clamp_limit(request.GET.get("limit"), default=20, maximum=100),
+        cursor=request.GET.get("cursor"),
+        distribuidor=request.GET.get("distribuidor") or None,
+    )
+    return JsonResponse(
+        {
+            "success": True,
+            "data": [product_search.serialize(row) for row in rows],
+            "meta": {"count": len(rows), "next_cursor": next_cursor},
+        }
+    )
+
+
+def _bounded_int(value, default: int, minimum: int, maximum: int) -> int:
+    return min(max(_clean_int(value) or default, minimum), maximum)
+
+
+@login_required
+@require_GET
+def analitica_productos_api(request):
+    """
+    Más vendidos y sugerencias de reposición por proveedor. Parámetros:
+    ``dias`` (período analizado), ``ventana`` (días de la media móvil),
+    ``cobertura`` y ``plazo`` (días a cubrir y de entrega) y ``top``.
+    """
+    if request.session.get("rol") != "Administrador":
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    dias = _bounded_int(request.GET.get("dias"), DEFAULT_DIAS, 7, 730)
+    report = product_velocity.compute(
+        dias=dias,
+        ventana=_bounded_int(request.GET.get("ventana"), DEFAULT_VENTANA, 1, dias),
+        cobertura=_bounded_int(request.GET.get("cobertura"), DEFAULT_COBERTURA, 1, 365),
+        plazo_entrega=_bounded_int(request.GET.get("plazo"), DEFAULT_PLAZO_ENTREGA, 1, 180),
+    )
+    return JsonResponse(
+        {
+            "success": True,
+            "data": {
+                "top_vendidos": product_velocity.top_sellers(
+                    report, clamp_limit(request.GET.get("top"), default=20, maximum=100)
+                ),
+                "reposicion": product_velocity.reorder_by_supplier(report),
+            },
+            "meta": {
+                "desde": report.desde.isoformat(),
+                "hasta": report.hasta.isoformat(),
+                "ventana": report.ventana,
+                "productos": len(report.productos),
+            },
+        }
+    )
+
+
 @login_required
 def productos_eliminados(request):
     redirect_response = _require_admin(request)
     if redirect_response:
         return redirect_response
-    deleted = list(product_service.list_products(include_deleted=True, only_deleted=True))
-    _attach_precio_iva(deleted)
+    deleted = with_precio_iva(product_service.list_products(include_deleted=True, only_deleted=True))
     return render(request, "productos.html", {"products": [], "deleted_products": deleted})
 
 
@@ -197,13 +292,55 @@ def restaurar_producto(request, product_id: int):
     return redirect("product_html:productos_eliminados")
 
 
+def _estado_label(value) -> str:
+    if isinstance(value, bool):
+        return "Activo" if value else "Inactivo"
+    return value or "Activo"
+
+
+def _costo_con_iva(row: dict) -> float:
+    base_cost = Decimal(str(row.get("costo_unitario", 0) or 0))
+    return float((base_cost * Decimal("1.15")).quantize(Decimal("0.01")))
+
+
+INVENTORY_EXPORT_COLUMNS = [
+    Column("Fecha", "fecha", as_date("%d/%m/%Y")),
+    Column("Nombre", "nombre", as_text),
+    Column("Distribuidor", "distribuidor", as_text),
+    Column("Marca", "marca", as_text),
+    Column("Material", "material", as_text),
+    Column("Tipo Armazón", "tipo_armazon", as_text),
+    Column("Código", "codigo", as_text),
+    Column("Diámetro 1", "diametro_1", as_text),
+    Column("Diámetro 2", "diametro_2", as_text),
+    Column("Color", "color", as_text),
+    Column("Cantidad", "cantidad", as_int),
+    Column("Costo Unitario", "costo_unitario", as_float),
+    Column("Costo Unitario + IVA", value=_costo_con_iva, requires=("costo_unitario",)),
+    Column("Costo Total", "costo_total", as_float),
+    Column("Venta 1", "costo_venta_1", as_float),
+    Column("Venta 2", "costo_venta_2", as_float),
+    Column("Estado", "estado", _estado_label),
+]
+
+
+@register_export("inventario", models=(Product,), namespaces=("productos",))
+def build_inventario_export(params) -> tuple[list[Sheet], str]:
+    sheet = Sheet(
+        "Inventario",
+        product_service.list_products().order_by("producto_id"),
+        INVENTORY_EXPORT_COLUMNS,
+    )
+    return [sheet], f"inventario_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
 @login_required
 @csrf_exempt
 def exportar_inventario_excel(request):
     """
-    Genera un XLSX con los productos.
+    Genera un XLSX (o CSV con ``?formato=csv``) con los productos.
     - Si el frontend envía un JSON con "productos" (filtrados), se usa tal cual.
-    - Si no, se exporta todo el inventario desde la base de datos.
+    - Si no, se exporta todo el inventario desde la base de datos en streaming.
     """
     redirect_response = _require_admin(request)
     if redirect_response:
@@ -217,91 +354,40 @@ def exportar_inventario_excel(request):
         except json.JSONDecodeError:
             productos_json = []
 
-    if not productos_json:
-        productos = product_service.list_products()
-        productos_json = [
-            {
-                "fecha": p.fecha.strftime("%d/%m/%Y") if p.fecha else "",
-                "nombre": p.nombre,
-                "distribuidor": p.distribuidor or "",
-                "marca": p.marca or "",
-                "material": p.material or "",
-                "tipo_armazon": p.tipo_armazon or "",
-                "codigo": p.codigo or "",
-                "diametro_1": p.diametro_1 or "",
-                "diametro_2": p.diametro_2 or "",
-                "color": p.color or "",
-                "cantidad": p.cantidad or 0,
-                "costo_unitario": float(p.costo_unitario or 0),
-                "costo_total": float(p.costo_total or 0),
-                "costo_venta_1": float(p.costo_venta_1 or 0),
-                "costo_venta_2": float(p.costo_venta_2 or 0),
-                "estado": "Activo" if p.estado else "Inactivo",
-            }
-            for p in productos
-        ]
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Inventario"
-
-    headers = [
-        "Fecha",
-        "Nombre",
-        "Distribuidor",
-        "Marca",
-        "Material",
-        "Tipo Armazón",
-        "Código",
-        "Diámetro 1",
-        "Diámetro 2",
-        "Color",
-        "Cantidad",
-        "Costo Unitario",
-        "Costo Unitario + IVA",
-        "Costo Total",
-        "Venta 1",
-        "Venta 2",
-        "Estado",
-    ]
-    ws.append(headers)
-
-    for item in productos_json:
-        base_cost = Decimal(str(item.get("costo_unitario", 0) or 0))
-        costo_iva = (base_cost * Decimal("1.15")).quantize(Decimal("0.01"))
-        ws.append(
-            [
-                item.get("fecha", ""),
-                item.get("nombre", ""),
-                item.get("distribuidor", ""),
-                item.get("marca", ""),
-                item.get("material", ""),
-                item.get("tipo_armazon", ""),
-                item.get("codigo", ""),
-                item.get("diametro_1", ""),
-                item.get("diametro_2", ""),
-                item.get("color", ""),
-                item.get("cantidad", 0),
-                item.get("costo_unitario", 0),
-                float(costo_iva),
-                item.get("costo_total", 0),
-                item.get("costo_venta_1", 0),
-                item.get("costo_venta_2", 0),
-                item.get("estado", "Activo"),
-            ]
-        )
+    if productos_json:
+        sheets = [Sheet("Inventario", productos_json, INVENTORY_EXPORT_COLUMNS)]
+        filename = f"inventario_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    else:
+        sheets, filename = build_inventario_export({})
+    return export_response(sheets, filename, requested_format(request))
 
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
 
-    filename = f"inventario_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response["Content-Disposition"] = f'attachment; filename=\"{filename}\"'
-    return response
+ESTADOS_COMPRA = ["Pendiente", "Pagado"]
+COMPRAS_PAGE_SIZE = 20
+
+
+def _purchase_filters(params) -> dict:
+    return {
+        "proveedor_id": _clean_int(params.get("proveedor")) or None,
+        "fecha_desde": _clean_date(params.get("desde")),
+        "fecha_hasta": _clean_date(params.get("hasta")),
+        "estado": (params.get("estado") or "").strip() or None,
+    }
+
+
+def _compras_context(request) -> dict:
+    """
+    Contexto de la página de compras: sólo se consulta al renderizar (no al
+    registrar una compra que termina en redirect). Ni el historial ni los
+    productos se cargan aquí: la página pide el historial por páginas a
+    compras_api y cada línea busca sus productos en buscar_productos_api.
+    """
+    return {
+        "proveedores": Proveedor.objects.filter(estado=True).order_by("razon_social"),
+        "filtros": request.GET,
+        "estados": ESTADOS_COMPRA,
+        "today": datetime.now().strftime("%Y-%m-%d"),
+    }
 
 
 @login_required
@@ -310,12 +396,6 @@ def compras(request):
     if redirect_response:
         return redirect_response
 
-    proveedores = Proveedor.objects.filter(estado=True).order_by("razon_social")
-    productos = list(product_service.list_products())
-    compras_list = list(purchase_service.list_purchases())
-    for compra in compras_list:
-        compra.iva_total_calculado = (compra.iva_15 or Decimal(0)) + (compra.iva_5 or Decimal(0))
-
     if request.method == "POST":
         try:
             header = {
@@ -361,17 +441,6 @@ def compras(request):
             # Usar tipos como referencia porque siempre tiene valor (existente o nuevo)
             filas_detalle = len(tipos)
             
-            print("=" * 80)
-            print(f"DEBUG - PROCESANDO DETALLES:")
-            print(f"  Total de filas a procesar: {filas_detalle}")
-            print(f"  Total de tipos recibidos: {len(tipos)}")
-            print(f"  Contenido de tipos: {tipos}")
-            print(f"  Total de productos_ids: {len(productos_ids)}")
-            print(f"  Contenido de productos_ids: {productos_ids}")
-            print(f"  Total de nuevos_nombres: {len(nuevos_nombres)}")
-            print(f"  Contenido de nuevos_nombres: {nuevos_nombres}")
-            print("=" * 80)
-            
             for idx in range(filas_detalle):
                 tipo = tipos[idx] if idx < len(tipos) else "existente"
                 prod_id_raw = productos_ids[idx] if idx < len(productos_ids) else ""
@@ -418,222 +487,228 @@ def compras(request):
             if not detalles:
                 messages.error(request, "Agrega al menos un detalle de producto.")
             else:
-                # DEBUG: Imprimir detalles para verificar
-                print("=" * 80)
-                print(f"TOTAL DE DETALLES RECIBIDOS: {len(detalles)}")
-                for i, det in enumerate(detalles):
-                    print(f"\nDETALLE {i+1}:")
-                    print(f"  Cantidad: {det.get('cantidad')}")
-                    print(f"  Precio unitario: {det.get('precio_unitario')}")
-                    print(f"  Tarifa IVA: {det.get('tarifa_iva')}")
-                    print(f"  Descuento: {det.get('descuento')}")
-                print("=" * 80)
-                
-                # Calcular el total antes de validar el abono
-                total_temp = Decimal(0)
-                for det in detalles:
-                    cantidad = Decimal(det.get("cantidad", 0))
-                    precio_unitario = Decimal(det.get("precio_unitario", 0))
-                    tarifa_iva = Decimal(det.get("tarifa_iva", 0))
-                    descuento = Decimal(det.get("descuento", 0))
-                    
-                    # Subtotal sin IVA ni descuento
-                    subtotal = cantidad * precio_unitario
-                    # Aplicar descuento
-                    subtotal_con_descuento = subtotal - descuento
-                    # Aplicar IVA
-                    total_linea = subtotal_con_descuento * (Decimal(1) + tarifa_iva)
-                    
-                    print(f"Línea: cantidad={cantidad}, precio={precio_unitario}, descuento={descuento}, iva={tarifa_iva}, total_linea={total_linea}")
-                    
-                    total_temp += total_linea
-                
-                print(f"\nTOTAL CALCULADO: ${total_temp:.2f}")
-                print("=" * 80)
-                
-                abono = header.get("abono") or Decimal(0)
-                
-                # Validar que el abono no sea mayor al total
-                if abono > total_temp:
-                    messages.error(request, f"El abono (${abono:.2f}) no puede ser mayor al total (${total_temp:.2f}).")
-                    return render(
-                        request,
-                        "compras.html",
+                # Productos nuevos: se crean todos en un único INSERT.
+                nuevos = [det for det in detalles if det.get("nuevo_producto") is not None]
+                nuevos_data = []
+                for det in nuevos:
+                    nuevo_payload = det.pop("nuevo_producto")
+                    nuevos_data.append(
                         {
-                            "proveedores": proveedores,
-                            "productos": productos,
-                            "compras": compras_list,
-                        },
+                            "fecha": datetime.now(),
+                            "nombre": nuevo_payload["nombre"],
+                            "rubro": nuevo_payload["rubro"],
+                            "distribuidor": nuevo_payload.get("distribuidor"),
+                            "marca": nuevo_payload["marca"],
+                            "material": nuevo_payload["material"],
+                            "tipo_armazon": nuevo_payload["tipo_armazon"],
+                            "codigo": nuevo_payload["codigo"],
+                            "diametro_1": nuevo_payload.get("diametro_1"),
+                            "diametro_2": nuevo_payload.get("diametro_2"),
+                            "color": nuevo_payload["color"],
+                            "cantidad": 0,  # Se crea con 0, la compra sumará la cantidad
+                            "costo_unitario": det["precio_unitario"],
+                            "descripcion": det.get("descripcion"),
+                            "estado": True,
+                        }
                     )
-                
-                proveedor_obj = None
-                if header.get("proveedor_id"):
-                    proveedor_obj = Proveedor.objects.filter(proveedor_id=header["proveedor_id"]).first()
-
-                for det in detalles:
-                    nuevo_payload = det.pop("nuevo_producto", None)
-                    if nuevo_payload is None:
-                        continue
 
+                # Etapa de validación: proveedor, productos y abono en una
+                # consulta cada uno; se informan todos los problemas juntos.
+                validada = purchase_service.validate_purchase(header, detalles, nuevos_data)
+                proveedor_obj = validada.proveedor
+                for data in nuevos_data:
                     # Usar el distribuidor del frontend o el proveedor como fallback
-                    distribuidor_final = nuevo_payload.get("distribuidor") or (proveedor_obj.razon_social if proveedor_obj else None)
-
-                    product_data = {
-                        "fecha": datetime.now(),
-                        "nombre": nuevo_payload["nombre"],
-                        "rubro": nuevo_payload["rubro"],
-                        "distribuidor": distribuidor_final,
-                        "marca": nuevo_payload["marca"],
-                        "material": nuevo_payload["material"],
-                        "tipo_armazon": nuevo_payload["tipo_armazon"],
-                        "codigo": nuevo_payload["codigo"],
-                        "diametro_1": nuevo_payload.get("diametro_1"),
-                        "diametro_2": nuevo_payload.get("diametro_2"),
-                        "color": nuevo_payload["color"],
-                        "cantidad": 0,  # Se crea con 0, la compra sumará la cantidad
-                        "costo_unitario": det["precio_unitario"],
-                        "descripcion": det.get("descripcion"),
-                        "estado": True,
-                    }
-                    nuevo_producto = product_service.create_product(product_data)
-                    det["producto_id"] = nuevo_producto.producto_id
-
-                    if not det.get("marca"):
-                        det["marca"] = nuevo_producto.marca or ""
-                    if not det.get("codigo"):
-                        det["codigo"] = nuevo_producto.codigo or ""
-
-                # Validar que todos los productos pertenezcan al mismo proveedor
-                if proveedor_obj:
-                    proveedor_razon_social = proveedor_obj.razon_social
-                    for det in detalles:
-                        producto_id = det.get("producto_id")
-                        if producto_id:
-                            producto = Product.objects.filter(producto_id=producto_id).first()
-                            if producto and producto.distribuidor:
-                                if producto.distribuidor != proveedor_razon_social:
-                                    raise ValueError(
-                                        f"El producto '{producto.nombre}' pertenece al distribuidor '{producto.distribuidor}', "
-                                        f"pero estás creando una orden para '{proveedor_razon_social}'. "
-                                        f"Todos los productos deben ser del mismo proveedor."
-                                    )
-
-                compra = purchase_service.create_purchase(header, detalles)
+                    data["distribuidor"] = data["distribuidor"] or proveedor_obj.razon_social
+                    data["proveedor"] = proveedor_obj
+
+                # Productos nuevos y compra en una misma transacción: si la compra
+                # falla no quedan productos huérfanos con stock 0.
+                with transaction.atomic():
+                    creados = product_service.create_products(nuevos_data)
+                    for det, nuevo_producto in zip(nuevos, creados):
+                        det["producto_id"] = nuevo_producto.producto_id
+                        if not det.get("marca"):
+                            det["marca"] = nuevo_producto.marca or ""
+                        if not det.get("codigo"):
+                            det["codigo"] = nuevo_producto.codigo or ""
+                    compra = purchase_service.create_purchase(
+                        header, detalles, proveedor=proveedor_obj, totals=validada.totals
+                    )
                 messages.success(request, f"Compra #{compra.compra_id} registrada correctamente.")
                 return redirect("product_html:compras")
+        except PurchaseValidationError as exc:
+            for error in exc.errores:
+                messages.error(request, error)
         except Exception as exc:
-            import traceback
-            print("=" * 80)
-            print("ERROR AL REGISTRAR COMPRA:")
-            print(f"Tipo de error: {type(exc).__name__}")
-            print(f"Mensaje: {exc}")
-            print("\nTraceback completo:")
-            traceback.print_exc()
-            print("=" * 80)
+            logger.exception("Error al registrar compra")
             messages.error(request, f"Error al registrar la compra: {exc}")
 
-    return render(
-        request,
-        "compras.html",
+    return render(request, "compras.html", _compras_context(request))
+
+
+@login_required
+@require_GET
+def compras_api(request):
+    """
+    Historial de compras paginado por cursor. Filtros: ``proveedor``,
+    ``desde``/``hasta`` (fecha de pedido) y ``estado``.
+    """
+    if request.session.get("rol") != "Administrador":
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    compras_list, next_cursor = purchase_service.list_purchases_page(
+        cursor=request.GET.get("cursor"),
+        limit=clamp_limit(request.GET.get("limit"), default=COMPRAS_PAGE_SIZE),
+        **_purchase_filters(request.GET),
+    )
+    return JsonResponse(
         {
-            "proveedores": proveedores,
-            "productos": productos,
-            "compras": compras_list,
-            "today": datetime.now().strftime("%Y-%m-%d"),
-        },
+            "success": True,
+            "data": [purchase_service.serialize_purchase_summary(row) for row in compras_list],
+            "meta": {"count": len(compras_list), "next_cursor": next_cursor},
+        }
+    )
+
+
+@login_required
+@require_GET
+def detalle_compra_api(request, compra_id):
+    """
+    Líneas de una compra en JSON, para desplegarlas bajo demanda en el historial.
+    """
+    if request.session.get("rol") != "Administrador":
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    detalles = purchase_service.purchase_detail(compra_id)
+    if detalles is None:
+        return JsonResponse({"success": False, "message": "La orden de compra no existe."}, status=404)
+    return JsonResponse({"success": True, "data": detalles, "meta": {"count": len(detalles)}})
+
+
+@login_required
+@require_GET
+def stock_historico_api(request):
+    """
+    Stock por producto al cierre de ``fecha`` (YYYY-MM-DD, por defecto hoy)
+    según el libro de movimientos. ``producto`` acepta ids separados por coma.
+    """
+    if request.session.get("rol") != "Administrador":
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    fecha = _clean_date(request.GET.get("fecha")) or timezone.localdate()
+    producto_ids = [
+        pid for pid in (_clean_int(v) for v in request.GET.get("producto", "").split(",")) if pid > 0
+    ] or None
+    as_of = timezone.make_aware(datetime.combine(fecha, time.max))
+    saldos = StockLedgerService().on_hand(producto_ids, as_of=as_of)
+    return JsonResponse(
+        {
+            "success": True,
+            "data": [{"producto_id": pid, "cantidad": cantidad} for pid, cantidad in sorted(saldos.items())],
+            "meta": {"count": len(saldos), "fecha": fecha.isoformat()},
+        }
     )
 
 
+@login_required
+@require_GET
+def antiguedad_saldos_api(request):
+    """
+    Antigüedad de saldos por pagar a proveedores (tramos 0-30, 31-60, 61-90
+    y más de 90 días desde la fecha de pedido, sin descontar el plazo de
+    pago; ``meta.base`` lo indica).
+    """
+    if request.session.get("rol") != "Administrador":
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    report = PayablesAgingService.serialize(payables_aging.aging())
+    return JsonResponse(
+        {
+            "success": True,
+            "data": report["proveedores"],
+            "meta": {
+                "count": len(report["proveedores"]),
+                "fecha": report["fecha"],
+                "base": report["base"],
+                "total": report["total"],
+                "compras": report["compras"],
+                "tramos": report["tramos"],
+            },
+        }
+    )
+
+
+def _iva_total(row: dict) -> float:
+    return float((row["iva_15"] or 0) + (row["iva_5"] or 0))
+
+
+PURCHASE_EXPORT_COLUMNS = [
+    Column("ID", "compra_id"),
+    Column("Proveedor", "proveedor__razon_social", as_text),
+    Column("Factura", "numero_factura", as_text),
+    Column("RUC/CI", "ruc_ci", as_text),
+    Column("Fecha pedido", "fecha_pedido", as_date("%d/%m/%Y")),
+    Column("Fecha pago", "fecha_pago", as_date("%d/%m/%Y")),
+    Column("Subtotal", "subtotal_general", as_float),
+    Column("IVA", value=_iva_total, requires=("iva_15", "iva_5")),
+    Column("Total pagar", "total_pagar", as_float),
+    Column("Abono", "abono", as_float),
+    Column("Saldo", "saldo", as_float),
+    Column("Estado", "estado", as_text),
+]
+
+PURCHASE_DETAIL_EXPORT_COLUMNS = [
+    Column("Compra ID", "compra_id"),
+    Column("Producto", "producto__nombre", as_text),
+    Column("Marca", "marca", as_text),
+    Column("Código", "codigo", as_text),
+    Column("Descripción", "descripcion", as_text),
+    Column("Cantidad", "cantidad", as_int),
+    Column("Precio unitario", "precio_unitario", as_float),
+    Column("Tarifa IVA", "tarifa_iva", as_float),
+    Column("Descuento", "descuento", as_float),
+    Column("Valor total", "valor_total", as_float),
+]
+
+
+@register_export("compras", models=(Compra, CompraDetalle), namespaces=("compras", "productos"))
+def build_compras_export(params) -> tuple[list[Sheet], str]:
+    sheets = [
+        Sheet("Compras", Compra.objects.order_by("-compra_id"), PURCHASE_EXPORT_COLUMNS),
+        Sheet(
+            "Detalles",
+            CompraDetalle.objects.order_by("-compra_id", "detalle_id"),
+            PURCHASE_DETAIL_EXPORT_COLUMNS,
+        ),
+    ]
+    if params.get("hoja") == "detalles":
+        sheets = sheets[1:]
+    return sheets, f"compras_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
 @login_required
 def exportar_compras_excel(request):
+    """
+    Exporta cabeceras y detalles de compras en dos hojas. Con
+    ``?formato=csv`` se exporta una sola hoja (``?hoja=detalles`` para las
+    líneas).
+    """
     redirect_response = _require_admin(request)
     if redirect_response:
         return redirect_response
 
-    compras = purchase_service.list_purchases()
-
-    wb = Workbook()
-    ws_cab = wb.active
-    ws_cab.title = "Compras"
-
-    ws_cab.append(
-        [
-            "ID",
-            "Proveedor",
-            "Factura",
-            "RUC/CI",
-            "Fecha pedido",
-            "Fecha pago",
-            "Subtotal",
-            "IVA",
-            "Total pagar",
-            "Abono",
-            "Saldo",
-            "Estado",
-        ]
-    )
+    fmt = requested_format(request)
+    sheets, filename = build_compras_export({"hoja": request.GET.get("hoja") if fmt == "csv" else ""})
+    return export_response(sheets, filename, fmt)
 
-    ws_det = wb.create_sheet(title="Detalles")
-    ws_det.append(
-        [
-            "Compra ID",
-            "Producto",
-            "Marca",
-            "Código",
-            "Descripción",
-            "Cantidad",
-            "Precio unitario",
-            "Tarifa IVA",
-            "Descuento",
-            "Valor total",
-        ]
-    )
 
-    for c in compras:
-        iva_total = (c.iva_15 or 0) + (c.iva_5 or 0)
-        ws_cab.append(
-            [
-                c.compra_id,
-                c.proveedor.razon_social if c.proveedor else "",
-                c.numero_factura or "",
-                c.ruc_ci or "",
-                c.fecha_pedido.strftime("%d/%m/%Y") if c.fecha_pedido else "",
-                c.fecha_pago.strftime("%d/%m/%Y") if c.fecha_pago else "",
-                float(c.subtotal_general or 0),
-                float(iva_total),
-                float(c.total_pagar or 0),
-                float(c.abono or 0),
-                float(c.saldo or 0),
-                c.estado or "",
-            ]
-        )
-        for d in c.detalles.all():
-            ws_det.append(
-                [
-                    c.compra_id,
-                    d.producto.nombre if d.producto else "",
-                    d.marca or "",
-                    d.codigo or "",
-                    d.descripcion or "",
-                    d.cantidad or 0,
-                    float(d.precio_unitario or 0),
-                    float(d.tarifa_iva or 0),
-                    float(d.descuento or 0),
-                    float(d.valor_total or 0),
-                ]
-            )
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    filename = f"compras_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return response
+@login_required
+@require_POST
+def exportar_compras_trabajo(request):
+    """
+    Variante en segundo plano de exportar_compras_excel: devuelve el id del
+    trabajo y la URL de estado, y reutiliza el archivo mientras las compras
+    no cambien. El formato y la hoja llegan en el cuerpo del POST.
+    """
+    fmt = requested_format(request, request.POST)
+    params = {"hoja": (request.POST.get("hoja") or "") if fmt == "csv" else ""}
+    return start_export_job(request, "compras", params, fmt)
 
 
 @login_required
@@ -0,0 +1,328 @@
+"""
+Certificados médicos: carga agrupada de la ficha y sus exámenes, armado del
+contenido, render a PDF (``apps.shared.pdf``, sin dependencias externas) y
+caché de los PDF generados.
+
+Para una o muchas fichas la carga cuesta siempre 5 consultas: las fichas con
+paciente, cliente y médico, y una por sección (biomicroscopía, fondo de ojo,
+diagnóstico y tratamiento) mediante ``ExamBundleLoader``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+from typing import Iterable, List, Optional, Tuple
+
+import django
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.shared.pdf import PDFDocument
+
+from .models import FichaClinica
+from .services import (
+    EXAM_SECTIONS,
+    exam_loader,
+    resumen_biomicroscopia,
+    resumen_diagnostico,
+    resumen_fondo_ojo,
+    tratamiento_items,
+)
+
+# Subir al cambiar el diseño del PDF para no servir versiones cacheadas viejas.
+RENDER_VERSION = 2
+
+FOOTER_INFO = {
+    "direccion": "CALLE GARCÍA AVILES 318 entre Av. 9 de OCTUBRE Y VELEZ",
+    "telefonos": "Telf: 0980632277 / 0998436958 / 0985394814",
+    "ciudad": "Guayaquil",
+}
+
+MESES = [
+    "enero",
+    "febrero",
+    "marzo",
+    "abril",
+    "mayo",
+    "junio",
+    "julio",
+    "agosto",
+    "septiembre",
+    "octubre",
+    "noviembre",
+    "diciembre",
+]
+
+# Sección del certificado -> columna con su fecha (parte de la firma de caché).
+SECTION_DATES = {
+    "biomicroscopia": "fecha_examen",
+    "fondo_ojo": "fecha_examen",
+    "diagnostico": "fecha_diagnostico",
+    "tratamiento": "fecha_tratamiento",
+}
+CERTIFICATE_SECTIONS = {nombre: EXAM_SECTIONS[nombre] for nombre in SECTION_DATES}
+
+AV_CAMPOS = ("av_od_sc", "av_od_cc", "av_od_ph", "av_oi_sc", "av_oi_cc", "av_oi_ph", "av_od_cerca", "av_oi_cerca")
+REFRACCION_CAMPOS = ("esfera_od", "cilindro_od", "eje_od", "esfera_oi", "cilindro_oi", "eje_oi")
+
+
+def format_fecha_es(value: datetime | None) -> str:
+    if not value:
+        value = timezone.now()
+    return f"{value.day} de {MESES[value.month - 1]} de {value.year}"
+
+
+def calcular_edad(nacimiento, referencia) -> int | None:
+    if not nacimiento or not referencia:
+        return None
+    if isinstance(referencia, datetime):
+        ref_date = referencia.date()
+    else:
+        ref_date = referencia
+    edad = ref_date.year - nacimiento.year - (
+        (ref_date.month, ref_date.day) < (nacimiento.month, nacimiento.day)
+    )
+    return max(edad, 0)
+
+
+def _timestamp(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, (date, datetime, time)) else None
+
+
+class CertificateService:
+    """
+    Genera el contexto HTML y el PDF del certificado de una ficha.
+
+    El PDF se cachea bajo una firma del contenido que incluye el id de la
+    ficha, el id y la fecha de cada sección usada y los textos resultantes:
+    si se agrega un examen nuevo cambia la fecha, y si se edita uno en su
+    lugar (las fechas no cambian) cambia el texto.
+    """
+
+    timeout = 60 * 60 * 24 * 7
+
+    # ---------------- Carga agrupada ----------------
+    def load(self, filtro: Q) -> List[Tuple[FichaClinica, dict]]:
+        """Fichas que cumplen ``filtro`` con sus secciones (instancias o ``None``)."""
+        fichas = list(
+            FichaClinica.objects.select_related("paciente_medico__cliente", "usuario")
+            .filter(filtro)
+            .order_by("fecha_consulta", "ficha_id")
+        )
+        rows = exam_loader.load([f.ficha_id for f in fichas], CERTIFICATE_SECTIONS)
+        return [
+            (
+                ficha,
+                {
+                    nombre: CERTIFICATE_SECTIONS[nombre].model(**row) if row else None
+                    for nombre, row in rows[ficha.ficha_id].items()
+                },
+            )
+            for ficha in fichas
+        ]
+
+    def load_one(self, ficha_id: int) -> Optional[Tuple[FichaClinica, dict]]:
+        cargadas = self.load(Q(ficha_id=ficha_id))
+        return cargadas[0] if cargadas else None
+
+    # ---------------- Contenido ----------------
+    def context(self, ficha: FichaClinica, secciones: dict) -> dict:
+        """Contexto de ``medical/certificado.html``."""
+        paciente = ficha.paciente_medico
+        cliente = paciente.cliente if paciente else None
+        fecha_consulta = ficha.fecha_consulta or timezone.now()
+        edad = (
+            calcular_edad(cliente.fecha_nacimiento, fecha_consulta.date())
+            if cliente and cliente.fecha_nacimiento
+            else None
+        )
+        return {
+            "consulta": ficha,
+            "paciente": paciente,
+            "cliente": cliente,
+            "edad": edad,
+            "fecha_consulta_str": format_fecha_es(fecha_consulta),
+            "biomicroscopia_texto": resumen_biomicroscopia(secciones["biomicroscopia"]),
+            "fondo_ojo_texto": resumen_fondo_ojo(secciones["fondo_ojo"]),
+            "diagnostico_texto": resumen_diagnostico(secciones["diagnostico"]),
+            "tratamiento_items": tratamiento_items(secciones["tratamiento"]),
+            "medico_nombre": f"{ficha.usuario.nombre} {ficha.usuario.ap_pat}".strip() if ficha.usuario else None,
+            "footer_info": FOOTER_INFO,
+            "consulta_id": ficha.ficha_id,
+        }
+
+    def payload(self, ficha: FichaClinica, secciones: dict) -> dict:
+        """
+        Datos planos (serializables y picklables) del certificado: es lo que
+        recibe ``render_certificate_pdf`` y lo que se firma para la caché.
+        """
+        ctx = self.context(ficha, secciones)
+        cliente = ctx["cliente"]
+        return {
+            "ficha_id": ficha.ficha_id,
+            "numero_consulta": ficha.numero_consulta,
+            "fecha_consulta": _timestamp(ficha.fecha_consulta),
+            "fecha_consulta_str": ctx["fecha_consulta_str"],
+            "paciente": f"{cliente.nombres} {cliente.ap_pat}".strip() if cliente else "",
+            "edad": ctx["edad"],
+            "agudeza_visual": {campo: getattr(ficha, campo) for campo in AV_CAMPOS},
+            "refraccion": {campo: getattr(ficha, campo) for campo in REFRACCION_CAMPOS},
+            "biomicroscopia": ctx["biomicroscopia_texto"],
+            "fondo_ojo": ctx["fondo_ojo_texto"],
+            "diagnostico": ctx["diagnostico_texto"],
+            "tratamiento": ctx["tratamiento_items"],
+            "medico": ctx["medico_nombre"] or "",
+            "footer": FOOTER_INFO,
+            "secciones": {
+                nombre: [instancia.pk, _timestamp(getattr(instancia, SECTION_DATES[nombre]))] if instancia else None
+                for nombre, instancia in secciones.items()
+            },
+        }
+
+    @staticmethod
+    def cache_key(payload: dict) -> str:
+        firma = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+        return f"certificado-pdf:v{RENDER_VERSION}:{payload['ficha_id']}:{firma}"
+
+    # ---------------- PDF ----------------
+    def pdf(self, ficha: FichaClinica, secciones: dict) -> bytes:
+        payload = self.payload(ficha, secciones)
+        key = self.cache_key(payload)
+        contenido = cache.get(key)
+        if contenido is None:
+            contenido = render_certificate_pdf(payload)
+            cache.set(key, contenido, timeout=self.timeout)
+        return contenido
+
+    def generate_for_day(self, fecha: date, workers: Optional[int] = None) -> dict:
+        """
+        Genera los certificados de las consultas de ``fecha``. Los que ya
+        están en caché se reutilizan; el resto se renderiza en un pool de
+        procesos (``workers=1`` lo hace en el proceso actual). Devuelve
+        ``{"pdfs": {ficha_id: (numero_consulta, bytes)}, "cacheados": n,
+        "generados": n}``.
+        """
+        inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+        fin = timezone.make_aware(datetime.combine(fecha, time.max))
+        payloads = [
+            self.payload(ficha, secciones)
+            for ficha, secciones in self.load(Q(fecha_consulta__gte=inicio, fecha_consulta__lte=fin))
+        ]
+        keys = {p["ficha_id"]: self.cache_key(p) for p in payloads}
+        cacheados = cache.get_many(list(keys.values()))
+        pendientes = [p for p in payloads if keys[p["ficha_id"]] not in cacheados]
+
+        generados = list(render_many(pendientes, workers))
+        cache.set_many({keys[p["ficha_id"]]: pdf for p, pdf in zip(pendientes, generados)}, timeout=self.timeout)
+
+        por_ficha = dict(zip((p["ficha_id"] for p in pendientes), generados))
+        return {
+            "pdfs": {
+                p["ficha_id"]: (p["numero_consulta"], por_ficha.get(p["ficha_id"]) or cacheados[keys[p["ficha_id"]]])
+                for p in payloads
+            },
+            "cacheados": len(payloads) - len(pendientes),
+            "generados": len(pendientes),
+        }
+
+
+def _pie(footer: dict):
+    def dibujar(doc: PDFDocument, pagina: int, total: int) -> None:
+        y = doc.margin - 10
+        doc.draw_line(doc.margin, y + 12, doc.width - doc.margin, y + 12)
+        texto = f"{footer['direccion']} — {footer['telefonos']}"
+        doc.draw_text(doc.aligned_x(texto, "regular", 8, "center", doc.margin, doc.content_width), y, texto, size=8)
+        if total > 1:
+            numero = f"{pagina}/{total}"
+            doc.draw_text(doc.aligned_x(numero, "regular", 8, "right", doc.margin, doc.content_width), y, numero, size=8)
+
+    return dibujar
+
+
+def render_certificate_pdf(payload: dict) -> bytes:
+    """Render del certificado a PDF a partir de ``CertificateService.payload``."""
+    footer = payload["footer"]
+    doc = PDFDocument(footer=_pie(footer), footer_height=24, title=f"Certificado {payload['numero_consulta']}")
+
+    doc.paragraph("OFTALMETRYC", font="bold", size=16, align="center", space_after=0)
+    doc.paragraph(footer["direccion"], size=9, align="center", space_after=0)
+    doc.paragraph(footer["telefonos"], size=9, align="center", space_after=0)
+    doc.rule(width=1.5)
+    doc.paragraph(f"{footer['ciudad']}, {payload['fecha_consulta_str']}", align="right", space_after=12)
+    doc.paragraph("CERTIFICADO", font="bold", size=14, align="center", underline=True, space_after=12)
+
+    edad = payload["edad"] if payload["edad"] is not None else "-"
+    doc.paragraph(
+        f"Por medio del presente certifico haber atendido el día {payload['fecha_consulta_str']} "
+        f"al Sr./Sra. {payload['paciente']}, edad {edad} años, presentando en su valoración "
+        "ocular los siguientes resultados.",
+        leading=18,
+        space_after=10,
+    )
+
+    av = {campo: valor or "NSPR" for campo, valor in payload["agudeza_visual"].items()}
+    doc.paragraph("Agudeza Visual", font="bold", space_after=4)
+    doc.table(
+        [
+            ["", "SC", "CC", "PH"],
+            ["Distancia OD", av["av_od_sc"], av["av_od_cc"], av["av_od_ph"]],
+            ["Distancia OI", av["av_oi_sc"], av["av_oi_cc"], av["av_oi_ph"]],
+            ["Próxima OD", av["av_od_cerca"], "", ""],
+            ["Próxima OI", av["av_oi_cerca"], "", ""],
+        ],
+        widths=[130, 80, 80, 80],
+    )
+    rx = {campo: valor or "N/A" for campo, valor in payload["refraccion"].items()}
+    doc.spacer(8)
+    doc.paragraph("Refracción Final", font="bold", space_after=4)
+    doc.table(
+        [
+            ["", "Esfera", "Cilindro", "Eje"],
+            ["OD", rx["esfera_od"], rx["cilindro_od"], rx["eje_od"]],
+            ["OI", rx["esfera_oi"], rx["cilindro_oi"], rx["eje_oi"]],
+        ],
+        widths=[130, 80, 80, 80],
+    )
+
+    doc.spacer(8)
+    doc.paragraph("Biomicroscopía:", font="bold", space_after=2)
+    doc.paragraph(payload["biomicroscopia"] or "Sin observaciones.")
+    doc.paragraph("Fondo de Ojo:", font="bold", space_after=2)
+    doc.paragraph(payload["fondo_ojo"] or "Sin observaciones.")
+    doc.paragraph("Tratamiento:", font="bold", space_after=2)
+    for item in payload["tratamiento"] or ["—"]:
+        doc.paragraph(item, bullet="•" if payload["tratamiento"] else "", indent=12, space_after=1)
+    doc.spacer(3)
+    doc.paragraph("Diagnóstico:", font="bold", space_after=2)
+    doc.paragraph(payload["diagnostico"] or "N/A")
+
+    # Firma: se mantiene el bloque completo en la misma página.
+    doc.ensure_space(120)
+    doc.spacer(30)
+    doc.paragraph("Atentamente", align="center", space_after=36)
+    centro = doc.width / 2
+    doc.draw_line(centro - 125, doc.y, centro + 125, doc.y)
+    doc.paragraph(payload["medico"], font="bold", align="center", space_after=0)
+    doc.paragraph("Área de Salud Visual", align="center", space_after=0)
+    doc.paragraph("Especialista en Oftalmología", align="center", space_after=0)
+    return doc.render()
+
+
+def render_many(payloads: Iterable[dict], workers: Optional[int] = None) -> Iterable[bytes]:
+    """
+    Renderiza varios certificados; con más de un worker usa un pool de
+    procesos (el render es CPU puro, así que el GIL no deja aprovechar hilos).
+    """
+    payloads = list(payloads)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(payloads) <= 1:
+        return [render_certificate_pdf(p) for p in payloads]
+    # Los workers importan este módulo (y con él los modelos) al recibir la
+    # tarea, por eso necesitan Django inicializado.
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        return list(pool.map(render_certificate_pdf, payloads, chunksize=max(len(payloads) // (workers * 4), 1)))
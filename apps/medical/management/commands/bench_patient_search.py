@@ -0,0 +1,113 @@
+"""
+Mide la latencia de PacienteMedicoService.search con padrones sintéticos de
+distintos tamaños (por defecto 50.000 y 500.000 pacientes).
+
+Clientes, pacientes e índice se insertan dentro de una transacción que se
+revierte al final, así que puede ejecutarse contra la base de datos real.
+Requiere la migración medical.0002_pacientes_busqueda.
+
+    python manage.py bench_patient_search --sizes 50000 500000 --repeat 20
+"""
+
+from __future__ import annotations
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.clients.models import Cliente, PacienteMedico
+from apps.medical.models import PacienteBusqueda
+from apps.medical.search import patient_index
+from apps.medical.services import PacienteMedicoService
+
+NOMBRES = ["José", "María", "Andrés", "Lucía", "Sebastián", "Sofía", "Martín", "Valentina", "Ángel", "Inés", "Ramón", "Belén"]
+APELLIDOS = [
+    "Pérez", "González", "Rodríguez", "Muñoz", "López", "Martínez", "Sánchez", "Ramírez",
+    "Núñez", "Jiménez", "Castañeda", "Ordóñez", "Vásquez", "Chávez", "Benítez", "Quiñónez",
+]
+
+# (etiqueta, consulta): nombre sin tildes, prefijo corto, nombre y apellido,
+# cédula exacta, número de ficha y un término sin resultados.
+QUERIES = [
+    ("sin tildes", "perez"),
+    ("prefijo", "ram"),
+    ("nombre y apellido", "lucia nunez"),
+    ("cédula", "0900000421"),
+    ("ficha", "BP-000042"),
+    ("sin resultados", "zzzz"),
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark de latencia de la búsqueda de pacientes con 50k/500k pacientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[50_000, 500_000])
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def _load(self, desde: int, hasta: int, rng: random.Random) -> None:
+        clientes = [
+            Cliente(
+                nombres=f"{rng.choice(NOMBRES)} {rng.choice(NOMBRES)}",
+                ap_pat=rng.choice(APELLIDOS),
+                ap_mat=rng.choice(APELLIDOS),
+                rut=f"09{idx:08d}",
+                estado=True,
+            )
+            for idx in range(desde, hasta)
+        ]
+        Cliente.objects.bulk_create(clientes)
+        pacientes = PacienteMedico.objects.bulk_create(
+            [
+                PacienteMedico(cliente_id=c.cliente_id, numero_ficha=f"BP-{idx:06d}", estado=True)
+                for idx, c in zip(range(desde, hasta), clientes)
+            ]
+        )
+        patient_index.update(p.paciente_medico_id for p in pacientes)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["sizes"])
+        repeat = max(options["repeat"], 1)
+        service = PacienteMedicoService()
+        rng = random.Random(42)
+        rows = []
+        try:
+            with transaction.atomic():
+                inserted = 0
+                for size in sizes:
+                    start = time.perf_counter()
+                    while inserted < size:
+                        hasta = min(size, inserted + options["batch_size"])
+                        self._load(inserted, hasta, rng)
+                        inserted = hasta
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"ANALYZE {PacienteBusqueda._meta.db_table}")
+                    self.stdout.write(f"{size} pacientes cargados en {time.perf_counter() - start:.1f} s")
+
+                    for label, query in QUERIES:
+                        timings = []
+                        found = 0
+                        for _ in range(repeat):
+                            start = time.perf_counter()
+                            found = len(service.search(query, limit=options["limit"]))
+                            timings.append((time.perf_counter() - start) * 1000)
+                        timings.sort()
+                        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                        rows.append((size, label, query, found, statistics.median(timings), p95))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"motor: {connection.vendor} ({patient_index.engine()})")
+        self.stdout.write(f"{'pacientes':>9} {'caso':<18} {'consulta':<12} {'filas':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for size, label, query, found, p50, p95 in rows:
+            self.stdout.write(f"{size:>9} {label:<18} {query:<12} {found:>5} {p50:>8.2f} {p95:>8.2f}")
@@ -0,0 +1,63 @@
+"""
+Genera los certificados PDF de las consultas de un día. Los que ya están en
+caché (mismo contenido) se reutilizan; el resto se renderiza en un pool de
+procesos y queda en caché para ``certificado/<id>/pdf/``.
+
+    python manage.py generate_certificates
+    python manage.py generate_certificates --fecha 2025-03-14 --workers 4 --output certificados.zip
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import zipfile
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from apps.medical.certificates import CertificateService
+
+
+def _entry_name(ficha_id: int, numero) -> str:
+    """Nombre único dentro del ZIP: ``numero_consulta`` es texto libre y puede repetirse o faltar."""
+    numero = get_valid_filename(str(numero).strip()) if numero and str(numero).strip() else ""
+    return f"certificado_{ficha_id}_{numero}.pdf" if numero else f"certificado_{ficha_id}.pdf"
+
+
+def _date(value: str):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"fecha no válida: {value} (use YYYY-MM-DD)") from exc
+
+
+class Command(BaseCommand):
+    help = "Genera (y deja en caché) los certificados PDF de las consultas de un día."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fecha", type=_date, help="Día de las consultas (YYYY-MM-DD, por defecto hoy).")
+        parser.add_argument(
+            "--workers", type=int, default=None, help="Procesos para el render (por defecto, uno por CPU)."
+        )
+        parser.add_argument("--output", help="Archivo ZIP donde guardar los PDF (opcional).")
+
+    def handle(self, *args, **options):
+        fecha = options["fecha"] or timezone.localdate()
+        start = time.perf_counter()
+        result = CertificateService().generate_for_day(fecha, workers=options["workers"])
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if options["output"]:
+            with zipfile.ZipFile(options["output"], "w", compression=zipfile.ZIP_DEFLATED) as archivo:
+                for ficha_id, (numero, pdf) in result["pdfs"].items():
+                    archivo.writestr(_entry_name(ficha_id, numero), pdf)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{fecha.isoformat()}: {len(result['pdfs'])} certificados "
+                f"({result['generados']} generados, {result['cacheados']} desde caché) en {elapsed:.1f} ms"
+            )
+        )
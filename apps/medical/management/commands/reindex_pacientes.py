@@ -0,0 +1,33 @@
+"""
+Reconstruye el índice de búsqueda de pacientes (``pacientes_busqueda``) a
+partir de ``pacientes_medicos`` y ``clientes``. Los cambios hechos fuera de
+la aplicación ya los recogen los triggers de la migración 0005; esto sirve
+para cargas masivas o si los triggers no estaban instalados.
+
+    python manage.py reindex_pacientes
+    python manage.py reindex_pacientes --batch-size 10000
+"""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.medical.search import patient_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de pacientes médicos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            filas = patient_index.rebuild(batch_size=max(options["batch_size"], 1))
+        self.stdout.write(
+            self.style.SUCCESS(f"Pacientes indexados: {filas} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        )
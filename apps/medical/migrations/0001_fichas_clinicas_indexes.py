@@ -0,0 +1,47 @@
+"""
+Índices para el listado paginado de consultas (FichaClinicaService
+.consultas_page), que ordena por (fecha_consulta, ficha_id) descendente, en
+general o dentro de un paciente. ``fichas_clinicas`` es una tabla heredada, así
+que se crean con SQL explícito y sólo si la tabla existe.
+
+En PostgreSQL la columna va con ``DESC NULLS LAST``, igual que el ORDER BY de
+la paginación, para que el índice sirva sin ordenar aparte.
+"""
+
+from django.db import migrations
+
+TABLE = "fichas_clinicas"
+INDEXES = {
+    "idx_fichas_clinicas_paciente_fecha": ("paciente_medico_id", "fecha_consulta", "ficha_id"),
+    "idx_fichas_clinicas_fecha": ("fecha_consulta", "ficha_id"),
+}
+
+
+def _column(vendor: str, column: str) -> str:
+    if column == "paciente_medico_id":
+        return column
+    return f"{column} DESC NULLS LAST" if vendor == "postgresql" else f"{column} DESC"
+
+
+def create_indexes(apps, schema_editor):
+    if TABLE not in schema_editor.connection.introspection.table_names():
+        return
+    vendor = schema_editor.connection.vendor
+    for name, columns in INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} ({', '.join(_column(vendor, c) for c in columns)})"
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
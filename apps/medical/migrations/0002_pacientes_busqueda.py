@@ -0,0 +1,163 @@
+"""
+Índice de búsqueda de pacientes (PacienteBusqueda) y su estructura según el
+motor:
+
+- PostgreSQL: extensión pg_trgm e índice GIN ``gin_trgm_ops`` sobre
+  ``texto``, que sirve para ``LIKE '%x%'`` y para la similitud de palabra. Si
+  la extensión no puede instalarse (permisos), la búsqueda usa ``LIKE`` sin
+  índice.
+- SQLite: tabla virtual FTS5 ``pacientes_busqueda_fts`` con contenido externo
+  (``pacientes_busqueda``), índices de prefijo y triggers que la mantienen al
+  día. Si SQLite no trae FTS5, la búsqueda usa ``LIKE``.
+
+Al final se carga el índice con los pacientes existentes, si las tablas
+heredadas están presentes. La normalización se copia de
+``apps.medical.search`` tal como estaba al escribir esta migración, para que
+no cambie si cambia el módulo.
+"""
+
+import logging
+import re
+import unicodedata
+
+from django.db import migrations, models, transaction
+
+logger = logging.getLogger(__name__)
+
+TABLE = "pacientes_busqueda"
+FTS_TABLE = "pacientes_busqueda_fts"
+BATCH_SIZE = 5000
+
+_NO_ALNUM = re.compile(r"[^0-9a-z]+")
+_NO_DIGITS = re.compile(r"\D+")
+
+
+def _normalizar(valor):
+    texto = unicodedata.normalize("NFKD", valor or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALNUM.sub(" ", texto).strip()
+
+
+def _documento(paciente_medico_id, cliente_id, nombres, ap_pat, ap_mat, rut, numero_ficha):
+    nombre = " ".join(filter(None, map(_normalizar, (nombres, ap_pat, ap_mat))))
+    rut = _NO_DIGITS.sub("", rut or "")
+    ficha = _normalizar(numero_ficha)
+    return {
+        "paciente_medico_id": paciente_medico_id,
+        "cliente_id": cliente_id,
+        "nombre": nombre[:320],
+        "rut": rut[:20],
+        "numero_ficha": (numero_ficha or "").strip().lower()[:40],
+        "texto": " ".join(filter(None, (nombre, rut, ficha))),
+    }
+
+
+def _enable_trigram(schema_editor) -> bool:
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        return True
+    except Exception:
+        logger.warning("No se pudo habilitar pg_trgm; la búsqueda de pacientes usará LIKE sin índice.")
+        return False
+
+
+def _create_fts(schema_editor) -> None:
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"texto, content='{TABLE}', content_rowid='paciente_medico_id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+            )
+    except Exception:
+        logger.warning("SQLite sin FTS5; la búsqueda de pacientes usará LIKE.")
+        return
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, texto) VALUES (new.paciente_medico_id, new.texto); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texto) VALUES ('delete', old.paciente_medico_id, old.texto); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texto) VALUES ('delete', old.paciente_medico_id, old.texto); "
+        f"INSERT INTO {FTS_TABLE}(rowid, texto) VALUES (new.paciente_medico_id, new.texto); END"
+    )
+
+
+def _backfill(schema_editor) -> None:
+    tables = schema_editor.connection.introspection.table_names()
+    if "pacientes_medicos" not in tables or "clientes" not in tables:
+        return
+    columns = ("paciente_medico_id", "cliente_id", "nombre", "rut", "numero_ficha", "texto")
+    insert = f"INSERT INTO {TABLE} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT p.paciente_medico_id, p.cliente_id, c.nombres, c.ap_pat, c.ap_mat, c.rut, p.numero_ficha "
+            "FROM pacientes_medicos p LEFT JOIN clientes c ON c.cliente_id = p.cliente_id "
+            "ORDER BY p.paciente_medico_id"
+        )
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            docs = [_documento(*row) for row in rows]
+            with schema_editor.connection.cursor() as writer:
+                writer.executemany(insert, [[doc[col] for col in columns] for doc in docs])
+
+
+def create_search_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        if _enable_trigram(schema_editor):
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_texto_trgm ON {TABLE} USING gin (texto gin_trgm_ops)"
+            )
+    elif vendor == "sqlite":
+        _create_fts(schema_editor)
+    _backfill(schema_editor)
+
+
+def drop_search_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS idx_{TABLE}_texto_trgm")
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medical", "0001_fichas_clinicas_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PacienteBusqueda",
+            fields=[
+                ("paciente_medico_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("cliente_id", models.IntegerField(blank=True, null=True)),
+                ("nombre", models.CharField(default="", max_length=320)),
+                ("rut", models.CharField(default="", max_length=20)),
+                ("numero_ficha", models.CharField(default="", max_length=40)),
+                ("texto", models.TextField(default="")),
+            ],
+            options={
+                "verbose_name": "Búsqueda de paciente",
+                "verbose_name_plural": "Búsqueda de pacientes",
+                "db_table": "pacientes_busqueda",
+                "indexes": [
+                    models.Index(fields=["rut"], name="idx_pacientes_busqueda_rut"),
+                    models.Index(fields=["numero_ficha"], name="idx_pacientes_busqueda_ficha"),
+                    models.Index(fields=["nombre"], name="idx_pacientes_busqueda_nombre"),
+                ],
+            },
+        ),
+        migrations.RunPython(create_search_structures, drop_search_structures),
+    ]
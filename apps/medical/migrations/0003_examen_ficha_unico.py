@@ -0,0 +1,53 @@
+"""
+Índice único de ``ficha_id`` en las secciones 1:1 del examen, que necesita el
+``INSERT ... ON CONFLICT (ficha_id) DO UPDATE`` de ``ExamWriter``. Son tablas
+heredadas, así que se crean con SQL explícito y sólo si la tabla existe.
+
+Si una tabla ya tiene fichas con más de una fila, no se crea el índice (no se
+borran datos clínicos): se deja un aviso en el log y el guardado de esa
+sección usa UPDATE por id o INSERT.
+"""
+
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("biomicroscopia", "reflejos_pupilares", "fondo_ojo", "parametros_clinicos")
+
+
+def _index_name(table: str) -> str:
+    return f"idx_{table}_ficha_unico"
+
+
+def create_indexes(apps, schema_editor):
+    existing = schema_editor.connection.introspection.table_names()
+    for table in TABLES:
+        if table not in existing:
+            continue
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"SELECT ficha_id FROM {table} GROUP BY ficha_id HAVING COUNT(*) > 1 LIMIT 1")
+            duplicada = cursor.fetchone()
+        if duplicada:
+            logger.warning(
+                "%s tiene varias filas para la ficha %s; no se crea %s.", table, duplicada[0], _index_name(table)
+            )
+            continue
+        schema_editor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_index_name(table)} ON {table} (ficha_id)")
+
+
+def drop_indexes(apps, schema_editor):
+    for table in TABLES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {_index_name(table)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medical", "0002_pacientes_busqueda"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,257 @@
+# Generated by Django 5.0.4 on 2026-10-17 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medical', '0003_examen_ficha_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Biomicroscopia',
+            fields=[
+                ('biomicroscopia_id', models.AutoField(primary_key=True, serialize=False)),
+                ('parpados_od', models.TextField(blank=True, null=True)),
+                ('conjuntiva_od', models.TextField(blank=True, null=True)),
+                ('cornea_od', models.TextField(blank=True, null=True)),
+                ('camara_anterior_od', models.TextField(blank=True, null=True)),
+                ('iris_od', models.TextField(blank=True, null=True)),
+                ('pupila_od_mm', models.CharField(blank=True, max_length=10, null=True)),
+                ('pupila_od_reaccion', models.CharField(blank=True, max_length=20, null=True)),
+                ('cristalino_od', models.TextField(blank=True, null=True)),
+                ('pupila_desc_od', models.TextField(blank=True, null=True)),
+                ('pestanas_od', models.TextField(blank=True, null=True)),
+                ('conjuntiva_bulbar_od', models.TextField(blank=True, null=True)),
+                ('conjuntiva_tarsal_od', models.TextField(blank=True, null=True)),
+                ('orbita_od', models.TextField(blank=True, null=True)),
+                ('pliegue_semilunar_od', models.TextField(blank=True, null=True)),
+                ('caruncula_od', models.TextField(blank=True, null=True)),
+                ('conductos_lagrimales_od', models.TextField(blank=True, null=True)),
+                ('parpado_superior_od', models.TextField(blank=True, null=True)),
+                ('parpado_inferior_od', models.TextField(blank=True, null=True)),
+                ('parpados_oi', models.TextField(blank=True, null=True)),
+                ('conjuntiva_oi', models.TextField(blank=True, null=True)),
+                ('cornea_oi', models.TextField(blank=True, null=True)),
+                ('camara_anterior_oi', models.TextField(blank=True, null=True)),
+                ('iris_oi', models.TextField(blank=True, null=True)),
+                ('pupila_oi_mm', models.CharField(blank=True, max_length=10, null=True)),
+                ('pupila_oi_reaccion', models.CharField(blank=True, max_length=20, null=True)),
+                ('cristalino_oi', models.TextField(blank=True, null=True)),
+                ('pupila_desc_oi', models.TextField(blank=True, null=True)),
+                ('pestanas_oi', models.TextField(blank=True, null=True)),
+                ('conjuntiva_bulbar_oi', models.TextField(blank=True, null=True)),
+                ('conjuntiva_tarsal_oi', models.TextField(blank=True, null=True)),
+                ('orbita_oi', models.TextField(blank=True, null=True)),
+                ('pliegue_semilunar_oi', models.TextField(blank=True, null=True)),
+                ('caruncula_oi', models.TextField(blank=True, null=True)),
+                ('conductos_lagrimales_oi', models.TextField(blank=True, null=True)),
+                ('parpado_superior_oi', models.TextField(blank=True, null=True)),
+                ('parpado_inferior_oi', models.TextField(blank=True, null=True)),
+                ('observaciones_generales', models.TextField(blank=True, null=True)),
+                ('otros_detalles', models.TextField(blank=True, null=True)),
+                ('fecha_examen', models.DateTimeField(blank=True, db_column='fecha_examen', null=True)),
+            ],
+            options={
+                'verbose_name': 'Biomicroscopia',
+                'verbose_name_plural': 'Biomicroscopias',
+                'db_table': 'biomicroscopia',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CampoVisual',
+            fields=[
+                ('campo_visual_id', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo_campo', models.CharField(blank=True, max_length=50, null=True)),
+                ('resultado_od', models.TextField(blank=True, null=True)),
+                ('resultado_oi', models.TextField(blank=True, null=True)),
+                ('interpretacion', models.TextField(blank=True, null=True)),
+                ('fecha_examen', models.DateTimeField(blank=True, db_column='fecha_examen', null=True)),
+            ],
+            options={
+                'verbose_name': 'Campo visual',
+                'verbose_name_plural': 'Campos visuales',
+                'db_table': 'campos_visuales',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DiagnosticoMedico',
+            fields=[
+                ('diagnostico_id', models.AutoField(primary_key=True, serialize=False)),
+                ('diagnostico_principal', models.TextField(blank=True, null=True)),
+                ('diagnosticos_secundarios', models.TextField(blank=True, null=True)),
+                ('cie_10_principal', models.CharField(blank=True, max_length=10, null=True)),
+                ('cie_10_secundarios', models.TextField(blank=True, null=True)),
+                ('severidad', models.CharField(blank=True, max_length=20, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('fecha_diagnostico', models.DateTimeField(blank=True, db_column='fecha_diagnostico', null=True)),
+            ],
+            options={
+                'verbose_name': 'Diagnostico medico',
+                'verbose_name_plural': 'Diagnosticos medicos',
+                'db_table': 'diagnosticos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FichaClinica',
+            fields=[
+                ('ficha_id', models.AutoField(primary_key=True, serialize=False)),
+                ('numero_consulta', models.CharField(max_length=20, unique=True)),
+                ('fecha_consulta', models.DateTimeField()),
+                ('motivo_consulta', models.TextField(blank=True, null=True)),
+                ('historia_actual', models.TextField(blank=True, null=True)),
+                ('av_od_sc', models.CharField(blank=True, max_length=20, null=True)),
+                ('av_od_cc', models.CharField(blank=True, max_length=20, null=True)),
+                ('av_od_ph', models.CharField(blank=True, max_length=20, null=True)),
+                ('av_od_cerca', models.CharField(blank=True, max_length=20, null=True)),
+                ('av_oi_sc', models.CharField(blank=True, max_length=20, null=True)),
+                ('av_oi_cc', models.CharField(blank=True, max_length=20, null=True)),
+                ('av_oi_ph', models.CharField(blank=True, max_length=20, null=True)),
+                ('av_oi_cerca', models.CharField(blank=True, max_length=20, null=True)),
+                ('esfera_od', models.CharField(blank=True, max_length=10, null=True)),
+                ('cilindro_od', models.CharField(blank=True, max_length=10, null=True)),
+                ('eje_od', models.CharField(blank=True, max_length=10, null=True)),
+                ('adicion_od', models.CharField(blank=True, max_length=10, null=True)),
+                ('esfera_oi', models.CharField(blank=True, max_length=10, null=True)),
+                ('cilindro_oi', models.CharField(blank=True, max_length=10, null=True)),
+                ('eje_oi', models.CharField(blank=True, max_length=10, null=True)),
+                ('adicion_oi', models.CharField(blank=True, max_length=10, null=True)),
+                ('distancia_pupilar', models.CharField(blank=True, max_length=10, null=True)),
+                ('tipo_lente', models.CharField(blank=True, max_length=50, null=True)),
+                ('estado', models.CharField(default='en_proceso', max_length=20)),
+                ('fecha_creacion', models.DateTimeField(blank=True, db_column='fecha_creacion', null=True)),
+            ],
+            options={
+                'verbose_name': 'Ficha clinica',
+                'verbose_name_plural': 'Fichas clinicas',
+                'db_table': 'fichas_clinicas',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='FondoOjo',
+            fields=[
+                ('fondo_ojo_id', models.AutoField(primary_key=True, serialize=False)),
+                ('disco_optico_od', models.TextField(blank=True, null=True)),
+                ('macula_od', models.TextField(blank=True, null=True)),
+                ('vasos_od', models.TextField(blank=True, null=True)),
+                ('retina_periferica_od', models.TextField(blank=True, null=True)),
+                ('av_temp_sup_od', models.TextField(blank=True, null=True)),
+                ('av_temp_inf_od', models.TextField(blank=True, null=True)),
+                ('av_nasal_sup_od', models.TextField(blank=True, null=True)),
+                ('av_nasal_inf_od', models.TextField(blank=True, null=True)),
+                ('retina_od', models.TextField(blank=True, null=True)),
+                ('excavacion_od', models.TextField(blank=True, null=True)),
+                ('papila_detalle_od', models.TextField(blank=True, null=True)),
+                ('fijacion_od', models.TextField(blank=True, null=True)),
+                ('color_od', models.TextField(blank=True, null=True)),
+                ('borde_od', models.TextField(blank=True, null=True)),
+                ('disco_optico_oi', models.TextField(blank=True, null=True)),
+                ('macula_oi', models.TextField(blank=True, null=True)),
+                ('vasos_oi', models.TextField(blank=True, null=True)),
+                ('retina_periferica_oi', models.TextField(blank=True, null=True)),
+                ('av_temp_sup_oi', models.TextField(blank=True, null=True)),
+                ('av_temp_inf_oi', models.TextField(blank=True, null=True)),
+                ('av_nasal_sup_oi', models.TextField(blank=True, null=True)),
+                ('av_nasal_inf_oi', models.TextField(blank=True, null=True)),
+                ('retina_oi', models.TextField(blank=True, null=True)),
+                ('excavacion_oi', models.TextField(blank=True, null=True)),
+                ('papila_detalle_oi', models.TextField(blank=True, null=True)),
+                ('fijacion_oi', models.TextField(blank=True, null=True)),
+                ('color_oi', models.TextField(blank=True, null=True)),
+                ('borde_oi', models.TextField(blank=True, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('otros_detalles', models.TextField(blank=True, null=True)),
+                ('fecha_examen', models.DateTimeField(blank=True, db_column='fecha_examen', null=True)),
+            ],
+            options={
+                'verbose_name': 'Fondo de ojo',
+                'verbose_name_plural': 'Fondos de ojo',
+                'db_table': 'fondo_ojo',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ParametrosClinicos',
+            fields=[
+                ('parametro_id', models.AutoField(primary_key=True, serialize=False)),
+                ('presion_sistolica', models.CharField(blank=True, max_length=10, null=True)),
+                ('presion_diastolica', models.CharField(blank=True, max_length=10, null=True)),
+                ('saturacion_o2', models.CharField(blank=True, max_length=10, null=True)),
+                ('glucosa', models.CharField(blank=True, max_length=20, null=True)),
+                ('trigliceridos', models.CharField(blank=True, max_length=20, null=True)),
+                ('ttp', models.CharField(blank=True, max_length=20, null=True)),
+                ('atp', models.CharField(blank=True, max_length=20, null=True)),
+                ('colesterol', models.CharField(blank=True, max_length=20, null=True)),
+                ('fecha_registro', models.DateTimeField(blank=True, db_column='fecha_registro', null=True)),
+            ],
+            options={
+                'verbose_name': 'Parametro clinico',
+                'verbose_name_plural': 'Parametros clinicos',
+                'db_table': 'parametros_clinicos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PresionIntraocular',
+            fields=[
+                ('pio_id', models.AutoField(primary_key=True, serialize=False)),
+                ('pio_od', models.CharField(blank=True, max_length=10, null=True)),
+                ('pio_oi', models.CharField(blank=True, max_length=10, null=True)),
+                ('metodo_medicion', models.CharField(blank=True, max_length=50, null=True)),
+                ('hora_medicion', models.TimeField(blank=True, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('fecha_medicion', models.DateTimeField(blank=True, db_column='fecha_medicion', null=True)),
+            ],
+            options={
+                'verbose_name': 'Presion intraocular',
+                'verbose_name_plural': 'Presiones intraoculares',
+                'db_table': 'presion_intraocular',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ReflejosPupilares',
+            fields=[
+                ('reflejo_id', models.AutoField(primary_key=True, serialize=False)),
+                ('acomodativo_uno', models.TextField(blank=True, null=True)),
+                ('fotomotor_uno', models.TextField(blank=True, null=True)),
+                ('consensual_uno', models.TextField(blank=True, null=True)),
+                ('acomodativo_dos', models.TextField(blank=True, null=True)),
+                ('fotomotor_dos', models.TextField(blank=True, null=True)),
+                ('consensual_dos', models.TextField(blank=True, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('fecha_registro', models.DateTimeField(blank=True, db_column='fecha_registro', null=True)),
+            ],
+            options={
+                'verbose_name': 'Reflejos pupilares',
+                'verbose_name_plural': 'Reflejos pupilares',
+                'db_table': 'reflejos_pupilares',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Tratamiento',
+            fields=[
+                ('tratamiento_id', models.AutoField(primary_key=True, serialize=False)),
+                ('medicamentos', models.TextField(blank=True, null=True)),
+                ('tratamiento_no_farmacologico', models.TextField(blank=True, null=True)),
+                ('recomendaciones', models.TextField(blank=True, null=True)),
+                ('plan_seguimiento', models.TextField(blank=True, null=True)),
+                ('proxima_cita', models.DateField(blank=True, db_column='proxima_cita', null=True)),
+                ('urgencia_seguimiento', models.CharField(blank=True, max_length=20, null=True)),
+                ('fecha_tratamiento', models.DateTimeField(blank=True, db_column='fecha_tratamiento', null=True)),
+            ],
+            options={
+                'verbose_name': 'Tratamiento',
+                'verbose_name_plural': 'Tratamientos',
+                'db_table': 'tratamientos',
+                'managed': False,
+            },
+        ),
+    ]
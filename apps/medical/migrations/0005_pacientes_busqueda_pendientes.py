@@ -0,0 +1,118 @@
+"""
+Cola de pacientes a reindexar (``pacientes_busqueda_pendientes``) y los
+triggers que la llenan cuando cambian ``clientes`` o ``pacientes_medicos``,
+también desde fuera de la aplicación. Los triggers sólo anotan el id: la
+normalización del texto sigue en Python (``PatientSearchIndex.sincronizar``).
+
+Las tablas heredadas no están bajo migraciones: si no existen al migrar, no
+se crean triggers. Para instalarlos después de cargar las tablas basta con
+volver a aplicar esta migración (``migrate medical 0004`` y ``migrate``).
+"""
+
+from django.db import migrations, models
+
+QUEUE = "pacientes_busqueda_pendientes"
+
+# (nombre, evento, fila con el id del paciente) de los triggers sobre pacientes_medicos.
+PACIENTE_TRIGGERS = (
+    ("pacientes_medicos_busqueda_ai", "INSERT", "new"),
+    ("pacientes_medicos_busqueda_au", "UPDATE OF cliente_id, numero_ficha", "new"),
+    ("pacientes_medicos_busqueda_ad", "DELETE", "old"),
+)
+CLIENTE_TRIGGER = "clientes_busqueda_au"
+CLIENTE_COLUMNS = "nombres, ap_pat, ap_mat, rut"
+
+
+def _legacy_tables_exist(schema_editor) -> bool:
+    tables = schema_editor.connection.introspection.table_names()
+    return "pacientes_medicos" in tables and "clientes" in tables
+
+
+def _create_sqlite(schema_editor) -> None:
+    for nombre, evento, fila in PACIENTE_TRIGGERS:
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {nombre} AFTER {evento} ON pacientes_medicos BEGIN "
+            f"INSERT INTO {QUEUE} (paciente_medico_id) VALUES ({fila}.paciente_medico_id); END"
+        )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {CLIENTE_TRIGGER} AFTER UPDATE OF {CLIENTE_COLUMNS} ON clientes BEGIN "
+        f"INSERT INTO {QUEUE} (paciente_medico_id) "
+        "SELECT paciente_medico_id FROM pacientes_medicos WHERE cliente_id = new.cliente_id; END"
+    )
+
+
+def _create_postgresql(schema_editor) -> None:
+    schema_editor.execute(
+        f"CREATE OR REPLACE FUNCTION {QUEUE}_paciente() RETURNS trigger AS $$ BEGIN "
+        "IF TG_OP = 'DELETE' THEN "
+        f"INSERT INTO {QUEUE} (paciente_medico_id) VALUES (OLD.paciente_medico_id); "
+        "ELSE "
+        f"INSERT INTO {QUEUE} (paciente_medico_id) VALUES (NEW.paciente_medico_id); "
+        "END IF; RETURN NULL; END $$ LANGUAGE plpgsql"
+    )
+    schema_editor.execute(
+        f"CREATE OR REPLACE FUNCTION {QUEUE}_cliente() RETURNS trigger AS $$ BEGIN "
+        f"INSERT INTO {QUEUE} (paciente_medico_id) "
+        "SELECT paciente_medico_id FROM pacientes_medicos WHERE cliente_id = NEW.cliente_id; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql"
+    )
+    for nombre, evento, _fila in PACIENTE_TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {nombre} ON pacientes_medicos")
+        schema_editor.execute(
+            f"CREATE TRIGGER {nombre} AFTER {evento} ON pacientes_medicos "
+            f"FOR EACH ROW EXECUTE PROCEDURE {QUEUE}_paciente()"
+        )
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {CLIENTE_TRIGGER} ON clientes")
+    schema_editor.execute(
+        f"CREATE TRIGGER {CLIENTE_TRIGGER} AFTER UPDATE OF {CLIENTE_COLUMNS} ON clientes "
+        f"FOR EACH ROW EXECUTE PROCEDURE {QUEUE}_cliente()"
+    )
+
+
+def create_triggers(apps, schema_editor):
+    if not _legacy_tables_exist(schema_editor):
+        return
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _create_postgresql(schema_editor)
+    elif vendor == "sqlite":
+        _create_sqlite(schema_editor)
+
+
+def drop_triggers(apps, schema_editor):
+    if not _legacy_tables_exist(schema_editor):
+        return
+    vendor = schema_editor.connection.vendor
+    nombres = [(nombre, "pacientes_medicos") for nombre, _evento, _fila in PACIENTE_TRIGGERS]
+    nombres.append((CLIENTE_TRIGGER, "clientes"))
+    for nombre, tabla in nombres:
+        if vendor == "postgresql":
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {nombre} ON {tabla}")
+        elif vendor == "sqlite":
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP FUNCTION IF EXISTS {QUEUE}_paciente()")
+        schema_editor.execute(f"DROP FUNCTION IF EXISTS {QUEUE}_cliente()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medical", "0004_legacy_models"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PacienteBusquedaPendiente",
+            fields=[
+                ("pendiente_id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("paciente_medico_id", models.IntegerField()),
+            ],
+            options={
+                "verbose_name": "Búsqueda de paciente pendiente",
+                "verbose_name_plural": "Búsquedas de pacientes pendientes",
+                "db_table": "pacientes_busqueda_pendientes",
+            },
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -306,3 +306,54 @@ class ParametrosClinicos(models.Model):
         managed = False
         verbose_name = "Parametro clinico"
         verbose_name_plural = "Parametros clinicos"
+
+
+class PacienteBusqueda(models.Model):
+    """
+    Índice de búsqueda de pacientes: nombre e identificación normalizados
+    (minúsculas, sin tildes) de cada paciente médico. Lo mantiene
+    ``PatientSearchIndex`` al escribir pacientes y, para lo que se escribe
+    fuera de la aplicación, a partir de ``PacienteBusquedaPendiente``.
+    ``paciente_medico_id`` y ``cliente_id`` son enteros simples porque las
+    tablas heredadas no están bajo migraciones.
+    """
+
+    paciente_medico_id = models.IntegerField(primary_key=True)
+    cliente_id = models.IntegerField(blank=True, null=True)
+    nombre = models.CharField(max_length=320, default="")
+    rut = models.CharField(max_length=20, default="")
+    numero_ficha = models.CharField(max_length=40, default="")
+    texto = models.TextField(default="")
+
+    class Meta:
+        db_table = "pacientes_busqueda"
+        verbose_name = "Búsqueda de paciente"
+        verbose_name_plural = "Búsqueda de pacientes"
+        indexes = [
+            models.Index(fields=["rut"], name="idx_pacientes_busqueda_rut"),
+            models.Index(fields=["numero_ficha"], name="idx_pacientes_busqueda_ficha"),
+            models.Index(fields=["nombre"], name="idx_pacientes_busqueda_nombre"),
+        ]
+
+    def __str__(self) -> str:
+        return self.nombre
+
+
+class PacienteBusquedaPendiente(models.Model):
+    """
+    Pacientes cuyo documento de búsqueda hay que recalcular. Los escriben
+    triggers sobre ``clientes`` y ``pacientes_medicos`` (migración 0005), así
+    que también cubren lo que se modifica fuera de Django; los consume
+    ``PatientSearchIndex.sincronizar`` antes de cada búsqueda.
+    """
+
+    pendiente_id = models.BigAutoField(primary_key=True)
+    paciente_medico_id = models.IntegerField()
+
+    class Meta:
+        db_table = "pacientes_busqueda_pendientes"
+        verbose_name = "Búsqueda de paciente pendiente"
+        verbose_name_plural = "Búsquedas de pacientes pendientes"
+
+    def __str__(self) -> str:
+        return str(self.paciente_medico_id)
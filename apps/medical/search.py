@@ -0,0 +1,205 @@
+"""
+Búsqueda de pacientes médicos por nombre, cédula/RUC o número de ficha.
+
+En vez de varios ``icontains`` sobre ``clientes`` (recorrido completo con
+``LIKE '%x%'`` en cada tecla del selector de pacientes), se consulta la tabla
+``pacientes_busqueda``, que guarda por paciente el texto ya normalizado
+(minúsculas, sin tildes ni signos): "Pérez" y "Perez" coinciden. La tabla se
+actualiza al escribir pacientes (``PacienteMedicoService.create_paciente``).
+Lo que cambia por otras vías (otros sistemas, SQL directo) lo anotan
+triggers en ``pacientes_busqueda_pendientes`` y se aplica al comienzo de la
+búsqueda siguiente (``sincronizar``). ``manage.py reindex_pacientes``
+reconstruye todo el índice.
+
+- PostgreSQL con pg_trgm: cada palabra se busca como subcadena de ``texto``
+  (índice GIN trigram) y se aceptan errores de tipeo con la similitud de
+  palabra (``<%``).
+- SQLite con FTS5: cada palabra se busca como prefijo de alguna palabra en la
+  tabla virtual ``pacientes_busqueda_fts``. No se ordena por bm25: con textos
+  tan cortos no mejora el orden y calcularlo para cada coincidencia duplica el
+  tiempo de las consultas poco selectivas.
+- Sin ninguno de los dos: ``LIKE`` por palabra sobre ``texto``.
+
+En todos los casos primero va la coincidencia exacta de cédula o ficha,
+luego los nombres que empiezan con la consulta y después el resto (en
+PostgreSQL, por similitud); a igualdad, por nombre. El número de resultados
+siempre está acotado.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from apps.clients.models import PacienteMedico
+
+from .models import PacienteBusqueda, PacienteBusquedaPendiente
+
+FTS_TABLE = "pacientes_busqueda_fts"
+MAX_TERMS = 5
+SYNC_BATCH_SIZE = 1000
+
+_NO_ALNUM = re.compile(r"[^0-9a-z]+")
+_NO_DIGITS = re.compile(r"\D+")
+
+
+def normalizar_busqueda(valor: Optional[str]) -> str:
+    """Minúsculas, sin tildes y sólo letras/dígitos separados por un espacio."""
+    texto = unicodedata.normalize("NFKD", valor or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALNUM.sub(" ", texto).strip()
+
+
+def documento_busqueda(paciente_medico_id: int, cliente_id, nombres, ap_pat, ap_mat, rut, numero_ficha) -> dict:
+    """Fila de ``pacientes_busqueda`` para un paciente y los datos de su cliente."""
+    nombre = " ".join(filter(None, map(normalizar_busqueda, (nombres, ap_pat, ap_mat))))
+    rut = _NO_DIGITS.sub("", rut or "")
+    ficha = normalizar_busqueda(numero_ficha)
+    return {
+        "paciente_medico_id": paciente_medico_id,
+        "cliente_id": cliente_id,
+        "nombre": nombre[:320],
+        "rut": rut[:20],
+        "numero_ficha": (numero_ficha or "").strip().lower()[:40],
+        "texto": " ".join(filter(None, (nombre, rut, ficha))),
+    }
+
+
+ROW_COLUMNS = (
+    "paciente_medico_id",
+    "cliente_id",
+    "cliente__nombres",
+    "cliente__ap_pat",
+    "cliente__ap_mat",
+    "cliente__rut",
+    "numero_ficha",
+)
+
+
+class PatientSearchIndex:
+    _engine: Optional[str] = None
+
+    # ---------------- Escritura ----------------
+    def _documents(self, qs) -> List[PacienteBusqueda]:
+        return [PacienteBusqueda(**documento_busqueda(*row)) for row in qs.values_list(*ROW_COLUMNS)]
+
+    def update(self, paciente_ids: Iterable[int]) -> int:
+        """Recalcula las filas de los pacientes indicados (una lectura y un upsert)."""
+        ids = {int(pid) for pid in paciente_ids if pid}
+        if not ids:
+            return 0
+        docs = self._documents(PacienteMedico.objects.filter(paciente_medico_id__in=ids))
+        PacienteBusqueda.objects.bulk_create(
+            docs,
+            update_conflicts=True,
+            unique_fields=["paciente_medico_id"],
+            update_fields=["cliente_id", "nombre", "rut", "numero_ficha", "texto"],
+        )
+        faltantes = ids - {doc.paciente_medico_id for doc in docs}
+        if faltantes:
+            PacienteBusqueda.objects.filter(paciente_medico_id__in=faltantes).delete()
+        return len(docs)
+
+    def sincronizar(self, limite: int = SYNC_BATCH_SIZE) -> int:
+        """
+        Recalcula los pacientes que anotaron los triggers de ``clientes`` y
+        ``pacientes_medicos``. Con la cola vacía es una sola lectura.
+        """
+        pendientes = list(
+            PacienteBusquedaPendiente.objects.order_by("pendiente_id").values_list(
+                "pendiente_id", "paciente_medico_id"
+            )[:limite]
+        )
+        if not pendientes:
+            return 0
+        with transaction.atomic():
+            self.update({paciente_id for _pendiente, paciente_id in pendientes})
+            PacienteBusquedaPendiente.objects.filter(pendiente_id__in=[p for p, _paciente in pendientes]).delete()
+        return len(pendientes)
+
+    def rebuild(self, batch_size: int = 5000) -> int:
+        """Reconstruye el índice completo por lotes de ``paciente_medico_id``."""
+        PacienteBusquedaPendiente.objects.all().delete()
+        PacienteBusqueda.objects.all().delete()
+        total, ultimo = 0, 0
+        base = PacienteMedico.objects.order_by("paciente_medico_id")
+        while True:
+            docs = self._documents(base.filter(paciente_medico_id__gt=ultimo)[:batch_size])
+            if not docs:
+                return total
+            PacienteBusqueda.objects.bulk_create(docs, batch_size=batch_size)
+            total += len(docs)
+            ultimo = docs[-1].paciente_medico_id
+
+    # ---------------- Consulta ----------------
+    def engine(self) -> str:
+        """``trigram``, ``fts5`` o ``like`` según lo que ofrezca la base de datos."""
+        if PatientSearchIndex._engine is None:
+            engine = "like"
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    if cursor.fetchone():
+                        engine = "trigram"
+                elif connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names(cursor):
+                    engine = "fts5"
+            PatientSearchIndex._engine = engine
+        return PatientSearchIndex._engine
+
+    def _rank(self, consulta: str, rut: str, prefijo: str) -> Case:
+        whens = [When(numero_ficha=consulta, then=Value(0))]
+        if rut:
+            whens.insert(0, When(rut=rut, then=Value(0)))
+        whens.append(When(nombre__startswith=prefijo, then=Value(1)))
+        return Case(*whens, default=Value(2), output_field=IntegerField())
+
+    def _search_fts(self, terms: list, consulta: str, rut: str, prefijo: str, limit: int) -> List[int]:
+        table = PacienteBusqueda._meta.db_table
+        match = " ".join(f'"{term}"*' for term in terms)
+        sql = (
+            f"SELECT b.paciente_medico_id FROM {FTS_TABLE} f "
+            f"JOIN {table} b ON b.paciente_medico_id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s "
+            "ORDER BY CASE WHEN b.rut = %s OR b.numero_ficha = %s THEN 0 "
+            "WHEN b.nombre LIKE %s THEN 1 ELSE 2 END, b.nombre, b.paciente_medico_id "
+            "LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, rut or None, consulta, f"{prefijo}%", limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_ids(self, query: str, limit: int) -> List[int]:
+        """Ids de pacientes ordenados por relevancia, como máximo ``limit``."""
+        terms = normalizar_busqueda(query).split()[:MAX_TERMS]
+        if not terms:
+            return []
+        self.sincronizar()
+        consulta = (query or "").strip().lower()
+        rut = _NO_DIGITS.sub("", consulta)
+        prefijo = " ".join(terms)
+        engine = self.engine()
+        if engine == "fts5":
+            return self._search_fts(terms, consulta, rut, prefijo, limit)
+
+        qs = PacienteBusqueda.objects.annotate(rango=self._rank(consulta, rut, prefijo))
+        condition = Q()
+        for term in terms:
+            condition &= Q(texto__contains=term)
+        orden = ("rango", "nombre", "paciente_medico_id")
+        if engine == "trigram":
+            table = PacienteBusqueda._meta.db_table
+            # "<%": similitud de palabra de pg_trgm, usa el índice GIN sobre ``texto``.
+            condition |= Q(RawSQL(f'%s <%% "{table}"."texto"', [prefijo], output_field=BooleanField()))
+            qs = qs.annotate(
+                relevancia=RawSQL(f'word_similarity(%s, "{table}"."texto")', [prefijo], output_field=FloatField())
+            )
+            orden = ("rango", "-relevancia", "nombre", "paciente_medico_id")
+        return list(qs.filter(condition).order_by(*orden).values_list("paciente_medico_id", flat=True)[:limit])
+
+
+patient_index = PatientSearchIndex()
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
-import random
 import re
-from datetime import datetime
-from typing import Any, Dict, Iterable, Optional
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional
 
-from django.db import transaction
-from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Exists, F, FilteredRelation, IntegerField, OuterRef, Prefetch, Q, Subquery, Value
+
+from django.utils import timezone
 
 from apps.clients.models import Cliente
-from apps.shared.serializers import model_to_legacy_dict, sanitize_model_payload
+from apps.shared.numbering import document_numbers
+from apps.shared.pagination import DEFAULT_PAGE_SIZE, paginate_keyset
+from apps.shared.serializers import sanitize_model_payload
+from apps.shared.versioning import bump_data_version, get_data_version
 
 from .models import (
     Biomicroscopia,
@@ -22,6 +29,399 @@ from .models import (
     DiagnosticoMedico,
     PresionIntraocular,
 )
+from .search import patient_index
+
+BIO_RESUMEN_OD = ["parpados_od", "conjuntiva_od", "cornea_od", "camara_anterior_od", "iris_od", "cristalino_od"]
+BIO_RESUMEN_OI = ["parpados_oi", "conjuntiva_oi", "cornea_oi", "camara_anterior_oi", "iris_oi", "cristalino_oi"]
+FONDO_RESUMEN_OD = ["disco_optico_od", "macula_od", "vasos_od", "retina_periferica_od"]
+FONDO_RESUMEN_OI = ["disco_optico_oi", "macula_oi", "vasos_oi", "retina_periferica_oi"]
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def compactar_campos(instance, campos) -> Optional[str]:
+    partes = []
+    for campo in campos:
+        valor = getattr(instance, campo, "")
+        if valor:
+            partes.append(str(valor).strip())
+    return ", ".join(partes) if partes else None
+
+
+def _unir_ojos(od: Optional[str], oi: Optional[str], obs: Optional[str]) -> Optional[str]:
+    partes = []
+    if od:
+        partes.append(f"OD: {od}")
+    if oi:
+        partes.append(f"OI: {oi}")
+    if obs:
+        partes.append(obs.strip())
+    return ". ".join(partes) if partes else None
+
+
+def resumen_biomicroscopia(bio: Optional[Biomicroscopia]) -> Optional[str]:
+    if not bio:
+        return None
+    return _unir_ojos(
+        compactar_campos(bio, BIO_RESUMEN_OD),
+        compactar_campos(bio, BIO_RESUMEN_OI),
+        bio.observaciones_generales,
+    )
+
+
+def resumen_fondo_ojo(fondo: Optional[FondoOjo]) -> Optional[str]:
+    if not fondo:
+        return None
+    return _unir_ojos(
+        compactar_campos(fondo, FONDO_RESUMEN_OD),
+        compactar_campos(fondo, FONDO_RESUMEN_OI),
+        fondo.observaciones,
+    )
+
+
+def resumen_diagnostico(dx: Optional[DiagnosticoMedico]) -> Optional[str]:
+    if not dx:
+        return None
+    partes = []
+    principal = (dx.diagnostico_principal or "").strip()
+    if principal:
+        cie = f" ({dx.cie_10_principal})" if dx.cie_10_principal else ""
+        partes.append(f"{principal}{cie}")
+    secundarios = []
+    if dx.diagnosticos_secundarios:
+        secundarios.append(dx.diagnosticos_secundarios.strip())
+    if dx.cie_10_secundarios:
+        secundarios.append(dx.cie_10_secundarios.strip())
+    if secundarios:
+        partes.append(", ".join(secundarios))
+    return ", ".join(partes) if partes else None
+
+
+def tratamiento_items(tx: Optional[Tratamiento]) -> list:
+    if not tx:
+        return []
+    bloques = [tx.medicamentos, tx.tratamiento_no_farmacologico, tx.recomendaciones, tx.plan_seguimiento]
+    items = []
+    for bloque in bloques:
+        if not bloque:
+            continue
+        for linea in str(bloque).splitlines():
+            limpio = linea.strip().lstrip("-•·").strip()
+            if limpio:
+                items.append(limpio)
+    return items
+
+
+# Los resúmenes reciben una fila (``values()`` o ``vars(instancia)``) indexada
+# por nombre de columna.
+def fondo_ojo_resumen_dict(fondo: Mapping[str, Any]) -> dict:
+    return {
+        "od": ", ".join(filter(None, [fondo.get(campo) for campo in FONDO_RESUMEN_OD])),
+        "oi": ", ".join(filter(None, [fondo.get(campo) for campo in FONDO_RESUMEN_OI])),
+        "observaciones": fondo.get("observaciones") or fondo.get("otros_detalles"),
+        "fecha_examen": _iso(fondo.get("fecha_examen")),
+    }
+
+
+def presion_resumen_dict(pio: Mapping[str, Any]) -> dict:
+    return {
+        "pio_od": pio.get("pio_od"),
+        "pio_oi": pio.get("pio_oi"),
+        "metodo": pio.get("metodo_medicion"),
+        "hora": _iso(pio.get("hora_medicion")),
+        "observaciones": pio.get("observaciones"),
+        "fecha_medicion": _iso(pio.get("fecha_medicion")),
+    }
+
+
+def _legacy_row(row: Mapping[str, Any]) -> dict:
+    """Equivalente de ``model_to_legacy_dict`` para filas de ``values()``."""
+    return {
+        key: value.isoformat() if isinstance(value, (datetime, date, time)) else value
+        for key, value in row.items()
+    }
+
+
+def _column_names(model) -> tuple:
+    return tuple(field.attname for field in model._meta.concrete_fields)
+
+
+class ExamSection(NamedTuple):
+    model: Any
+    ordering: tuple
+    columns: tuple
+
+
+# Secciones del examen completo, en el orden de la respuesta heredada. Para
+# las tablas 1:1 (biomicroscopía, reflejos, fondo, parámetros) se conserva el
+# criterio de ``.first()`` (menor id); diagnóstico y tratamiento toman el más
+# reciente.
+EXAM_SECTIONS = {
+    "biomicroscopia": ExamSection(Biomicroscopia, ("biomicroscopia_id",), _column_names(Biomicroscopia)),
+    "reflejos": ExamSection(ReflejosPupilares, ("reflejo_id",), _column_names(ReflejosPupilares)),
+    "fondo_ojo": ExamSection(FondoOjo, ("fondo_ojo_id",), _column_names(FondoOjo)),
+    "parametros": ExamSection(ParametrosClinicos, ("parametro_id",), _column_names(ParametrosClinicos)),
+    "diagnostico": ExamSection(
+        DiagnosticoMedico, ("-fecha_diagnostico", "-diagnostico_id"), _column_names(DiagnosticoMedico)
+    ),
+    "tratamiento": ExamSection(Tratamiento, ("-fecha_tratamiento", "-tratamiento_id"), _column_names(Tratamiento)),
+}
+
+# Secciones de ``resumen_examenes``: sólo las columnas que usa el resumen.
+SUMMARY_SECTIONS = {
+    "fondo_ojo": ExamSection(
+        FondoOjo,
+        ("-fecha_examen", "-fondo_ojo_id"),
+        ("ficha_id", *FONDO_RESUMEN_OD, *FONDO_RESUMEN_OI, "observaciones", "otros_detalles", "fecha_examen"),
+    ),
+    "presion_intraocular": ExamSection(
+        PresionIntraocular,
+        ("-fecha_medicion", "-pio_id"),
+        ("ficha_id", "pio_od", "pio_oi", "metodo_medicion", "hora_medicion", "observaciones", "fecha_medicion"),
+    ),
+}
+
+
+class ExamBundleLoader:
+    """
+    Carga secciones de examen para una o muchas fichas con una consulta por
+    sección (no por ficha) y devuelve, por ficha, la primera fila de cada una
+    según el orden de la sección. En PostgreSQL se usa ``DISTINCT ON
+    (ficha_id)`` para traer sólo esa fila; en otros motores se descartan las
+    demás al recorrer el resultado.
+    """
+
+    def _first_rows(self, section: ExamSection, ficha_ids: list) -> Dict[int, dict]:
+        qs = section.model.objects.filter(ficha_id__in=ficha_ids).order_by("ficha_id", *section.ordering)
+        if connection.vendor == "postgresql":
+            qs = qs.distinct("ficha_id")
+        filas: Dict[int, dict] = {}
+        for row in qs.values(*section.columns):
+            filas.setdefault(row["ficha_id"], row)
+        return filas
+
+    def load(self, ficha_ids: Iterable[int], sections: Mapping[str, ExamSection]) -> Dict[int, dict]:
+        ids = sorted(set(ficha_ids))
+        resultado = {ficha_id: dict.fromkeys(sections) for ficha_id in ids}
+        if not ids:
+            return resultado
+        for nombre, section in sections.items():
+            for ficha_id, row in self._first_rows(section, ids).items():
+                resultado[ficha_id][nombre] = row
+        return resultado
+
+    def examenes(self, ficha_ids: Iterable[int]) -> Dict[int, dict]:
+        """Formato de ``obtener_examen`` (columnas heredadas) por ficha."""
+        bundles = self.load(ficha_ids, EXAM_SECTIONS)
+        return {
+            ficha_id: {nombre: _legacy_row(row) if row else None for nombre, row in secciones.items()}
+            for ficha_id, secciones in bundles.items()
+        }
+
+    def resumenes(self, ficha_ids: Iterable[int]) -> Dict[int, dict]:
+        """Formato de ``resumen_examenes`` por ficha."""
+        bundles = self.load(ficha_ids, SUMMARY_SECTIONS)
+        return {
+            ficha_id: {
+                "ficha_id": ficha_id,
+                "fondo_ojo": fondo_ojo_resumen_dict(secciones["fondo_ojo"]) if secciones["fondo_ojo"] else None,
+                "presion_intraocular": presion_resumen_dict(secciones["presion_intraocular"])
+                if secciones["presion_intraocular"]
+                else None,
+            }
+            for ficha_id, secciones in bundles.items()
+        }
+
+
+exam_loader = ExamBundleLoader()
+
+
+class ExamSaveResult(NamedTuple):
+    secciones: Dict[str, Optional[dict]]
+    tiempos_ms: Dict[str, float]
+    sentencias: int
+
+
+class ExamWriter:
+    """
+    Guarda el examen de una ficha con un número fijo de sentencias: una sola
+    lectura trae la ficha y la fila vigente de cada sección (mismo criterio que
+    ``EXAM_SECTIONS``) y luego hay, como máximo, una escritura por sección, sólo
+    si algo cambió y sólo con las columnas que cambiaron.
+
+    Las secciones 1:1 se escriben con ``INSERT ... ON CONFLICT (ficha_id) DO
+    UPDATE`` (``bulk_create(update_conflicts=True)``, en PostgreSQL y SQLite)
+    cuando la tabla tiene el índice único de ``ficha_id`` (migración 0003); si
+    no lo tiene (datos heredados duplicados), con UPDATE por id o INSERT.
+    Diagnóstico y tratamiento admiten varias filas por ficha:
+    se actualiza la más reciente o se inserta una nueva.
+    """
+
+    UPSERT_SECTIONS = ("biomicroscopia", "reflejos", "fondo_ojo", "parametros")
+    _upsert_tables: Dict[str, bool] = {}
+
+    @classmethod
+    def reset(cls) -> None:
+        """Olvida qué tablas tienen el índice único (p. ej. después de migrar)."""
+        cls._upsert_tables.clear()
+
+    def _upsert_disponible(self, model) -> bool:
+        table = model._meta.db_table
+        if table not in ExamWriter._upsert_tables:
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, table)
+            ExamWriter._upsert_tables[table] = any(
+                c["unique"] and c["columns"] == ["ficha_id"] for c in constraints.values()
+            )
+        return ExamWriter._upsert_tables[table]
+
+    def _leer(self, ficha_id: int, nombres: list) -> Optional[dict]:
+        """Ficha y fila vigente de cada sección (``None`` si no tiene) en una consulta."""
+        annotations, columns = {}, ["paciente_medico_id"]
+        for nombre in nombres:
+            section = EXAM_SECTIONS[nombre]
+            relacion = section.model._meta.get_field("ficha").remote_field.related_name
+            pk = section.model._meta.pk.attname
+            vigente = section.model.objects.filter(ficha_id=OuterRef("ficha_id")).order_by(*section.ordering)
+            annotations[f"_{nombre}"] = FilteredRelation(
+                relacion, condition=Q(**{f"{relacion}__{pk}": Subquery(vigente.values(pk)[:1])})
+            )
+            columns += [f"_{nombre}__{column}" for column in section.columns]
+        row = FichaClinica.objects.filter(ficha_id=ficha_id).annotate(**annotations).values(*columns).first()
+        if row is None:
+            return None
+        filas = {"paciente_medico_id": row["paciente_medico_id"]}
+        for nombre in nombres:
+            section = EXAM_SECTIONS[nombre]
+            fila = {column: row[f"_{nombre}__{column}"] for column in section.columns}
+            filas[nombre] = fila if fila[section.model._meta.pk.attname] is not None else None
+        return filas
+
+    def _datos(self, model, payload: Dict[str, Any]) -> Dict[str, Any]:
+        datos = sanitize_model_payload(model, payload)
+        # La ficha y el id los fija el servidor, no el formulario.
+        datos.pop("ficha", None)
+        datos.pop(model._meta.pk.name, None)
+        return datos
+
+    def _cambios(self, model, fila: Optional[dict], datos: Dict[str, Any]) -> Dict[str, Any]:
+        if fila is None:
+            return dict(datos)
+        cambios = {}
+        for nombre, valor in datos.items():
+            field = model._meta.get_field(nombre)
+            try:
+                igual = field.to_python(valor) == fila[field.attname]
+            except (ValidationError, TypeError):
+                igual = False
+            if not igual:
+                cambios[nombre] = valor
+        return cambios
+
+    def _escribir(
+        self, nombre: str, ficha_id: int, fila: Optional[dict], datos: Dict[str, Any], upsert: bool
+    ) -> dict:
+        section = EXAM_SECTIONS[nombre]
+        model = section.model
+        pk = model._meta.pk.attname
+        cambios = self._cambios(model, fila, datos)
+        nueva = fila is None
+        if nueva or cambios:
+            if upsert:
+                instancia = model(ficha_id=ficha_id, **datos)
+                model.objects.bulk_create(
+                    [instancia],
+                    update_conflicts=True,
+                    unique_fields=["ficha"],
+                    update_fields=list(cambios) or ["ficha"],
+                )
+                nuevo_pk = instancia.pk
+            elif nueva:
+                nuevo_pk = model.objects.create(ficha_id=ficha_id, **datos).pk
+            else:
+                model.objects.filter(pk=fila[pk]).update(**cambios)
+        resultado = dict.fromkeys(section.columns) if nueva else dict(fila)
+        resultado.update({model._meta.get_field(campo).attname: valor for campo, valor in datos.items()})
+        resultado["ficha_id"] = ficha_id
+        if nueva:
+            resultado[pk] = nuevo_pk
+        return _legacy_row(resultado)
+
+    def save(self, ficha_id: int, payload: Dict[str, Any]) -> ExamSaveResult:
+        """Guarda las secciones presentes en ``payload`` (formato de ``guardar_examen``)."""
+        secciones = {
+            "biomicroscopia": self._datos(Biomicroscopia, payload.get("biomicroscopia") or {}),
+            "reflejos": self._datos(ReflejosPupilares, payload.get("reflejos") or {}),
+            "fondo_ojo": self._datos(FondoOjo, payload.get("fondo_ojo") or {}),
+            "parametros": self._datos(ParametrosClinicos, payload.get("parametros") or {}),
+        }
+        for nombre, model, campo in (
+            ("diagnostico", DiagnosticoMedico, "diagnostico_principal"),
+            ("tratamiento", Tratamiento, "medicamentos"),
+        ):
+            valor = payload.get(nombre)
+            if valor:
+                secciones[nombre] = self._datos(model, valor) if isinstance(valor, dict) else {campo: str(valor)}
+
+        # Se revisa una vez por proceso, fuera de la cuenta de sentencias.
+        upsert = {nombre: self._upsert_disponible(EXAM_SECTIONS[nombre].model) for nombre in self.UPSERT_SECTIONS}
+        sentencias = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal sentencias
+            sentencias += 1
+            return execute(sql, params, many, context)
+
+        tiempos: Dict[str, float] = {}
+        resultado: Dict[str, Optional[dict]] = {"diagnostico": None, "tratamiento": None}
+        inicio = perf_counter()
+        with connection.execute_wrapper(contar), transaction.atomic():
+            filas = self._leer(ficha_id, list(secciones))
+            if filas is None:
+                raise ValueError("Ficha clínica no encontrada")
+            tiempos["lectura"] = (perf_counter() - inicio) * 1000
+            for nombre, datos in secciones.items():
+                marca = perf_counter()
+                resultado[nombre] = self._escribir(nombre, ficha_id, filas[nombre], datos, upsert.get(nombre, False))
+                tiempos[nombre] = (perf_counter() - marca) * 1000
+            invalidar_historial(filas["paciente_medico_id"])
+        tiempos["total"] = (perf_counter() - inicio) * 1000
+
+        orden = ("biomicroscopia", "reflejos", "fondo_ojo", "parametros", "diagnostico", "tratamiento")
+        return ExamSaveResult(
+            secciones={nombre: resultado[nombre] for nombre in orden},
+            tiempos_ms={nombre: round(ms, 2) for nombre, ms in tiempos.items()},
+            sentencias=sentencias,
+        )
+
+
+exam_writer = ExamWriter()
+
+
+def historial_namespace(paciente_id) -> str:
+    return f"historial-paciente:{paciente_id}"
+
+
+def invalidar_historial(*paciente_ids) -> None:
+    """Invalida la línea de tiempo cacheada de los pacientes indicados."""
+    namespaces = {historial_namespace(pid) for pid in paciente_ids if pid}
+    if namespaces:
+        bump_data_version(*namespaces)
+
+
+PERSONA_CLIENTE_FIELDS = ("nombres", "ap_pat", "ap_mat", "rut", "email", "telefono", "direccion", "fecha_nacimiento")
+PERSONA_PACIENTE_FIELDS = (
+    "numero_ficha",
+    "antecedentes_medicos",
+    "antecedentes_oculares",
+    "alergias",
+    "medicamentos_actuales",
+    "contacto_emergencia",
+    "telefono_emergencia",
+    "fecha_registro",
+)
 
 
 class PacienteMedicoService:
@@ -64,12 +464,7 @@ class PacienteMedicoService:
         return self.rut_regex.sub("", valor or "").strip()
 
     def _generar_numero_ficha(self) -> str:
-        for _ in range(5):
-            ahora = datetime.utcnow()
-            pref = f"FM-{ahora.year}{str(ahora.month).zfill(2)}-{int(ahora.timestamp() * 1000)}-{random.randint(100,999)}"
-            if not PacienteMedico.objects.filter(numero_ficha=pref).exists():
-                return pref
-        return f"FM-{int(datetime.utcnow().timestamp()*1000)}-{random.randint(1000,9999)}"
+        return document_numbers.next_number("ficha")
 
     def _cliente_to_dict(self, cliente: Optional[Cliente]) -> dict:
         if not cliente:
@@ -110,15 +505,18 @@ class PacienteMedicoService:
         pacientes = PacienteMedico.objects.select_related("cliente").order_by("-paciente_medico_id")
         return [self._paciente_to_dict(p) for p in pacientes]
 
-    def search(self, query: str) -> Iterable[dict]:
+    def search(self, query: str, limit: int = DEFAULT_PAGE_SIZE) -> Iterable[dict]:
+        """
+        Pacientes que coinciden con ``query`` (nombre, cédula o ficha, sin
+        distinguir tildes), por relevancia y como máximo ``limit``. Sin
+        consulta devuelve los más recientes.
+        """
         qs = PacienteMedico.objects.select_related("cliente")
-        if query:
-            like = Q(cliente__nombres__icontains=query) | Q(cliente__ap_pat__icontains=query) | Q(
-                cliente__ap_mat__icontains=query
-            ) | Q(cliente__rut__icontains=query)
-            qs = qs.filter(like)
-        pacientes = qs.order_by("-paciente_medico_id")
-        return [self._paciente_to_dict(p) for p in pacientes]
+        if not (query or "").strip():
+            return [self._paciente_to_dict(p) for p in qs.order_by("-paciente_medico_id")[:limit]]
+        ids = patient_index.search_ids(query, limit)
+        pacientes = qs.in_bulk(ids)
+        return [self._paciente_to_dict(pacientes[pid]) for pid in ids if pid in pacientes]
 
     def get_by_id(self, paciente_id: int) -> Optional[dict]:
         paciente = (
@@ -130,45 +528,92 @@ class PacienteMedicoService:
             return None
         return self._paciente_to_dict(paciente)
 
-    def get_personas(self, q: str = "", estado: Optional[str] = None, limit: int = 100, offset: int = 0):
-        pacientes_qs = PacienteMedico.objects.select_related("cliente")
-        if q:
-            like = Q(cliente__nombres__icontains=q) | Q(cliente__ap_pat__icontains=q) | Q(
-                cliente__ap_mat__icontains=q
-            ) | Q(cliente__rut__icontains=q)
-            pacientes_qs = pacientes_qs.filter(like)
-        if estado in ("true", "false"):
-            pacientes_qs = pacientes_qs.filter(estado=(estado == "true"))
-
-        items = []
-        cliente_ids = set()
-        for paciente in pacientes_qs:
-            items.append(
-                {
-                    "type": "paciente",
-                    **self._paciente_to_dict(paciente),
-                }
-            )
-            cliente_ids.add(paciente.cliente_id)
+    def _personas_filter(self, q: str, prefix: str) -> Q:
+        like = Q()
+        for field in ("nombres", "ap_pat", "ap_mat", "rut"):
+            like |= Q(**{f"{prefix}{field}__icontains": q})
+        return like
 
-        clientes_qs = Cliente.objects.exclude(cliente_id__in=cliente_ids)
+    def personas_queryset(self, q: str = "", estado: Optional[str] = None):
+        """
+        Pacientes y clientes sin ficha en una sola consulta (``UNION ALL``),
+        con las mismas columnas en ambas ramas: primero los pacientes y luego
+        los clientes, cada grupo por nombre.
+        """
+        pacientes = PacienteMedico.objects.all()
+        clientes = Cliente.objects.filter(~Exists(PacienteMedico.objects.filter(cliente_id=OuterRef("cliente_id"))))
         if q:
-            like = Q(nombres__icontains=q) | Q(ap_pat__icontains=q) | Q(ap_mat__icontains=q) | Q(rut__icontains=q)
-            clientes_qs = clientes_qs.filter(like)
+            pacientes = pacientes.filter(self._personas_filter(q, "cliente__"))
+            clientes = clientes.filter(self._personas_filter(q, ""))
         if estado in ("true", "false"):
-            clientes_qs = clientes_qs.filter(estado=(estado == "true"))
+            pacientes = pacientes.filter(estado=(estado == "true"))
+            clientes = clientes.filter(estado=(estado == "true"))
 
-        clientes_qs = clientes_qs.order_by("nombres")[offset : offset + limit]
-        for cliente in clientes_qs:
-            items.append(
-                {
-                    "type": "cliente",
-                    "cliente_id": cliente.cliente_id,
-                    "estado": cliente.estado,
-                    "cliente": self._cliente_to_dict(cliente),
-                }
-            )
-        return items
+        pacientes = pacientes.values(
+            tipo=Value(0, output_field=IntegerField()),
+            persona_paciente_id=F("paciente_medico_id"),
+            persona_cliente_id=F("cliente_id"),
+            **{f"cli_{field}": F(f"cliente__{field}") for field in PERSONA_CLIENTE_FIELDS},
+            **{f"pac_{field}": F(field) for field in PERSONA_PACIENTE_FIELDS},
+            persona_estado=F("estado"),
+            cliente_estado=F("cliente__estado"),
+        )
+        nulos = {
+            f"pac_{field}": Value(None, output_field=PacienteMedico._meta.get_field(field))
+            for field in PERSONA_PACIENTE_FIELDS
+        }
+        clientes = clientes.values(
+            tipo=Value(1, output_field=IntegerField()),
+            persona_paciente_id=Value(None, output_field=IntegerField()),
+            persona_cliente_id=F("cliente_id"),
+            **{f"cli_{field}": F(field) for field in PERSONA_CLIENTE_FIELDS},
+            **nulos,
+            persona_estado=F("estado"),
+            cliente_estado=F("estado"),
+        )
+        return pacientes.union(clientes, all=True).order_by(
+            "tipo", "cli_nombres", "cli_ap_pat", "persona_cliente_id", "persona_paciente_id"
+        )
+
+    def _persona_to_dict(self, row: dict) -> dict:
+        cliente = {}
+        if row["persona_cliente_id"]:
+            cliente = {"cliente_id": row["persona_cliente_id"]}
+            cliente.update({field: row[f"cli_{field}"] for field in PERSONA_CLIENTE_FIELDS})
+            cliente["fecha_nacimiento"] = _iso(cliente["fecha_nacimiento"])
+            cliente["estado"] = row["cliente_estado"]
+        if row["tipo"] == 1:
+            return {
+                "type": "cliente",
+                "cliente_id": row["persona_cliente_id"],
+                "estado": row["persona_estado"],
+                "cliente": cliente,
+            }
+        data = {
+            "type": "paciente",
+            "paciente_medico_id": row["persona_paciente_id"],
+            "cliente_id": row["persona_cliente_id"],
+        }
+        data.update({field: row[f"pac_{field}"] for field in PERSONA_PACIENTE_FIELDS})
+        data["fecha_registro"] = _iso(data["fecha_registro"])
+        data["estado"] = row["persona_estado"]
+        data["cliente"] = cliente
+        return data
+
+    def get_personas(self, q: str = "", estado: Optional[str] = None, limit: int = 100, offset: int = 0):
+        """
+        Página ``offset``/``limit`` de la lista combinada y el total de
+        personas que cumplen el filtro. El total sólo se consulta aparte
+        cuando la página viene llena o vacía más allá del final (si no, ya
+        se conoce).
+        """
+        qs = self.personas_queryset(q, estado)
+        rows = list(qs[offset : offset + limit])
+        if (rows and len(rows) < limit) or (not rows and not offset):
+            total = offset + len(rows)
+        else:
+            total = qs.count()
+        return [self._persona_to_dict(row) for row in rows], total
 
     @transaction.atomic
     def create_paciente(self, payload: dict) -> dict:
@@ -219,6 +664,8 @@ class PacienteMedicoService:
 
         existente = PacienteMedico.objects.filter(cliente_id=cliente.cliente_id).first()
         if existente:
+            invalidar_historial(existente.paciente_medico_id)
+            patient_index.update([existente.paciente_medico_id])
             return {
                 "already_exists": True,
                 "data": self._paciente_to_dict(existente),
@@ -240,6 +687,7 @@ class PacienteMedicoService:
             estado=bool(pac_in.get("estado", True)),
         )
         paciente.refresh_from_db()
+        patient_index.update([paciente.paciente_medico_id])
         return {
             "already_exists": False,
             "data": self._paciente_to_dict(paciente),
@@ -252,125 +700,45 @@ class BiomicroscopiaService:
     """
 
     def obtener_examen(self, ficha_id: int) -> Dict[str, Any]:
-        data = {
-            "biomicroscopia": None,
-            "reflejos": None,
-            "fondo_ojo": None,
-            "parametros": None,
-            "diagnostico": None,
-            "tratamiento": None,
-        }
-
-        bio = Biomicroscopia.objects.filter(ficha_id=ficha_id).first()
-        if bio:
-            data["biomicroscopia"] = model_to_legacy_dict(bio)
-
-        reflejos = ReflejosPupilares.objects.filter(ficha_id=ficha_id).first()
-        if reflejos:
-            data["reflejos"] = model_to_legacy_dict(reflejos)
-
-        fondo = FondoOjo.objects.filter(ficha_id=ficha_id).first()
-        if fondo:
-            data["fondo_ojo"] = model_to_legacy_dict(fondo)
-
-        parametros = ParametrosClinicos.objects.filter(ficha_id=ficha_id).first()
-        if parametros:
-            data["parametros"] = model_to_legacy_dict(parametros)
-
-        diag = (
-            DiagnosticoMedico.objects.filter(ficha_id=ficha_id)
-            .order_by("-fecha_diagnostico")
-            .first()
-        )
-        if diag:
-            data["diagnostico"] = model_to_legacy_dict(diag)
-
-        tx = (
-            Tratamiento.objects.filter(ficha_id=ficha_id)
-            .order_by("-fecha_tratamiento")
-            .first()
-        )
-        if tx:
-            data["tratamiento"] = model_to_legacy_dict(tx)
-
-        return data
+        return exam_loader.examenes([ficha_id])[ficha_id]
 
+    def obtener_examenes(self, ficha_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Exámenes de varias fichas con una consulta por sección."""
+        return exam_loader.examenes(ficha_ids)
 
     def guardar_examen(self, ficha_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
-        ficha = FichaClinica.objects.filter(ficha_id=ficha_id).first()
-        if not ficha:
-            raise ValueError("Ficha clínica no encontrada")
+        return self.guardar_examen_medido(ficha_id, payload).secciones
 
-        seccion_bio = sanitize_model_payload(Biomicroscopia, payload.get("biomicroscopia") or {})
-        seccion_reflejos = sanitize_model_payload(ReflejosPupilares, payload.get("reflejos") or {})
-        seccion_fondo = sanitize_model_payload(FondoOjo, payload.get("fondo_ojo") or {})
-        seccion_parametros = sanitize_model_payload(ParametrosClinicos, payload.get("parametros") or {})
+    def guardar_examen_medido(self, ficha_id: int, payload: Dict[str, Any]) -> ExamSaveResult:
+        """Como ``guardar_examen``, con los tiempos por sección y las sentencias ejecutadas."""
+        return exam_writer.save(ficha_id, payload)
 
-        with transaction.atomic():
-            bio, _ = Biomicroscopia.objects.update_or_create(
-                ficha=ficha, defaults=seccion_bio
-            )
-            reflejos, _ = ReflejosPupilares.objects.update_or_create(
-                ficha=ficha, defaults=seccion_reflejos
-            )
-            fondo, _ = FondoOjo.objects.update_or_create(
-                ficha=ficha, defaults=seccion_fondo
-            )
-            parametros, _ = ParametrosClinicos.objects.update_or_create(
-                ficha=ficha, defaults=seccion_parametros
-            )
 
-            diagnostico_result = None
-            tratamiento_result = None
+CONSULTAS_ORDERING = ("-fecha_consulta", "-ficha_id")
+
+# Columnas que proyecta el listado de consultas (sin hidratar modelos).
+CONSULTA_COLUMNS = (
+    "ficha_id",
+    "numero_consulta",
+    "fecha_consulta",
+    "estado",
+    "motivo_consulta",
+    "paciente_medico_id",
+    "paciente_medico__numero_ficha",
+    "paciente_medico__cliente_id",
+    "paciente_medico__cliente__nombres",
+    "paciente_medico__cliente__ap_pat",
+    "paciente_medico__cliente__ap_mat",
+    "paciente_medico__cliente__rut",
+    "usuario_id",
+    "usuario__nombre",
+    "usuario__ap_pat",
+)
 
-            diag_payload = payload.get("diagnostico")
-            if diag_payload:
-                if isinstance(diag_payload, dict):
-                    diag_defaults = sanitize_model_payload(DiagnosticoMedico, diag_payload)
-                else:
-                    diag_defaults = {"diagnostico_principal": str(diag_payload)}
 
-                diag = (
-                    DiagnosticoMedico.objects.filter(ficha=ficha)
-                    .order_by("-fecha_diagnostico")
-                    .first()
-                )
-                if diag:
-                    for key, value in diag_defaults.items():
-                        setattr(diag, key, value)
-                    diag.save()
-                else:
-                    diag = DiagnosticoMedico.objects.create(ficha=ficha, **diag_defaults)
-                diagnostico_result = model_to_legacy_dict(diag)
-
-            tratamiento_payload = payload.get("tratamiento")
-            if tratamiento_payload:
-                if isinstance(tratamiento_payload, dict):
-                    tx_defaults = sanitize_model_payload(Tratamiento, tratamiento_payload)
-                else:
-                    tx_defaults = {"medicamentos": str(tratamiento_payload)}
-
-                tx = (
-                    Tratamiento.objects.filter(ficha=ficha)
-                    .order_by("-fecha_tratamiento")
-                    .first()
-                )
-                if tx:
-                    for key, value in tx_defaults.items():
-                        setattr(tx, key, value)
-                    tx.save()
-                else:
-                    tx = Tratamiento.objects.create(ficha=ficha, **tx_defaults)
-                tratamiento_result = model_to_legacy_dict(tx)
+def _start_of_day(value: date) -> datetime:
+    return timezone.make_aware(datetime.combine(value, time.min))
 
-        return {
-            "biomicroscopia": model_to_legacy_dict(bio),
-            "reflejos": model_to_legacy_dict(reflejos),
-            "fondo_ojo": model_to_legacy_dict(fondo),
-            "parametros": model_to_legacy_dict(parametros),
-            "diagnostico": diagnostico_result,
-            "tratamiento": tratamiento_result,
-        }
 
 class FichaClinicaService:
     editable_fields = [
@@ -478,51 +846,99 @@ class FichaClinicaService:
 
     def create_ficha(self, payload: dict) -> dict:
         cleaned = self._clean_fields(payload)
+        if not (cleaned.get("numero_consulta") or "").strip():
+            cleaned["numero_consulta"] = document_numbers.next_number("consulta")
         ficha = FichaClinica.objects.create(**cleaned)
+        invalidar_historial(ficha.paciente_medico_id)
         return self.get_ficha(ficha.ficha_id)
 
     def update_ficha(self, ficha_id: int, payload: dict) -> Optional[dict]:
         ficha = FichaClinica.objects.filter(ficha_id=ficha_id).first()
         if not ficha:
             return None
+        anterior = ficha.paciente_medico_id
         cleaned = self._clean_fields(payload)
         for key, value in cleaned.items():
             setattr(ficha, key, value)
         ficha.save()
+        invalidar_historial(anterior, ficha.paciente_medico_id)
         return self.get_ficha(ficha_id)
 
     def resumen_examenes(self, ficha_id: int) -> dict:
-        data = {"ficha_id": ficha_id, "fondo_ojo": None, "presion_intraocular": None}
+        return exam_loader.resumenes([ficha_id])[ficha_id]
 
-        fondo = (
-            FondoOjo.objects.filter(ficha_id=ficha_id)
-            .order_by("-fecha_examen")
-            .first()
-        )
-        if fondo:
-            data["fondo_ojo"] = {
-                "od": ", ".join(filter(None, [fondo.disco_optico_od, fondo.macula_od, fondo.vasos_od, fondo.retina_periferica_od])),
-                "oi": ", ".join(filter(None, [fondo.disco_optico_oi, fondo.macula_oi, fondo.vasos_oi, fondo.retina_periferica_oi])),
-                "observaciones": fondo.observaciones or fondo.otros_detalles,
-                "fecha_examen": fondo.fecha_examen.isoformat() if fondo.fecha_examen else None,
-            }
+    def resumenes_examenes(self, ficha_ids: Iterable[int]) -> Dict[int, dict]:
+        return exam_loader.resumenes(ficha_ids)
 
-        pio = (
-            PresionIntraocular.objects.filter(ficha_id=ficha_id)
-            .order_by("-fecha_medicion")
-            .first()
-        )
-        if pio:
-            data["presion_intraocular"] = {
-                "pio_od": pio.pio_od,
-                "pio_oi": pio.pio_oi,
-                "metodo": pio.metodo_medicion,
-                "hora": pio.hora_medicion.isoformat() if pio.hora_medicion else None,
-                "observaciones": pio.observaciones,
-                "fecha_medicion": pio.fecha_medicion.isoformat() if pio.fecha_medicion else None,
-            }
+    def filter_consultas(
+        self,
+        paciente_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        fecha_desde: Optional[date] = None,
+        fecha_hasta: Optional[date] = None,
+        usuario_id: Optional[int] = None,
+    ):
+        """
+        Filtros del listado de consultas. ``fecha_hasta`` es inclusiva; las
+        fechas se traducen a rangos de fecha_consulta para usar los índices
+        idx_fichas_clinicas_paciente_fecha / idx_fichas_clinicas_fecha.
+        """
+        qs = FichaClinica.objects.all()
+        if paciente_id:
+            qs = qs.filter(paciente_medico_id=paciente_id)
+        if estado:
+            qs = qs.filter(estado=estado)
+        if fecha_desde:
+            qs = qs.filter(fecha_consulta__gte=_start_of_day(fecha_desde))
+        if fecha_hasta:
+            qs = qs.filter(fecha_consulta__lt=_start_of_day(fecha_hasta + timedelta(days=1)))
+        if usuario_id:
+            qs = qs.filter(usuario_id=usuario_id)
+        return qs
 
-        return data
+    def consultas_page(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        **filters,
+    ) -> tuple:
+        """
+        Página de consultas ordenada por (fecha_consulta, ficha_id)
+        descendente, proyectada con ``values()``.
+        """
+        qs = self.filter_consultas(**filters).values(*CONSULTA_COLUMNS)
+        return paginate_keyset(qs, CONSULTAS_ORDERING, cursor=cursor, limit=limit)
+
+    @staticmethod
+    def serialize_consulta(row: dict) -> dict:
+        """Formato heredado de ``api_consultas``, más los datos del cliente."""
+        item = {
+            "ficha_id": row["ficha_id"],
+            "numero_consulta": row["numero_consulta"],
+            "fecha_consulta": _iso(row["fecha_consulta"]),
+            "estado": row["estado"],
+            "motivo_consulta": row["motivo_consulta"],
+        }
+        if row["paciente_medico_id"]:
+            item["paciente_medico"] = {
+                "paciente_medico_id": row["paciente_medico_id"],
+                "numero_ficha": row["paciente_medico__numero_ficha"],
+            }
+        if row["paciente_medico__cliente_id"]:
+            item["cliente"] = {
+                "cliente_id": row["paciente_medico__cliente_id"],
+                "nombres": row["paciente_medico__cliente__nombres"],
+                "ap_pat": row["paciente_medico__cliente__ap_pat"],
+                "ap_mat": row["paciente_medico__cliente__ap_mat"],
+                "rut": row["paciente_medico__cliente__rut"],
+            }
+        if row["usuario_id"]:
+            item["usuario"] = {
+                "usuario_id": row["usuario_id"],
+                "nombre": row["usuario__nombre"],
+                "ap_pat": row["usuario__ap_pat"],
+            }
+        return item
 
     def _clean_fields(self, payload: dict) -> dict:
         data = {}
@@ -536,3 +952,150 @@ class FichaClinicaService:
             except Exception:
                 pass
         return data
+
+
+class ClinicalTimelineService:
+    """
+    Línea de tiempo clínica de un paciente: datos del paciente y su cliente,
+    todas sus fichas (más recientes primero) y, por ficha, el último registro
+    de biomicroscopía, fondo de ojo, PIO, diagnóstico y tratamiento.
+
+    Se arma siempre con 7 consultas (paciente + cliente, fichas + médico y un
+    prefetch por tipo de examen), sin importar cuántas fichas tenga. Cada
+    prefetch trae sólo la fila más reciente de cada ficha (``ROW_NUMBER()``
+    por ficha, que Django arma al cortar el queryset del ``Prefetch``). El
+    resultado se cachea por paciente; los servicios de este módulo invalidan
+    la entrada al escribir fichas o exámenes y el ``timeout`` acota lo que
+    pueda quedar desactualizado por cambios hechos fuera de ellos (p. ej. la
+    edición del cliente desde su propio módulo).
+    """
+
+    timeout = 60 * 15
+
+    # (atributo, modelo, campo de fecha, columnas necesarias o None para todas)
+    SECCIONES = (
+        (
+            "bio",
+            Biomicroscopia,
+            "fecha_examen",
+            ["ficha_id", *BIO_RESUMEN_OD, *BIO_RESUMEN_OI, "observaciones_generales", "fecha_examen"],
+        ),
+        (
+            "fondo",
+            FondoOjo,
+            "fecha_examen",
+            ["ficha_id", *FONDO_RESUMEN_OD, *FONDO_RESUMEN_OI, "observaciones", "otros_detalles", "fecha_examen"],
+        ),
+        ("pio", PresionIntraocular, "fecha_medicion", None),
+        ("diagnostico", DiagnosticoMedico, "fecha_diagnostico", None),
+        ("tratamiento", Tratamiento, "fecha_tratamiento", None),
+    )
+    RELACIONES = {
+        Biomicroscopia: "biomicroscopias",
+        FondoOjo: "fondos_ojo",
+        PresionIntraocular: "presiones_intraoculares",
+        DiagnosticoMedico: "diagnosticos",
+        Tratamiento: "tratamientos",
+    }
+
+    def __init__(self, pacientes: Optional[PacienteMedicoService] = None):
+        self.pacientes = pacientes or PacienteMedicoService()
+
+    @staticmethod
+    def _key(paciente_id: int, version: int) -> str:
+        return f"historial-paciente:{paciente_id}:v{version}"
+
+    def _prefetches(self) -> list:
+        prefetches = []
+        for attr, model, fecha, campos in self.SECCIONES:
+            qs = model.objects.order_by(F(fecha).desc(nulls_last=True), F("pk").desc())
+            if campos:
+                qs = qs.only(model._meta.pk.name, *campos)
+            prefetches.append(Prefetch(self.RELACIONES[model], queryset=qs[:1], to_attr=f"_{attr}"))
+        return prefetches
+
+    @staticmethod
+    def _ultimo(ficha: FichaClinica, attr: str):
+        registros = getattr(ficha, f"_{attr}")
+        return registros[0] if registros else None
+
+    def _serialize_ficha(self, ficha: FichaClinica) -> dict:
+        bio = self._ultimo(ficha, "bio")
+        fondo = self._ultimo(ficha, "fondo")
+        pio = self._ultimo(ficha, "pio")
+        dx = self._ultimo(ficha, "diagnostico")
+        tx = self._ultimo(ficha, "tratamiento")
+        return {
+            "ficha_id": ficha.ficha_id,
+            "numero_consulta": ficha.numero_consulta,
+            "fecha_consulta": _iso(ficha.fecha_consulta),
+            "motivo_consulta": ficha.motivo_consulta,
+            "estado": ficha.estado,
+            "usuario": {
+                "usuario_id": ficha.usuario.usuario_id,
+                "nombre": ficha.usuario.nombre,
+                "ap_pat": ficha.usuario.ap_pat,
+            }
+            if ficha.usuario
+            else None,
+            "biomicroscopia": {
+                "biomicroscopia_id": bio.biomicroscopia_id,
+                "resumen": resumen_biomicroscopia(bio),
+                "fecha_examen": _iso(bio.fecha_examen),
+            }
+            if bio
+            else None,
+            "fondo_ojo": {
+                "fondo_ojo_id": fondo.fondo_ojo_id,
+                "resumen": resumen_fondo_ojo(fondo),
+                **fondo_ojo_resumen_dict(vars(fondo)),
+            }
+            if fondo
+            else None,
+            "presion_intraocular": {"pio_id": pio.pio_id, **presion_resumen_dict(vars(pio))} if pio else None,
+            "diagnostico": {
+                "diagnostico_id": dx.diagnostico_id,
+                "diagnostico_principal": dx.diagnostico_principal,
+                "cie_10_principal": dx.cie_10_principal,
+                "severidad": dx.severidad,
+                "resumen": resumen_diagnostico(dx),
+                "fecha_diagnostico": _iso(dx.fecha_diagnostico),
+            }
+            if dx
+            else None,
+            "tratamiento": {
+                "tratamiento_id": tx.tratamiento_id,
+                "items": tratamiento_items(tx),
+                "proxima_cita": _iso(tx.proxima_cita),
+                "urgencia_seguimiento": tx.urgencia_seguimiento,
+                "fecha_tratamiento": _iso(tx.fecha_tratamiento),
+            }
+            if tx
+            else None,
+        }
+
+    def _build(self, paciente_id: int) -> Optional[dict]:
+        paciente = PacienteMedico.objects.select_related("cliente").filter(paciente_medico_id=paciente_id).first()
+        if not paciente:
+            return None
+        fichas = (
+            FichaClinica.objects.filter(paciente_medico_id=paciente_id)
+            .select_related("usuario")
+            .prefetch_related(*self._prefetches())
+            .order_by(F("fecha_consulta").desc(nulls_last=True), "-ficha_id")
+        )
+        return {
+            "paciente": self.pacientes._paciente_to_dict(paciente),
+            "fichas": [self._serialize_ficha(ficha) for ficha in fichas],
+        }
+
+    def timeline(self, paciente_id: int) -> Optional[dict]:
+        """Devuelve la línea de tiempo (cacheada) o ``None`` si el paciente no existe."""
+        key = self._key(paciente_id, get_data_version(historial_namespace(paciente_id)))
+        data = cache.get(key)
+        if data is None:
+            data = self._build(paciente_id)
+            if data is None:
+                return None
+            cache.set(key, data, timeout=self.timeout)
+        return data
@@ -1,2 +1,389 @@
-from django.test import TestCase
+import importlib
+import itertools
+from datetime import timedelta
+from unittest import mock
 
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import LegacyUser, Role
+from apps.clients.models import Cliente
+from apps.shared.testing import LOCMEM_CACHE, LegacyTablesMixin
+
+from .models import (
+    Biomicroscopia,
+    CampoVisual,
+    DiagnosticoMedico,
+    FichaClinica,
+    FondoOjo,
+    PacienteBusquedaPendiente,
+    PacienteMedico,
+    ParametrosClinicos,
+    PresionIntraocular,
+    ReflejosPupilares,
+    Tratamiento,
+)
+from .search import PatientSearchIndex, patient_index
+from .services import (
+    EXAM_SECTIONS,
+    BiomicroscopiaService,
+    ClinicalTimelineService,
+    ExamWriter,
+    PacienteMedicoService,
+    exam_loader,
+    exam_writer,
+)
+
+MEDICAL_LEGACY_MODELS = (
+    Role,
+    LegacyUser,
+    Cliente,
+    PacienteMedico,
+    FichaClinica,
+    Biomicroscopia,
+    ReflejosPupilares,
+    FondoOjo,
+    ParametrosClinicos,
+    DiagnosticoMedico,
+    Tratamiento,
+    PresionIntraocular,
+    CampoVisual,
+)
+UPSERT_TABLES = ("biomicroscopia", "reflejos_pupilares", "fondo_ojo", "parametros_clinicos")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MedicalTestCase(LegacyTablesMixin, TestCase):
+    legacy_models = MEDICAL_LEGACY_MODELS
+    _numeros = itertools.count(1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = LegacyUser.objects.create(
+            username="medico", password="x", nombre="Médico", ap_pat="Prueba", email="medico@example.com"
+        )
+
+    def login(self, rol="Administrador"):
+        user = User.objects.create_user(f"{rol.lower()}-web", password="x")
+        self.client.force_login(user)
+        session = self.client.session
+        session.update({"rol": rol, "legacy_user_id": self.usuario.usuario_id})
+        session.save()
+
+    @classmethod
+    def crear_paciente(cls, nombres="Ana", ap_pat="Pérez", rut="11111111", numero_ficha=None) -> PacienteMedico:
+        numero = next(cls._numeros)
+        cliente = Cliente.objects.create(nombres=nombres, ap_pat=ap_pat, rut=rut)
+        return PacienteMedico.objects.create(cliente=cliente, numero_ficha=numero_ficha or f"FM-{numero:05d}")
+
+    @classmethod
+    def crear_ficha(cls, paciente, dias_atras=0) -> FichaClinica:
+        numero = next(cls._numeros)
+        return FichaClinica.objects.create(
+            paciente_medico=paciente,
+            usuario=cls.usuario,
+            numero_consulta=f"CONS-{numero:05d}",
+            fecha_consulta=timezone.now() - timedelta(days=dias_atras),
+        )
+
+
+class ExamWriterTests(MedicalTestCase):
+    # Sentencias dentro de ``save``: una lectura conjunta y una escritura por
+    # sección que cambió, más SAVEPOINT y RELEASE porque la prueba ya corre
+    # dentro de una transacción.
+    TRANSACCION = 2
+    PRIMER_GUARDADO = TRANSACCION + 1 + 6
+    UN_CAMBIO = TRANSACCION + 1 + 1
+    SIN_CAMBIOS = TRANSACCION + 1
+
+    PAYLOAD = {
+        "biomicroscopia": {"parpados_od": "normal", "cornea_od": "transparente"},
+        "reflejos": {"fotomotor_uno": "presente"},
+        "fondo_ojo": {"macula_od": "brillo foveal"},
+        "parametros": {"presion_sistolica": "120"},
+        "diagnostico": "Miopía",
+        "tratamiento": "Lentes",
+    }
+
+    def setUp(self):
+        ExamWriter.reset()
+        self.addCleanup(ExamWriter.reset)
+        self.ficha = self.crear_ficha(self.crear_paciente())
+
+    def _crear_indices(self):
+        # Lo que hace la migración 0003 cuando no hay filas duplicadas.
+        with connection.cursor() as cursor:
+            for table in UPSERT_TABLES:
+                cursor.execute(f"CREATE UNIQUE INDEX idx_{table}_ficha_unico ON {table} (ficha_id)")
+        ExamWriter.reset()
+
+    def _assert_sentencias(self):
+        # La detección del índice (introspección) va una vez por proceso y
+        # queda fuera de la cuenta.
+        for nombre in ExamWriter.UPSERT_SECTIONS:
+            exam_writer._upsert_disponible(EXAM_SECTIONS[nombre].model)
+        cambio = {**self.PAYLOAD, "parametros": {"presion_sistolica": "130"}}
+        esperadas = (
+            (self.PAYLOAD, self.PRIMER_GUARDADO),
+            (cambio, self.UN_CAMBIO),
+            (cambio, self.SIN_CAMBIOS),
+        )
+        for payload, cantidad in esperadas:
+            with self.assertNumQueries(cantidad):
+                resultado = exam_writer.save(self.ficha.ficha_id, payload)
+            self.assertEqual(resultado.sentencias, cantidad)
+        self.assertEqual(ParametrosClinicos.objects.get(ficha=self.ficha).presion_sistolica, "130")
+
+    def test_statement_count_with_upsert(self):
+        self._crear_indices()
+        self._assert_sentencias()
+        self.assertTrue(all(ExamWriter._upsert_tables[table] for table in UPSERT_TABLES))
+
+    def test_statement_count_without_unique_index(self):
+        self._assert_sentencias()
+        self.assertFalse(any(ExamWriter._upsert_tables[table] for table in UPSERT_TABLES))
+
+    def test_fallback_updates_the_oldest_duplicate(self):
+        # Ficha con filas duplicadas de antes del índice único: se actualiza la
+        # de menor id, igual que ``.first()`` en la lectura.
+        vigente = Biomicroscopia.objects.create(ficha=self.ficha, parpados_od="antes")
+        duplicada = Biomicroscopia.objects.create(ficha=self.ficha, parpados_od="duplicada")
+        resultado = exam_writer.save(self.ficha.ficha_id, {"biomicroscopia": {"parpados_od": "después"}})
+
+        self.assertEqual(resultado.secciones["biomicroscopia"]["biomicroscopia_id"], vigente.pk)
+        self.assertEqual(Biomicroscopia.objects.get(pk=vigente.pk).parpados_od, "después")
+        self.assertEqual(Biomicroscopia.objects.get(pk=duplicada.pk).parpados_od, "duplicada")
+        self.assertEqual(Biomicroscopia.objects.filter(ficha=self.ficha).count(), 2)
+
+    def test_upsert_detection_does_not_leak_between_tests(self):
+        # La caché es de clase: sin ``reset`` seguiría diciendo que no hay
+        # índice aunque otra prueba (o una migración) lo haya creado.
+        exam_writer.save(self.ficha.ficha_id, {"parametros": {"glucosa": "90"}})
+        self.assertIs(ExamWriter._upsert_tables["parametros_clinicos"], False)
+        self._crear_indices()
+        self.assertEqual(ExamWriter._upsert_tables, {})
+        exam_writer.save(self.ficha.ficha_id, {"parametros": {"glucosa": "95"}})
+        self.assertIs(ExamWriter._upsert_tables["parametros_clinicos"], True)
+
+
+class ExamBundleLoaderTests(MedicalTestCase):
+    SECCIONES = len(EXAM_SECTIONS)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        paciente = cls.crear_paciente()
+        cls.fichas = [cls.crear_ficha(paciente, dias_atras=idx) for idx in range(6)]
+        cls.ficha = cls.fichas[0]
+        ahora = timezone.now()
+        # El más reciente se inserta primero: el menor id no es el vigente.
+        cls.reciente = DiagnosticoMedico.objects.create(
+            ficha=cls.ficha, diagnostico_principal="Reciente", fecha_diagnostico=ahora
+        )
+        DiagnosticoMedico.objects.create(
+            ficha=cls.ficha, diagnostico_principal="Anterior", fecha_diagnostico=ahora - timedelta(days=30)
+        )
+        Biomicroscopia.objects.create(ficha=cls.ficha, parpados_od="primera")
+        Biomicroscopia.objects.create(ficha=cls.ficha, parpados_od="segunda")
+
+    def _vigente(self, nombre):
+        section = EXAM_SECTIONS[nombre]
+        return section.model.objects.filter(ficha=self.ficha).order_by(*section.ordering).first()
+
+    def test_newest_diagnosis_in_bulk_and_single_calls(self):
+        ids = [f.ficha_id for f in self.fichas]
+        lote = exam_loader.examenes(ids)[self.ficha.ficha_id]
+        unica = BiomicroscopiaService().obtener_examen(self.ficha.ficha_id)
+        for examen in (lote, unica):
+            self.assertEqual(examen["diagnostico"]["diagnostico_id"], self.reciente.diagnostico_id)
+            self.assertEqual(examen["diagnostico"]["diagnostico_id"], self._vigente("diagnostico").pk)
+            self.assertEqual(examen["biomicroscopia"]["parpados_od"], "primera")
+        self.assertEqual(lote, unica)
+        self.assertIsNone(exam_loader.examenes(ids)[self.fichas[1].ficha_id]["diagnostico"])
+
+    def test_one_query_per_section(self):
+        for size in (1, len(self.fichas)):
+            with self.subTest(fichas=size), self.assertNumQueries(self.SECCIONES):
+                exam_loader.examenes(f.ficha_id for f in self.fichas[:size])
+
+    def test_batch_api_query_count_does_not_depend_on_fichas(self):
+        self.login()
+        url = reverse("medical:api_examenes_lote")
+        consultas = []
+        for size in (1, len(self.fichas)):
+            ids = ",".join(str(f.ficha_id) for f in self.fichas[:size])
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self.client.get(url, {"ficha_ids": ids, "detalle": "completo"})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()["data"]
+            self.assertEqual(len(data), size)
+            self.assertEqual(data[0]["diagnostico"]["diagnostico_id"], self.reciente.diagnostico_id)
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+
+class ClinicalTimelineTests(MedicalTestCase):
+    CONSULTAS = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.paciente = cls.crear_paciente()
+        cls.fichas = [cls.crear_ficha(cls.paciente, dias_atras=idx) for idx in range(4)]
+        ahora = timezone.now()
+        for ficha in cls.fichas:
+            for dias, nombre in ((10, "Anterior"), (0, "Reciente"), (20, "Antigua")):
+                fecha = ahora - timedelta(days=dias)
+                DiagnosticoMedico.objects.create(ficha=ficha, diagnostico_principal=nombre, fecha_diagnostico=fecha)
+                PresionIntraocular.objects.create(ficha=ficha, pio_od=str(10 + dias), fecha_medicion=fecha)
+
+    def setUp(self):
+        ExamWriter.reset()
+        self.addCleanup(ExamWriter.reset)
+
+    def test_query_count_and_newest_row_per_ficha(self):
+        service = ClinicalTimelineService()
+        with CaptureQueriesContext(connection) as capturadas:
+            data = service._build(self.paciente.paciente_medico_id)
+        self.assertEqual(len(capturadas), self.CONSULTAS)
+        self.assertEqual([f["ficha_id"] for f in data["fichas"]], [f.ficha_id for f in self.fichas])
+        for ficha in data["fichas"]:
+            self.assertEqual(ficha["diagnostico"]["diagnostico_principal"], "Reciente")
+            self.assertEqual(ficha["presion_intraocular"]["pio_od"], "10")
+            self.assertIsNone(ficha["biomicroscopia"])
+        # Los prefetches no traen las filas anteriores de cada ficha.
+        prefetches = [q["sql"] for q in capturadas.captured_queries[2:]]
+        self.assertTrue(all("ROW_NUMBER" in sql.upper() for sql in prefetches))
+
+    def test_cache_is_invalidated_after_exam_save(self):
+        service = ClinicalTimelineService()
+        paciente_id = self.paciente.paciente_medico_id
+        service.timeline(paciente_id)
+        with self.assertNumQueries(0):
+            service.timeline(paciente_id)
+
+        ficha = self.fichas[0]
+        # La versión se incrementa al confirmar la transacción.
+        with self.captureOnCommitCallbacks(execute=True):
+            exam_writer.save(ficha.ficha_id, {"biomicroscopia": {"parpados_od": "edema"}, "diagnostico": "Glaucoma"})
+        with self.assertNumQueries(self.CONSULTAS):
+            data = service.timeline(paciente_id)
+        reciente = data["fichas"][0]
+        self.assertEqual(reciente["ficha_id"], ficha.ficha_id)
+        self.assertIsNotNone(reciente["biomicroscopia"])
+        self.assertEqual(reciente["diagnostico"]["diagnostico_principal"], "Glaucoma")
+
+
+class PersonasPageTests(MedicalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pacientes = [
+            cls.crear_paciente(nombres, rut=rut) for nombres, rut in (("Carla", "301"), ("Ana", "302"), ("Beto", "303"))
+        ]
+        cls.clientes = [
+            Cliente.objects.create(nombres=nombres, ap_pat="Cliente", rut=rut)
+            for nombres, rut in (("Zoe", "401"), ("Abel", "402"))
+        ]
+
+    def _pagina(self, limit, offset):
+        return PacienteMedicoService().get_personas(limit=limit, offset=offset)
+
+    def test_patients_first_then_clients_by_name(self):
+        filas, total = self._pagina(10, 0)
+        self.assertEqual(total, 5)
+        self.assertEqual(
+            [(fila["type"], fila["cliente"]["nombres"]) for fila in filas],
+            [
+                ("paciente", "Ana"),
+                ("paciente", "Beto"),
+                ("paciente", "Carla"),
+                ("cliente", "Abel"),
+                ("cliente", "Zoe"),
+            ],
+        )
+        self.assertEqual(filas[0]["paciente_medico_id"], self.pacientes[1].paciente_medico_id)
+        self.assertEqual(filas[3]["cliente_id"], self.clientes[1].cliente_id)
+
+    def test_total_is_counted_only_when_unknown(self):
+        # (limit, offset, filas, consultas): la página parcial ya da el total;
+        # la llena y la vacía después del final necesitan ``count()``.
+        casos = (
+            (2, 0, 2, 2),
+            (2, 4, 1, 1),
+            (3, 3, 2, 1),
+            (5, 0, 5, 2),
+            (2, 10, 0, 2),
+        )
+        for limit, offset, cantidad, consultas in casos:
+            with self.subTest(limit=limit, offset=offset), self.assertNumQueries(consultas):
+                filas, total = self._pagina(limit, offset)
+            self.assertEqual((len(filas), total), (cantidad, 5))
+
+    def test_empty_result_needs_no_count(self):
+        with self.assertNumQueries(1):
+            filas, total = PacienteMedicoService().get_personas(q="inexistente")
+        self.assertEqual((filas, total), ([], 0))
+
+
+class PatientSearchTests(MedicalTestCase):
+    """Índice de búsqueda mantenido por los triggers de la migración 0005."""
+
+    ENGINES = ("fts5", "like")
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        migration = importlib.import_module("apps.medical.migrations.0005_pacientes_busqueda_pendientes")
+        with connection.cursor() as cursor:
+            migration.create_triggers(None, _SchemaEditor(cursor))
+        # Pacientes escritos directamente, sin pasar por PacienteMedicoService.
+        cls.jose = cls.crear_paciente("José", "Pérez Núñez", rut="12.345.678-9", numero_ficha="FM-00042")
+        cls.aaron = cls.crear_paciente("Aarón", "Pereira", rut="98765432", numero_ficha="123456789-A")
+        cls.abel = cls.crear_paciente("Abel", "Zúñiga", rut="55555555", numero_ficha="FM-000421")
+
+    def _buscar(self, query):
+        return patient_index.search_ids(query, limit=10)
+
+    def _assert_en_cada_motor(self, query, esperados):
+        for engine in self.ENGINES:
+            with self.subTest(engine=engine, query=query), mock.patch.object(PatientSearchIndex, "_engine", engine):
+                self.assertEqual(self._buscar(query), [p.paciente_medico_id for p in esperados])
+
+    def test_accents_and_case_are_folded(self):
+        for query in ("jose perez", "JOSÉ", "nunez", "Pérez Nú"):
+            self._assert_en_cada_motor(query, [self.jose])
+
+    def test_exact_cedula_ranks_first(self):
+        # "123456789" es la cédula de José (sin signos) y parte de la ficha de
+        # Aarón, que va antes por nombre; la cédula exacta gana.
+        self._assert_en_cada_motor("123456789", [self.jose, self.aaron])
+
+    def test_exact_ficha_ranks_first(self):
+        self._assert_en_cada_motor("FM-00042", [self.jose, self.abel])
+
+    def test_changes_outside_the_application_are_picked_up(self):
+        Cliente.objects.filter(pk=self.jose.cliente_id).update(ap_pat="Gómez")
+        nuevo = self.crear_paciente("Zoila", "Ramos", rut="44444444")
+        self.assertEqual(self._buscar("gomez"), [self.jose.paciente_medico_id])
+        self.assertEqual(self._buscar("perez"), [])
+        self.assertEqual(self._buscar("zoila"), [nuevo.paciente_medico_id])
+
+        PacienteMedico.objects.filter(pk=nuevo.pk).delete()
+        self.assertEqual(self._buscar("zoila"), [])
+        self.assertFalse(PacienteBusquedaPendiente.objects.exists())
+
+
+class _SchemaEditor:
+    """Lo mínimo de ``schema_editor`` que usan las funciones de las migraciones."""
+
+    def __init__(self, cursor):
+        self.connection = connection
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql, params)
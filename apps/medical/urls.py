@@ -30,6 +30,7 @@ urlpatterns = [
     path("ficha-clinica-nuevo/", views.ficha_clinica_view, name="ficha_clinica"),
     path("biomicroscopia-nuevo/", views.biomicroscopia_nuevo, name="biomicroscopia_nuevo"),
     path("certificado/<int:consulta_id>/", views.certificado_view, name="certificado"),
+    path("certificado/<int:consulta_id>/pdf/", views.certificado_pdf_view, name="certificado_pdf"),
     path(
         "examen-oftalmologico/<int:consulta_id>/",
         views.examen_oftalmologico_view,
@@ -37,6 +38,7 @@ urlpatterns = [
     ),
     path("api/fichas-clinicas/", views.api_fichas_clinicas, name="api_fichas_clinicas"),
     path("api/fichas-clinicas/<int:ficha_id>/", views.api_ficha_clinica_by_id, name="api_ficha_clinica_by_id"),
+    path("api/fichas-clinicas/examenes/", views.api_examenes_lote, name="api_examenes_lote"),
     path(
         "api/fichas-clinicas/<int:ficha_id>/examenes/",
         views.api_examenes_por_ficha,
@@ -61,4 +63,9 @@ urlpatterns = [
         views.api_paciente_consultas,
         name="api_paciente_consultas",
     ),
+    path(
+        "api/pacientes-medicos/<int:paciente_id>/historial/",
+        views.api_paciente_historial,
+        name="api_paciente_historial",
+    ),
 ]
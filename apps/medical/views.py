@@ -1,29 +1,29 @@
 from __future__ import annotations
 
 import json
-
 from datetime import datetime
 
 from django.contrib.auth.decorators import login_required
 from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
-from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 
 from apps.clients.models import Cliente
-
-from .models import (
-    Biomicroscopia,
-    DiagnosticoMedico,
-    FichaClinica,
-    FondoOjo,
-    Tratamiento,
+from apps.shared.pagination import clamp_limit
+
+from .certificates import CertificateService
+from .services import (
+    BiomicroscopiaService,
+    ClinicalTimelineService,
+    FichaClinicaService,
+    PacienteMedicoService,
 )
-from .services import BiomicroscopiaService, PacienteMedicoService, FichaClinicaService
 
 service = BiomicroscopiaService()
 paciente_service = PacienteMedicoService()
 ficha_service = FichaClinicaService()
+timeline_service = ClinicalTimelineService(paciente_service)
+certificate_service = CertificateService()
 
 BIO_ROWS = [
     ("cornea_od", "C&oacute;rnea", "cornea_oi"),
@@ -61,147 +61,8 @@ FONDO_ROWS = [
     ("borde_od", "Borde", "borde_oi"),
 ]
 
-FOOTER_INFO = {
-    "direccion": "CALLE GARCÍA AVILES 318 entre Av. 9 de OCTUBRE Y VELEZ",
-    "telefonos": "Telf: 0980632277 / 0998436958 / 0985394814",
-    "ciudad": "Guayaquil",
-}
-
-
-def _format_fecha_es(value: datetime | None) -> str:
-    if not value:
-        value = timezone.now()
-    meses = [
-        "enero",
-        "febrero",
-        "marzo",
-        "abril",
-        "mayo",
-        "junio",
-        "julio",
-        "agosto",
-        "septiembre",
-        "octubre",
-        "noviembre",
-        "diciembre",
-    ]
-    return f"{value.day} de {meses[value.month - 1]} de {value.year}"
-
-
-def _calcular_edad(nacimiento, referencia) -> int | None:
-    if not nacimiento or not referencia:
-        return None
-    if isinstance(referencia, datetime):
-        ref_date = referencia.date()
-    else:
-        ref_date = referencia
-    edad = ref_date.year - nacimiento.year - (
-        (ref_date.month, ref_date.day) < (nacimiento.month, nacimiento.day)
-    )
-    return max(edad, 0)
-
-
-def _compactar_campos(instance, campos) -> str | None:
-    partes = []
-    for campo in campos:
-        valor = getattr(instance, campo, "")
-        if valor:
-            partes.append(str(valor).strip())
-    return ", ".join(partes) if partes else None
-
+MAX_FICHAS_LOTE = 200
 
-def _resumen_biomicroscopia(ficha_id: int) -> str | None:
-    bio = Biomicroscopia.objects.filter(ficha_id=ficha_id).first()
-    if not bio:
-        return None
-    od = _compactar_campos(
-        bio,
-        [
-            "parpados_od",
-            "conjuntiva_od",
-            "cornea_od",
-            "camara_anterior_od",
-            "iris_od",
-            "cristalino_od",
-        ],
-    )
-    oi = _compactar_campos(
-        bio,
-        [
-            "parpados_oi",
-            "conjuntiva_oi",
-            "cornea_oi",
-            "camara_anterior_oi",
-            "iris_oi",
-            "cristalino_oi",
-        ],
-    )
-    obs = getattr(bio, "observaciones_generales", None)
-    partes = []
-    if od:
-        partes.append(f"OD: {od}")
-    if oi:
-        partes.append(f"OI: {oi}")
-    if obs:
-        partes.append(obs.strip())
-    return ". ".join(partes) if partes else None
-
-
-def _resumen_fondo_ojo(ficha_id: int) -> str | None:
-    fo = FondoOjo.objects.filter(ficha_id=ficha_id).first()
-    if not fo:
-        return None
-    od = _compactar_campos(fo, ["disco_optico_od", "macula_od", "vasos_od", "retina_periferica_od"])
-    oi = _compactar_campos(fo, ["disco_optico_oi", "macula_oi", "vasos_oi", "retina_periferica_oi"])
-    obs = getattr(fo, "observaciones", None)
-    partes = []
-    if od:
-        partes.append(f"OD: {od}")
-    if oi:
-        partes.append(f"OI: {oi}")
-    if obs:
-        partes.append(obs.strip())
-    return ". ".join(partes) if partes else None
-
-
-def _resumen_diagnostico(ficha_id: int) -> str | None:
-    dx = DiagnosticoMedico.objects.filter(ficha_id=ficha_id).order_by("-fecha_diagnostico").first()
-    if not dx:
-        return None
-    partes = []
-    principal = (dx.diagnostico_principal or "").strip()
-    if principal:
-        cie = f" ({dx.cie_10_principal})" if dx.cie_10_principal else ""
-        partes.append(f"{principal}{cie}")
-    secundarios = []
-    if dx.diagnosticos_secundarios:
-        secundarios.append(dx.diagnosticos_secundarios.strip())
-    if dx.cie_10_secundarios:
-        secundarios.append(dx.cie_10_secundarios.strip())
-    if secundarios:
-        partes.append(", ".join(secundarios))
-    return ", ".join(partes) if partes else None
-
-
-def _tratamiento_items(ficha_id: int) -> list[str]:
-    tx = Tratamiento.objects.filter(ficha_id=ficha_id).order_by("-fecha_tratamiento").first()
-    if not tx:
-        return []
-    bloques = [
-        getattr(tx, "medicamentos", None),
-        getattr(tx, "tratamiento_no_farmacologico", None),
-        getattr(tx, "recomendaciones", None),
-        getattr(tx, "plan_seguimiento", None),
-    ]
-    items: list[str] = []
-    for bloque in bloques:
-        if not bloque:
-            continue
-        for linea in str(bloque).splitlines():
-            limpio = linea.strip().lstrip("-•·").strip()
-            if limpio:
-                items.append(limpio)
-    return items
 
 def _render(request: HttpRequest, template: str, context: dict | None = None) -> HttpResponse:
     return render(request, template, context or {})
@@ -271,40 +132,23 @@ def biomicroscopia_nuevo(request: HttpRequest) -> HttpResponse:
 
 @login_required
 def certificado_view(request: HttpRequest, consulta_id: int) -> HttpResponse:
-    consulta = (
-        FichaClinica.objects.select_related("paciente_medico__cliente", "usuario")
-        .filter(ficha_id=consulta_id)
-        .first()
-    )
-    if not consulta:
+    cargada = certificate_service.load_one(consulta_id)
+    if not cargada:
         raise Http404("Ficha clínica no encontrada")
+    return _render(request, "medical/certificado.html", certificate_service.context(*cargada))
 
-    paciente = consulta.paciente_medico
-    cliente = paciente.cliente if paciente else None
-    fecha_consulta = consulta.fecha_consulta or timezone.now()
-    edad = (
-        _calcular_edad(getattr(cliente, "fecha_nacimiento", None), fecha_consulta.date())
-        if cliente and cliente.fecha_nacimiento
-        else None
-    )
 
-    context = {
-        "consulta": consulta,
-        "paciente": paciente,
-        "cliente": cliente,
-        "edad": edad,
-        "fecha_consulta_str": _format_fecha_es(fecha_consulta),
-        "biomicroscopia_texto": _resumen_biomicroscopia(consulta_id),
-        "fondo_ojo_texto": _resumen_fondo_ojo(consulta_id),
-        "diagnostico_texto": _resumen_diagnostico(consulta_id),
-        "tratamiento_items": _tratamiento_items(consulta_id),
-        "medico_nombre": f"{consulta.usuario.nombre} {consulta.usuario.ap_pat}".strip()
-        if consulta.usuario
-        else None,
-        "footer_info": FOOTER_INFO,
-    }
-    context["consulta_id"] = consulta_id
-    return _render(request, "medical/certificado.html", context)
+@login_required
+@require_http_methods(["GET"])
+def certificado_pdf_view(request: HttpRequest, consulta_id: int) -> HttpResponse:
+    cargada = certificate_service.load_one(consulta_id)
+    if not cargada:
+        raise Http404("Ficha clínica no encontrada")
+    ficha, _ = cargada
+    response = HttpResponse(certificate_service.pdf(*cargada), content_type="application/pdf")
+    disposition = "attachment" if request.GET.get("descargar") else "inline"
+    response["Content-Disposition"] = f'{disposition}; filename="certificado_{ficha.numero_consulta}.pdf"'
+    return response
 
 
 @login_required
@@ -330,8 +174,15 @@ def api_biomicroscopia_save(request: HttpRequest) -> JsonResponse:
     ficha_id = payload.get("ficha_id") or request.POST.get("ficha_id")
     if not ficha_id:
         return JsonResponse({"success": False, "message": "ficha_id requerido"}, status=400)
-    result = service.guardar_examen(int(ficha_id), payload)
-    return JsonResponse({"success": True, "data": result}, status=201)
+    result = service.guardar_examen_medido(int(ficha_id), payload)
+    return JsonResponse(
+        {
+            "success": True,
+            "data": result.secciones,
+            "meta": {"tiempos_ms": result.tiempos_ms, "sentencias": result.sentencias},
+        },
+        status=201,
+    )
 
 
 @login_required
@@ -368,14 +219,64 @@ def api_examenes_por_ficha(request: HttpRequest, ficha_id: int) -> JsonResponse:
     return JsonResponse({"success": True, "data": data})
 
 
+def _parse_ids(raw: str | None) -> list[int] | None:
+    """Ids separados por coma; ``None`` si alguno no es un entero positivo."""
+    ids = []
+    for parte in (raw or "").split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if not parte.isdigit() or int(parte) <= 0:
+            return None
+        ids.append(int(parte))
+    return list(dict.fromkeys(ids))
+
+
+@login_required
+@require_http_methods(["GET"])
+def api_examenes_lote(request: HttpRequest) -> JsonResponse:
+    """
+    Exámenes de varias fichas (``?ficha_ids=1,2,3``) con una consulta por
+    sección. ``detalle=resumen`` (por defecto) devuelve el formato de
+    ``/examenes/``; ``detalle=completo`` el de ``/api/biomicroscopia/<id>/``.
+    """
+    ficha_ids = _parse_ids(request.GET.get("ficha_ids"))
+    if not ficha_ids:
+        return JsonResponse({"success": False, "message": "ficha_ids inválido"}, status=400)
+    if len(ficha_ids) > MAX_FICHAS_LOTE:
+        return JsonResponse(
+            {"success": False, "message": f"Máximo {MAX_FICHAS_LOTE} fichas por consulta"}, status=400
+        )
+    detalle = request.GET.get("detalle") or "resumen"
+    if detalle == "completo":
+        examenes = service.obtener_examenes(ficha_ids)
+        data = [{"ficha_id": ficha_id, **examenes[ficha_id]} for ficha_id in ficha_ids]
+    elif detalle == "resumen":
+        resumenes = ficha_service.resumenes_examenes(ficha_ids)
+        data = [resumenes[ficha_id] for ficha_id in ficha_ids]
+    else:
+        return JsonResponse({"success": False, "message": "detalle inválido"}, status=400)
+    return JsonResponse({"success": True, "data": data, "meta": {"count": len(data), "detalle": detalle}})
+
+
 @login_required
 def api_get_personas(request: HttpRequest) -> JsonResponse:
     q = (request.GET.get("q") or "").strip()
     estado = request.GET.get("estado")
-    limit = int(request.GET.get("limit", 100))
-    offset = int(request.GET.get("offset", 0))
-    items = paciente_service.get_personas(q=q, estado=estado, limit=limit, offset=offset)
-    return JsonResponse({"success": True, "data": items, "meta": {"count": len(items)}})
+    limit = clamp_limit(request.GET.get("limit"), default=100)
+    offset = request.GET.get("offset") or "0"
+    if not offset.isdigit():
+        return JsonResponse({"success": False, "message": "offset inválido"}, status=400)
+    offset = int(offset)
+    items, total = paciente_service.get_personas(q=q, estado=estado, limit=limit, offset=offset)
+    siguiente = offset + len(items) if offset + len(items) < total else None
+    return JsonResponse(
+        {
+            "success": True,
+            "data": items,
+            "meta": {"count": total, "limit": limit, "offset": offset, "next_offset": siguiente},
+        }
+    )
 
 
 @login_required
@@ -418,50 +319,75 @@ def api_get_paciente_medico(request: HttpRequest, paciente_id: int) -> JsonRespo
 @login_required
 def api_search_pacientes_medicos(request: HttpRequest) -> JsonResponse:
     q = (request.GET.get("q") or "").strip()
-    data = paciente_service.search(q)
-    return JsonResponse({"success": True, "data": data})
+    limit = clamp_limit(request.GET.get("limit"))
+    data = paciente_service.search(q, limit=limit)
+    return JsonResponse({"success": True, "data": data, "meta": {"count": len(data), "limit": limit}})
+
+
+def _parse_date(value: str | None):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _consultas_response(request: HttpRequest, paciente_id: int | None) -> JsonResponse:
+    """
+    Página de consultas con el sobre heredado (``success``/``data``) más
+    ``meta.next_cursor``. Filtros: ``estado``, ``fecha`` (un día) o
+    ``desde``/``hasta`` (YYYY-MM-DD), ``usuario_id``/``medico_id``;
+    paginación con ``cursor`` y ``limit``.
+    """
+    params = request.GET
+    fecha = _parse_date(params.get("fecha"))
+    desde = _parse_date(params.get("desde")) or fecha
+    hasta = _parse_date(params.get("hasta")) or fecha
+    for nombre in ("fecha", "desde", "hasta"):
+        if params.get(nombre) and not _parse_date(params.get(nombre)):
+            return JsonResponse({"success": False, "message": f"{nombre} inválida (use YYYY-MM-DD)"}, status=400)
+    medico = params.get("usuario_id") or params.get("medico_id")
+    if medico and not medico.isdigit():
+        return JsonResponse({"success": False, "message": "usuario_id inválido"}, status=400)
+
+    rows, next_cursor = ficha_service.consultas_page(
+        cursor=params.get("cursor"),
+        limit=clamp_limit(params.get("limit")),
+        paciente_id=paciente_id,
+        estado=(params.get("estado") or "").strip() or None,
+        fecha_desde=desde,
+        fecha_hasta=hasta,
+        usuario_id=int(medico) if medico else None,
+    )
+    data = [ficha_service.serialize_consulta(row) for row in rows]
+    return JsonResponse({"success": True, "data": data, "meta": {"count": len(data), "next_cursor": next_cursor}})
 
 
 @login_required
 def api_paciente_consultas(request: HttpRequest, paciente_id: int) -> JsonResponse:
-    consultas = (
-        FichaClinica.objects.select_related("usuario", "paciente_medico")
-        .filter(paciente_medico_id=paciente_id)
-        .order_by("-fecha_consulta")
-    )
-    data = []
-    for ficha in consultas:
-        item = {
-            "ficha_id": ficha.ficha_id,
-            "numero_consulta": ficha.numero_consulta,
-            "fecha_consulta": ficha.fecha_consulta.isoformat() if ficha.fecha_consulta else None,
-            "estado": ficha.estado,
-            "motivo_consulta": ficha.motivo_consulta,
-        }
-        if ficha.paciente_medico:
-            item["paciente_medico"] = {
-                "paciente_medico_id": ficha.paciente_medico.paciente_medico_id,
-                "numero_ficha": ficha.paciente_medico.numero_ficha,
-            }
-        if ficha.usuario:
-            item["usuario"] = {
-                "usuario_id": ficha.usuario.usuario_id,
-                "nombre": ficha.usuario.nombre,
-                "ap_pat": ficha.usuario.ap_pat,
-            }
-        data.append(item)
-    return JsonResponse({"success": True, "data": data})
+    return _consultas_response(request, paciente_id)
+
+
+@login_required
+@require_http_methods(["GET"])
+def api_paciente_historial(request: HttpRequest, paciente_id: int) -> JsonResponse:
+    """Paciente, cliente y fichas con el último examen de cada tipo en una sola respuesta."""
+    data = timeline_service.timeline(paciente_id)
+    if data is None:
+        return JsonResponse({"success": False, "message": "Paciente no encontrado"}, status=404)
+    return JsonResponse({"success": True, "data": data, "meta": {"count": len(data["fichas"])}})
 
 
 @login_required
 def api_consultas(request: HttpRequest) -> JsonResponse:
     """
-    Endpoint flexible para obtener consultas (fichas cl�nicas).
-    Acepta varios alias de par�metros heredados del sistema Flask:
+    Endpoint flexible para obtener consultas (fichas clínicas), paginado.
+    Acepta varios alias de parámetros heredados del sistema Flask:
       - paciente_id, pacienteId, paciente_medico_id, pacienteMedicoId, pmid
-    Si no se env�a filtro, devuelve todas las consultas.
+    Si no se envía filtro de paciente, recorre todas las consultas.
     """
-    # Normalizar posibles nombres de par�metro que llegan desde templates legacy
+    # Normalizar posibles nombres de parámetro que llegan desde templates legacy
     paciente_id = (
         request.GET.get("paciente_id")
         or request.GET.get("pacienteId")
@@ -469,34 +395,9 @@ def api_consultas(request: HttpRequest) -> JsonResponse:
         or request.GET.get("pacienteMedicoId")
         or request.GET.get("pmid")
     )
-
-    qs = FichaClinica.objects.select_related("usuario", "paciente_medico").order_by("-fecha_consulta")
     if paciente_id:
         try:
-            qs = qs.filter(paciente_medico_id=int(paciente_id))
+            paciente_id = int(paciente_id)
         except ValueError:
-            return JsonResponse({"success": False, "message": "paciente_id inv�lido"}, status=400)
-
-    data = []
-    for ficha in qs:
-        item = {
-            "ficha_id": ficha.ficha_id,
-            "numero_consulta": ficha.numero_consulta,
-            "fecha_consulta": ficha.fecha_consulta.isoformat() if ficha.fecha_consulta else None,
-            "estado": ficha.estado,
-            "motivo_consulta": ficha.motivo_consulta,
-        }
-        if ficha.paciente_medico:
-            item["paciente_medico"] = {
-                "paciente_medico_id": ficha.paciente_medico.paciente_medico_id,
-                "numero_ficha": ficha.paciente_medico.numero_ficha,
-            }
-        if ficha.usuario:
-            item["usuario"] = {
-                "usuario_id": ficha.usuario.usuario_id,
-                "nombre": ficha.usuario.nombre,
-                "ap_pat": ficha.usuario.ap_pat,
-            }
-        data.append(item)
-
-    return JsonResponse({"success": True, "data": data})
+            return JsonResponse({"success": False, "message": "paciente_id inválido"}, status=400)
+    return _consultas_response(request, paciente_id or None)
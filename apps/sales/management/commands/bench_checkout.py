@@ -0,0 +1,119 @@
+"""
+Compara el checkout por línea (flujo heredado) con el checkout en bloque de
+SaleService.register_sale_from_cart midiendo consultas SQL y latencia.
+
+Todo se ejecuta dentro de una transacción que se revierte al final, por lo que
+puede lanzarse contra la base de datos real sin dejar ventas ni productos.
+
+    python manage.py bench_checkout --sizes 1 10 50 --repeat 5
+"""
+
+from __future__ import annotations
+
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.accounts.models import LegacyUser
+from apps.inventory.models import Product
+from apps.sales.models import Sale, SaleDetail
+from apps.sales.services import SaleService, q2
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_checkout(cart_items, usuario_id: int) -> int:
+    """Reproduce el patrón anterior: 3 consultas por línea + cabecera."""
+    with transaction.atomic():
+        sale = Sale.objects.create(
+            usuario_id=usuario_id,
+            total=Decimal("0.00"),
+            estado="completada",
+            fecha_venta=timezone.now(),
+        )
+        total = Decimal("0.00")
+        for item in cart_items:
+            cantidad = int(item["cantidad"])
+            product = Product.objects.select_for_update().filter(producto_id=item["producto_id"]).first()
+            precio = q2(product.costo_venta_1 or 0)
+            SaleDetail.objects.create(
+                venta=sale,
+                producto=product,
+                cantidad=cantidad,
+                precio_unitario=precio,
+                subtotal=q2(precio * cantidad),
+                valor_total=q2(precio * cantidad),
+            )
+            product.cantidad = (product.cantidad or 0) - cantidad
+            product.save(update_fields=["cantidad"])
+            total += q2(precio * cantidad)
+        sale.total = total
+        sale.save(update_fields=["total"])
+    return sale.venta_id
+
+
+class Command(BaseCommand):
+    help = "Benchmark de checkout por línea vs. en bloque (consultas y latencia)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[1, 10, 50])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--usuario-id", type=int, default=None)
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"]
+        repeat = max(options["repeat"], 1)
+        usuario = (
+            LegacyUser.objects.filter(usuario_id=options["usuario_id"]).first()
+            if options["usuario_id"]
+            else LegacyUser.objects.order_by("usuario_id").first()
+        )
+        if not usuario:
+            raise CommandError("Se necesita al menos un usuario en la tabla usuarios.")
+
+        sale_service = SaleService()
+        rows = []
+        try:
+            with transaction.atomic():
+                products = [
+                    Product.objects.create(
+                        nombre=f"bench-checkout-{idx}",
+                        cantidad=1_000_000,
+                        costo_unitario=Decimal("10.00"),
+                        costo_venta_1=Decimal("30.00"),
+                        estado=True,
+                    )
+                    for idx in range(max(sizes))
+                ]
+                for size in sizes:
+                    cart = [
+                        {"producto_id": p.producto_id, "cantidad": 1, "tarifa_iva": "0.15"}
+                        for p in products[:size]
+                    ]
+                    for label, runner in (
+                        ("por línea", lambda: _legacy_checkout(cart, usuario.usuario_id)),
+                        ("en bloque", lambda: sale_service.register_sale_from_cart(cart, usuario.usuario_id)),
+                    ):
+                        timings = []
+                        queries = 0
+                        for _ in range(repeat):
+                            with CaptureQueriesContext(connection) as ctx:
+                                start = time.perf_counter()
+                                runner()
+                                timings.append((time.perf_counter() - start) * 1000)
+                            queries = len(ctx.captured_queries)
+                        rows.append((size, label, queries, statistics.median(timings)))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'líneas':>7} {'modo':<10} {'consultas':>9} {'mediana ms':>11}")
+        for size, label, queries, median_ms in rows:
+            self.stdout.write(f"{size:>7} {label:<10} {queries:>9} {median_ms:>11.2f}")
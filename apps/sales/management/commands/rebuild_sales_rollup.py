@@ -0,0 +1,43 @@
+"""
+Reconstruye los agregados diarios de ventas (``ventas_diarias``) a partir de
+``ventas`` y ``detalle_ventas``. Sirve para la carga inicial y para corregir
+un rango después de modificar ventas fuera de la aplicación.
+
+    python manage.py rebuild_sales_rollup
+    python manage.py rebuild_sales_rollup --desde 2025-01-01 --hasta 2025-01-31
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sales.services import SalesRollupService
+
+
+def _date(value: str):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"fecha no válida: {value} (use YYYY-MM-DD)") from exc
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los agregados diarios de ventas por vendedor y método de pago."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=_date, help="Primer día a reconstruir (YYYY-MM-DD).")
+        parser.add_argument("--hasta", type=_date, help="Último día a reconstruir (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        desde, hasta = options["desde"], options["hasta"]
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+        start = time.perf_counter()
+        filas = SalesRollupService().rebuild(desde, hasta)
+        self.stdout.write(
+            self.style.SUCCESS(f"Agregados escritos: {filas} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        )
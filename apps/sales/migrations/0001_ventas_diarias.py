@@ -0,0 +1,44 @@
+"""
+Tabla de agregados diarios de ventas (VentaDiaria). Las tablas heredadas de la
+app (``ventas``, ``detalle_ventas``) no se gestionan con migraciones; el
+agregado guarda ``usuario_id`` como entero simple para no depender de ellas.
+"""
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="VentaDiaria",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("fecha", models.DateField()),
+                ("usuario_id", models.IntegerField(default=0)),
+                ("metodo_pago", models.CharField(blank=True, default="", max_length=50)),
+                ("num_ventas", models.IntegerField(default=0)),
+                ("unidades", models.IntegerField(default=0)),
+                ("total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("descuento_total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("subtotal_tarifa_15", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("subtotal_tarifa_5", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("subtotal_tarifa_0", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("iva_15", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("iva_5", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("actualizado", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Venta diaria",
+                "verbose_name_plural": "Ventas diarias",
+                "db_table": "ventas_diarias",
+                "constraints": [
+                    models.UniqueConstraint(fields=("fecha", "usuario_id", "metodo_pago"), name="uq_ventas_diarias_clave")
+                ],
+            },
+        ),
+    ]
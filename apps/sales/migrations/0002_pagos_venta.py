@@ -0,0 +1,54 @@
+"""
+Pagos aplicados a ventas (PagoVenta) e índice parcial sobre las ventas con
+saldo pendiente, que es lo único que recorren las consultas de cuentas por
+cobrar. ``ventas`` es una tabla heredada, así que el índice se crea con SQL
+explícito y sólo si la tabla existe (PostgreSQL y SQLite admiten ``WHERE``).
+"""
+
+from django.db import migrations, models
+
+
+def create_indexes(apps, schema_editor):
+    if "ventas" not in schema_editor.connection.introspection.table_names():
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ventas_saldo_pendiente "
+        "ON ventas (cliente_id, fecha_venta, saldo) WHERE saldo > 0"
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS idx_ventas_saldo_pendiente")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0001_ventas_diarias"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PagoVenta",
+            fields=[
+                ("pago_id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("venta_id", models.IntegerField()),
+                ("cliente_id", models.IntegerField(blank=True, null=True)),
+                ("usuario_id", models.IntegerField(blank=True, null=True)),
+                ("monto", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("metodo_pago", models.CharField(blank=True, default="", max_length=50)),
+                ("observaciones", models.TextField(blank=True, default="")),
+                ("fecha", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Pago de venta",
+                "verbose_name_plural": "Pagos de venta",
+                "db_table": "pagos_venta",
+                "indexes": [
+                    models.Index(fields=["venta_id", "fecha"], name="idx_pagos_venta_venta"),
+                    models.Index(fields=["cliente_id", "fecha"], name="idx_pagos_venta_cliente"),
+                ],
+            },
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
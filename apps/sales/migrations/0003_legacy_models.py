@@ -0,0 +1,62 @@
+# Generated by Django 5.0.4 on 2026-10-17 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_pagos_venta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sale',
+            fields=[
+                ('venta_id', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha_venta', models.DateTimeField(blank=True, db_column='fecha_venta', null=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('descuento', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('metodo_pago', models.CharField(blank=True, max_length=50, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('estado', models.CharField(blank=True, max_length=20, null=True)),
+                ('numero_factura', models.CharField(blank=True, max_length=50, null=True)),
+                ('ciudad', models.CharField(blank=True, max_length=100, null=True)),
+                ('subtotal_general', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('subtotal_tarifa_15', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('subtotal_tarifa_5', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('subtotal_tarifa_0', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('descuento_total', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('iva_15', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('iva_5', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('abono', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('saldo', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+            ],
+            options={
+                'verbose_name': 'Venta',
+                'verbose_name_plural': 'Ventas',
+                'db_table': 'ventas',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SaleDetail',
+            fields=[
+                ('detalle_id', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('tarifa_iva', models.DecimalField(blank=True, decimal_places=4, max_digits=5, null=True)),
+                ('descuento', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('valor_total', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('codigo_principal', models.CharField(blank=True, max_length=100, null=True)),
+                ('codigo_auxiliar', models.CharField(blank=True, max_length=100, null=True)),
+            ],
+            options={
+                'verbose_name': 'Detalle de venta',
+                'verbose_name_plural': 'Detalles de venta',
+                'db_table': 'detalle_ventas',
+                'managed': False,
+            },
+        ),
+    ]
@@ -58,3 +58,68 @@ class SaleDetail(models.Model):
 
     def __str__(self) -> str:
         return f"Detalle {self.detalle_id} de venta {self.venta_id}"
+
+
+class VentaDiaria(models.Model):
+    """
+    Agregado diario de ventas por vendedor y método de pago, con el desglose
+    por tarifa de IVA. Lo mantiene SaleService al registrar cada venta y se
+    puede reconstruir desde ``ventas`` con ``rebuild_sales_rollup``.
+    ``usuario_id`` 0 y ``metodo_pago`` vacío agrupan las ventas sin dato.
+    """
+
+    fecha = models.DateField()
+    usuario_id = models.IntegerField(default=0)
+    metodo_pago = models.CharField(max_length=50, default="", blank=True)
+    num_ventas = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    descuento_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    subtotal_tarifa_15 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    subtotal_tarifa_5 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    subtotal_tarifa_0 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    iva_15 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    iva_5 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "ventas_diarias"
+        verbose_name = "Venta diaria"
+        verbose_name_plural = "Ventas diarias"
+        constraints = [
+            models.UniqueConstraint(fields=["fecha", "usuario_id", "metodo_pago"], name="uq_ventas_diarias_clave"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.fecha} / {self.usuario_id} / {self.metodo_pago or '-'}"
+
+
+class PagoVenta(models.Model):
+    """
+    Pago (abono) aplicado a una venta a crédito. El abono inicial registrado
+    con la venta también queda aquí, de modo que la tabla es la historia
+    completa de cobros; ``ventas.abono``/``ventas.saldo`` son el acumulado.
+    ``venta_id`` y ``usuario_id`` son enteros simples porque las tablas
+    heredadas no están bajo migraciones.
+    """
+
+    pago_id = models.BigAutoField(primary_key=True)
+    venta_id = models.IntegerField()
+    cliente_id = models.IntegerField(blank=True, null=True)
+    usuario_id = models.IntegerField(blank=True, null=True)
+    monto = models.DecimalField(max_digits=12, decimal_places=2)
+    metodo_pago = models.CharField(max_length=50, blank=True, default="")
+    observaciones = models.TextField(blank=True, default="")
+    fecha = models.DateTimeField()
+
+    class Meta:
+        db_table = "pagos_venta"
+        verbose_name = "Pago de venta"
+        verbose_name_plural = "Pagos de venta"
+        indexes = [
+            models.Index(fields=["venta_id", "fecha"], name="idx_pagos_venta_venta"),
+            models.Index(fields=["cliente_id", "fecha"], name="idx_pagos_venta_cliente"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Pago #{self.pago_id} de venta {self.venta_id}"
@@ -1,25 +1,306 @@
 from __future__ import annotations
 
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Iterable, Optional
+from typing import Iterable, Optional, Sequence
 
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Max, Min, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
 from django.utils import timezone
 
 from apps.clients.models import Cliente
 from apps.clients.services import ClientService
-from apps.inventory.models import Product
+from apps.inventory.models import MovimientoStock, Product
+from apps.inventory.services import StockLedgerService
+from apps.shared.numbering import document_numbers
+from apps.shared.pagination import DEFAULT_PAGE_SIZE, paginate_keyset
 from apps.shared.serializers import model_to_legacy_dict
+from apps.shared.versioning import bump_data_version
 
-from .models import Sale, SaleDetail
+from .models import PagoVenta, Sale, SaleDetail, VentaDiaria
+
+
+DETAIL_BATCH_SIZE = 500
+HISTORY_ORDERING = ("-fecha_venta", "-venta_id")
+DEBTORS_ORDERING = {
+    "monto": ("-saldo_total", "cliente_id"),
+    "antiguedad": ("venta_mas_antigua", "cliente_id"),
+}
 
 
 def q2(value) -> Decimal:
     return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
+def _start_of_day(value: date) -> datetime:
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+class SalesRollupService:
+    """
+    Agregados diarios de ventas (``ventas_diarias``) por vendedor y método de
+    pago. Los reportes por rango de fechas leen estas filas (una por día,
+    vendedor y método) en lugar de recorrer ``ventas`` y ``detalle_ventas``.
+    """
+
+    METRICS = (
+        "total",
+        "descuento_total",
+        "subtotal_tarifa_15",
+        "subtotal_tarifa_5",
+        "subtotal_tarifa_0",
+        "iva_15",
+        "iva_5",
+    )
+    GROUPS = ("fecha", "usuario_id", "metodo_pago")
+    money = DecimalField(max_digits=16, decimal_places=2)
+
+    def record_sale(self, sale: Sale, unidades: int) -> None:
+        """
+        Suma una venta a su fila diaria dentro de la transacción de la venta.
+        Es un UPDATE con incrementos; si la fila aún no existe se inserta, y
+        si otra caja la insertó primero se reintenta el UPDATE.
+        """
+        key = {
+            "fecha": timezone.localdate(sale.fecha_venta),
+            "usuario_id": sale.usuario_id or 0,
+            "metodo_pago": sale.metodo_pago or "",
+        }
+        values = {metric: Decimal(getattr(sale, metric) or 0) for metric in self.METRICS}
+        increments = {metric: F(metric) + value for metric, value in values.items()}
+        increments.update(num_ventas=F("num_ventas") + 1, unidades=F("unidades") + unidades, actualizado=timezone.now())
+
+        if VentaDiaria.objects.filter(**key).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                VentaDiaria.objects.create(**key, **values, num_ventas=1, unidades=unidades)
+        except IntegrityError:
+            VentaDiaria.objects.filter(**key).update(**increments)
+
+    def rebuild(self, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+        """
+        Recalcula los agregados del rango (inclusive; todo si no se indica)
+        desde ``ventas`` con dos consultas agrupadas y los reemplaza en una
+        transacción. Devuelve el número de filas escritas.
+        """
+        ventas = Sale.objects.filter(fecha_venta__isnull=False)
+        detalles = SaleDetail.objects.filter(venta__fecha_venta__isnull=False)
+        rollups = VentaDiaria.objects.all()
+        if desde:
+            ventas = ventas.filter(fecha_venta__gte=_start_of_day(desde))
+            detalles = detalles.filter(venta__fecha_venta__gte=_start_of_day(desde))
+            rollups = rollups.filter(fecha__gte=desde)
+        if hasta:
+            ventas = ventas.filter(fecha_venta__lt=_start_of_day(hasta + timedelta(days=1)))
+            detalles = detalles.filter(venta__fecha_venta__lt=_start_of_day(hasta + timedelta(days=1)))
+            rollups = rollups.filter(fecha__lte=hasta)
+
+        grouped = (
+            ventas.annotate(
+                dia=TruncDate("fecha_venta"),
+                vendedor=Coalesce("usuario_id", Value(0)),
+                metodo=Coalesce("metodo_pago", Value("")),
+            )
+            .values("dia", "vendedor", "metodo")
+            .annotate(
+                num_ventas=Count("venta_id"),
+                **{metric: Coalesce(Sum(metric), Value(Decimal(0)), output_field=self.money) for metric in self.METRICS},
+            )
+            .order_by()
+        )
+        unidades = {
+            (row["dia"], row["vendedor"], row["metodo"]): row["unidades"]
+            for row in detalles.annotate(
+                dia=TruncDate("venta__fecha_venta"),
+                vendedor=Coalesce("venta__usuario_id", Value(0)),
+                metodo=Coalesce("venta__metodo_pago", Value("")),
+            )
+            .values("dia", "vendedor", "metodo")
+            .annotate(unidades=Coalesce(Sum("cantidad"), Value(0)))
+            .order_by()
+        }
+        filas = [
+            VentaDiaria(
+                fecha=row["dia"],
+                usuario_id=row["vendedor"],
+                metodo_pago=row["metodo"],
+                num_ventas=row["num_ventas"],
+                unidades=unidades.get((row["dia"], row["vendedor"], row["metodo"]), 0),
+                **{metric: row[metric] for metric in self.METRICS},
+            )
+            for row in grouped
+        ]
+        with transaction.atomic():
+            rollups.delete()
+            VentaDiaria.objects.bulk_create(filas, batch_size=DETAIL_BATCH_SIZE)
+        return len(filas)
+
+    def report(self, desde: date, hasta: date, agrupar: Sequence[str] = ("fecha",)) -> dict:
+        """
+        Totales del rango (inclusive) agrupados por ``agrupar`` (cualquier
+        combinación de fecha, usuario_id y metodo_pago) más el total general.
+        """
+        agrupar = [campo for campo in self.GROUPS if campo in agrupar]
+        sums = {metric: Coalesce(Sum(metric), Value(Decimal(0)), output_field=self.money) for metric in self.METRICS}
+        sums.update(num_ventas=Coalesce(Sum("num_ventas"), Value(0)), unidades=Coalesce(Sum("unidades"), Value(0)))
+        qs = VentaDiaria.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        filas = list(qs.values(*agrupar).annotate(**sums).order_by(*agrupar)) if agrupar else []
+        return {"filas": filas, "totales": qs.aggregate(**sums)}
+
+
+class ReceivablesService:
+    """
+    Cuentas por cobrar: ventas con ``saldo > 0`` agrupadas por cliente y
+    pagos posteriores (``pagos_venta``). Todas las consultas filtran por
+    ``saldo > 0``, que es la condición del índice parcial
+    idx_ventas_saldo_pendiente, así que no recorren las ventas pagadas.
+    """
+
+    money = DecimalField(max_digits=16, decimal_places=2)
+
+    def open_sales(self):
+        return Sale.objects.filter(saldo__gt=0)
+
+    def debtors_page(
+        self,
+        orden: str = "monto",
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> tuple[list[dict], str | None]:
+        """
+        Clientes con saldo pendiente, paginados por cursor y ordenados por
+        monto adeudado (``monto``) o por la venta impaga más antigua
+        (``antiguedad``). Las ventas sin cliente no forman parte del listado.
+        """
+        qs = (
+            self.open_sales()
+            .filter(cliente_id__isnull=False)
+            .values("cliente_id", "cliente__nombres", "cliente__ap_pat", "cliente__rut", "cliente__telefono")
+            .annotate(
+                saldo_total=Sum("saldo", output_field=self.money),
+                ventas_pendientes=Count("venta_id"),
+                venta_mas_antigua=Min("fecha_venta"),
+                venta_mas_reciente=Max("fecha_venta"),
+            )
+        )
+        return paginate_keyset(qs, DEBTORS_ORDERING.get(orden, DEBTORS_ORDERING["monto"]), cursor=cursor, limit=limit)
+
+    @staticmethod
+    def serialize_debtor(row: dict, hoy: date | None = None) -> dict:
+        hoy = hoy or timezone.localdate()
+        mas_antigua = row["venta_mas_antigua"]
+        return {
+            "cliente_id": row["cliente_id"],
+            "cliente": f"{row['cliente__nombres']} {row['cliente__ap_pat'] or ''}".strip(),
+            "rut": row["cliente__rut"],
+            "telefono": row["cliente__telefono"],
+            "saldo": float(row["saldo_total"] or 0),
+            "ventas_pendientes": row["ventas_pendientes"],
+            "venta_mas_antigua": mas_antigua.isoformat() if mas_antigua else None,
+            "dias_antiguedad": (hoy - timezone.localdate(mas_antigua)).days if mas_antigua else None,
+        }
+
+    def customer_balance(self, cliente_id: int) -> dict:
+        """
+        Saldo abierto de un cliente con el detalle de sus ventas pendientes
+        y los pagos registrados sobre ellas (dos consultas).
+        """
+        ventas = list(
+            self.open_sales()
+            .filter(cliente_id=cliente_id)
+            .order_by("fecha_venta", "venta_id")
+            .values("venta_id", "numero_factura", "fecha_venta", "total", "abono", "saldo")
+        )
+        pagos = PagoVenta.objects.filter(venta_id__in=[v["venta_id"] for v in ventas]).order_by("fecha", "pago_id")
+        por_venta: dict[int, list] = {}
+        for pago in pagos:
+            por_venta.setdefault(pago.venta_id, []).append(
+                {
+                    "pago_id": pago.pago_id,
+                    "monto": float(pago.monto),
+                    "metodo_pago": pago.metodo_pago,
+                    "fecha": pago.fecha.isoformat(),
+                }
+            )
+        return {
+            "cliente_id": cliente_id,
+            "saldo": float(sum((v["saldo"] for v in ventas), Decimal(0))),
+            "ventas": [
+                {
+                    "venta_id": v["venta_id"],
+                    "numero_factura": v["numero_factura"],
+                    "fecha_venta": v["fecha_venta"].isoformat() if v["fecha_venta"] else None,
+                    "total": float(v["total"] or 0),
+                    "abono": float(v["abono"] or 0),
+                    "saldo": float(v["saldo"] or 0),
+                    "pagos": por_venta.get(v["venta_id"], []),
+                }
+                for v in ventas
+            ],
+        }
+
+    def record_initial_payment(self, sale: Sale) -> None:
+        """Deja en ``pagos_venta`` el abono entregado al momento de la venta."""
+        if sale.abono and sale.abono > 0:
+            PagoVenta.objects.create(
+                venta_id=sale.venta_id,
+                cliente_id=sale.cliente_id,
+                usuario_id=sale.usuario_id,
+                monto=sale.abono,
+                metodo_pago=sale.metodo_pago or "",
+                observaciones="Abono inicial",
+                fecha=sale.fecha_venta or timezone.now(),
+            )
+
+    def register_payment(
+        self,
+        venta_id: int,
+        monto,
+        usuario_id: int | None = None,
+        metodo_pago: str | None = None,
+        observaciones: str | None = None,
+    ) -> PagoVenta:
+        """
+        Registra un pago posterior sobre una venta. El saldo se descuenta con
+        un UPDATE condicionado (``saldo >= monto``), así dos pagos simultáneos
+        no pueden dejar la venta con saldo negativo.
+        """
+        try:
+            monto = q2(monto)
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValueError("El monto del pago no es válido.")
+        if monto <= 0:
+            raise ValueError("El monto del pago debe ser mayor que cero.")
+
+        with transaction.atomic():
+            venta = Sale.objects.filter(venta_id=venta_id).values("venta_id", "cliente_id", "saldo").first()
+            if venta is None:
+                raise ValueError("La venta no existe.")
+            updated = Sale.objects.filter(venta_id=venta_id, saldo__gte=monto).update(
+                abono=Coalesce(F("abono"), Value(Decimal(0))) + monto,
+                saldo=F("saldo") - monto,
+            )
+            if not updated:
+                raise ValueError(f"El monto supera el saldo pendiente de la venta ({q2(venta['saldo'] or 0)}).")
+            pago = PagoVenta.objects.create(
+                venta_id=venta_id,
+                cliente_id=venta["cliente_id"],
+                usuario_id=usuario_id,
+                monto=monto,
+                metodo_pago=metodo_pago or "",
+                observaciones=observaciones or "",
+                fecha=timezone.now(),
+            )
+            bump_data_version("ventas")
+        return pago
+
+
 class SaleService:
     client_service = ClientService()
+    rollups = SalesRollupService()
+    receivables = ReceivablesService()
 
     def register_sale_from_cart(
         self,
@@ -50,18 +331,8 @@ class SaleService:
                 }
                 cliente_obj = self.client_service.get_or_create_by_rut(rut, defaults)
 
-            sale = Sale.objects.create(
-                cliente=cliente_obj,
-                usuario_id=usuario_id,
-                total=Decimal("0.00"),
-                descuento=q2(descuento or 0),
-                metodo_pago=metodo_pago,
-                observaciones=observaciones,
-                estado="completada",
-                fecha_venta=timezone.now(),
-                numero_factura=numero_factura,
-                ciudad=ciudad,
-            )
+            lines = self._normalize_cart(cart_items)
+            products = self._lock_products(lines)
 
             subtotal_general = Decimal("0.00")
             subtotal_15 = Decimal("0.00")
@@ -71,24 +342,9 @@ class SaleService:
             iva_15 = Decimal("0.00")
             iva_5 = Decimal("0.00")
 
-            for item in cart_items:
-                producto_id = int(item["producto_id"])
-                cantidad = int(item.get("cantidad", 0) or 0)
-                if cantidad <= 0:
-                    continue
-
-                product = (
-                    Product.objects.select_for_update()
-                    .filter(producto_id=producto_id)
-                    .first()
-                )
-                if not product:
-                    raise ValueError(f"Producto ID {producto_id} no existe.")
-
-                stock_actual = product.cantidad or 0
-                if stock_actual < cantidad:
-                    raise ValueError(f"Stock insuficiente para {product.nombre}.")
-
+            detalles = []
+            for item, producto_id, cantidad in lines:
+                product = products[producto_id]
                 precio_base = product.costo_venta_1 or product.costo_unitario or 0
                 precio = q2(precio_base)
                 tarifa_iva = q2(item.get("tarifa_iva") or 0)
@@ -108,22 +364,20 @@ class SaleService:
                 else:
                     subtotal_0 += base_desc
 
-                SaleDetail.objects.create(
-                    venta=sale,
-                    producto=product,
-                    cantidad=cantidad,
-                    precio_unitario=precio,
-                    subtotal=base,
-                    tarifa_iva=tarifa_iva,
-                    descuento=descuento_linea,
-                    valor_total=total_linea,
-                    codigo_principal=item.get("codigo_principal") or product.codigo,
-                    codigo_auxiliar=item.get("codigo_auxiliar"),
+                detalles.append(
+                    SaleDetail(
+                        producto=product,
+                        cantidad=cantidad,
+                        precio_unitario=precio,
+                        subtotal=base,
+                        tarifa_iva=tarifa_iva,
+                        descuento=descuento_linea,
+                        valor_total=total_linea,
+                        codigo_principal=item.get("codigo_principal") or product.codigo,
+                        codigo_auxiliar=item.get("codigo_auxiliar"),
+                    )
                 )
 
-                product.cantidad = stock_actual - cantidad
-                product.save(update_fields=["cantidad"])
-
                 subtotal_general += base_desc
 
             total_iva = iva_15 + iva_5
@@ -131,33 +385,110 @@ class SaleService:
             abono_val = q2(abono or 0)
             saldo_val = q2(total_pagar - abono_val)
 
-            sale.subtotal_general = q2(subtotal_general)
-            sale.subtotal_tarifa_15 = q2(subtotal_15)
-            sale.subtotal_tarifa_5 = q2(subtotal_5)
-            sale.subtotal_tarifa_0 = q2(subtotal_0)
-            sale.descuento_total = descuento_total
-            sale.iva_15 = q2(iva_15)
-            sale.iva_5 = q2(iva_5)
-            sale.total = q2(total_pagar)
-            sale.abono = abono_val
-            sale.saldo = saldo_val
-            sale.save(
-                update_fields=[
-                    "subtotal_general",
-                    "subtotal_tarifa_15",
-                    "subtotal_tarifa_5",
-                    "subtotal_tarifa_0",
-                    "descuento_total",
-                    "iva_15",
-                    "iva_5",
-                    "total",
-                    "abono",
-                    "saldo",
-                ]
+            # Los totales se conocen antes de insertar la cabecera, así que la
+            # venta se escribe una sola vez en lugar de INSERT + UPDATE.
+            sale = Sale.objects.create(
+                cliente=cliente_obj,
+                usuario_id=usuario_id,
+                total=q2(total_pagar),
+                descuento=q2(descuento or 0),
+                metodo_pago=metodo_pago,
+                observaciones=observaciones,
+                estado="completada",
+                fecha_venta=timezone.now(),
+                numero_factura=(numero_factura or "").strip() or document_numbers.next_number("factura"),
+                ciudad=ciudad,
+                subtotal_general=q2(subtotal_general),
+                subtotal_tarifa_15=q2(subtotal_15),
+                subtotal_tarifa_5=q2(subtotal_5),
+                subtotal_tarifa_0=q2(subtotal_0),
+                descuento_total=descuento_total,
+                iva_15=q2(iva_15),
+                iva_5=q2(iva_5),
+                abono=abono_val,
+                saldo=saldo_val,
+            )
+
+            for detalle in detalles:
+                detalle.venta = sale
+            SaleDetail.objects.bulk_create(detalles, batch_size=DETAIL_BATCH_SIZE)
+
+            self._decrement_stock(lines, products)
+            vendidas = self._quantities_by_product(lines)
+            StockLedgerService().record(
+                MovimientoStock.TIPO_VENTA,
+                {pid: -cantidad for pid, cantidad in vendidas.items()},
+                referencia_id=sale.venta_id,
+                fecha=sale.fecha_venta,
             )
+            self.rollups.record_sale(sale, sum(vendidas.values()))
+            self.receivables.record_initial_payment(sale)
+            bump_data_version("ventas", "productos")
 
         return sale.venta_id
 
+    def _normalize_cart(self, cart_items) -> list[tuple[dict, int, int]]:
+        """
+        Devuelve las líneas válidas del carrito como (item, producto_id, cantidad),
+        descartando las que no tienen cantidad positiva.
+        """
+        lines = []
+        for item in cart_items:
+            producto_id = int(item["producto_id"])
+            cantidad = int(item.get("cantidad", 0) or 0)
+            if cantidad <= 0:
+                continue
+            lines.append((item, producto_id, cantidad))
+        return lines
+
+    def _quantities_by_product(self, lines) -> dict[int, int]:
+        requested: dict[int, int] = {}
+        for _item, producto_id, cantidad in lines:
+            requested[producto_id] = requested.get(producto_id, 0) + cantidad
+        return requested
+
+    def _lock_products(self, lines) -> dict[int, Product]:
+        """
+        Bloquea todos los productos del carrito con un único
+        SELECT ... FOR UPDATE ordenado por producto_id. El orden fijo evita
+        interbloqueos entre dos cajas que venden los mismos productos.
+        """
+        requested = self._quantities_by_product(lines)
+        products = {
+            product.producto_id: product
+            for product in Product.objects.select_for_update()
+            .filter(producto_id__in=list(requested))
+            .order_by("producto_id")
+        }
+        for producto_id, cantidad in requested.items():
+            product = products.get(producto_id)
+            if not product:
+                raise ValueError(f"Producto ID {producto_id} no existe.")
+            if (product.cantidad or 0) < cantidad:
+                raise ValueError(f"Stock insuficiente para {product.nombre}.")
+        return products
+
+    def _decrement_stock(self, lines, products: dict[int, Product]) -> None:
+        """
+        Descuenta el stock de todo el carrito con un único
+        UPDATE ... SET cantidad = cantidad - x WHERE cantidad >= x.
+        """
+        requested = self._quantities_by_product(lines)
+        if not requested:
+            return
+        delta = Case(
+            *[When(producto_id=pid, then=Value(cantidad)) for pid, cantidad in requested.items()],
+            output_field=IntegerField(),
+        )
+        updated = Product.objects.filter(producto_id__in=list(requested), cantidad__gte=delta).update(
+            cantidad=F("cantidad") - delta
+        )
+        if updated != len(requested):
+            raise ValueError("Stock insuficiente para completar la venta.")
+        for producto_id, cantidad in requested.items():
+            product = products[producto_id]
+            product.cantidad = (product.cantidad or 0) - cantidad
+
     def get_sale_details_for_receipt(self, venta_id: int):
         return (
             Sale.objects.select_related("cliente", "usuario")
@@ -173,6 +504,89 @@ class SaleService:
             .order_by("-fecha_venta")
         )
 
+    def daily_summary(self, day: Optional[date] = None) -> dict:
+        """
+        Totales de un día (hoy por defecto, en la zona horaria local): monto
+        vendido, número de ventas y unidades vendidas. Dos agregados.
+        """
+        day = day or timezone.localdate()
+        desde, hasta = _start_of_day(day), _start_of_day(day + timedelta(days=1))
+        resumen = Sale.objects.filter(fecha_venta__gte=desde, fecha_venta__lt=hasta).aggregate(
+            total=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField(max_digits=16, decimal_places=2)),
+            ventas=Count("venta_id"),
+        )
+        resumen["unidades"] = SaleDetail.objects.filter(
+            venta__fecha_venta__gte=desde, venta__fecha_venta__lt=hasta
+        ).aggregate(unidades=Coalesce(Sum("cantidad"), Value(0)))["unidades"]
+        return resumen
+
+    def filter_sales(
+        self,
+        fecha_desde: date | None = None,
+        fecha_hasta: date | None = None,
+        usuario_id: int | None = None,
+        metodo_pago: str | None = None,
+    ):
+        """
+        Aplica en SQL los filtros del historial. ``fecha_hasta`` es inclusiva.
+        Las fechas se traducen a rangos de fecha_venta para aprovechar
+        idx_ventas_fecha.
+        """
+        qs = Sale.objects.all()
+        if fecha_desde:
+            qs = qs.filter(fecha_venta__gte=_start_of_day(fecha_desde))
+        if fecha_hasta:
+            qs = qs.filter(fecha_venta__lt=_start_of_day(fecha_hasta + timedelta(days=1)))
+        if usuario_id:
+            qs = qs.filter(usuario_id=usuario_id)
+        if metodo_pago:
+            qs = qs.filter(metodo_pago=metodo_pago)
+        return qs
+
+    def list_sales_page(
+        self,
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        **filters,
+    ) -> tuple[list[Sale], str | None]:
+        """
+        Página del historial ordenada por (fecha_venta, venta_id) descendente.
+        Los detalles sólo se precargan para las ventas visibles.
+        """
+        qs = (
+            self.filter_sales(**filters)
+            .select_related("cliente", "usuario")
+            .prefetch_related("detalles__producto")
+        )
+        ventas, next_cursor = paginate_keyset(qs, HISTORY_ORDERING, cursor=cursor, limit=limit)
+        for venta in ventas:
+            venta.cantidad_total = sum(det.cantidad or 0 for det in venta.detalles.all())
+        return ventas, next_cursor
+
+    def history_export_queryset(self, **filters):
+        """
+        Líneas de venta del historial filtrado, en el mismo orden que la
+        pantalla, listas para proyectarse con ``values()`` en la exportación.
+        """
+        ventas = self.filter_sales(**filters)
+        return SaleDetail.objects.filter(venta__in=ventas.values("venta_id")).order_by(
+            F("venta__fecha_venta").desc(nulls_last=True), "-venta_id", "detalle_id"
+        )
+
+    def serialize_sale_summary(self, sale: Sale) -> dict:
+        detalles = list(sale.detalles.all())
+        return {
+            "venta_id": sale.venta_id,
+            "fecha_venta": sale.fecha_venta.isoformat() if sale.fecha_venta else None,
+            "total": float(sale.total or 0),
+            "metodo_pago": sale.metodo_pago,
+            "estado": sale.estado,
+            "cliente": f"{sale.cliente.nombres} {sale.cliente.ap_pat or ''}".strip() if sale.cliente else None,
+            "vendedor": sale.usuario.username if sale.usuario else None,
+            "productos": [det.producto.nombre for det in detalles if det.producto],
+            "cantidad": getattr(sale, "cantidad_total", None) or sum(det.cantidad or 0 for det in detalles),
+        }
+
     def serialize_sale(self, sale: Sale) -> dict:
         data = model_to_legacy_dict(sale)
         data["cliente"] = model_to_legacy_dict(sale.cliente) if sale.cliente else None
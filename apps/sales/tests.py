@@ -1,2 +1,273 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import LegacyUser, Role
+from apps.clients.models import Cliente
+from apps.inventory.models import MovimientoStock, Product, Proveedor
+from apps.shared import export_jobs
+from apps.shared.testing import LOCMEM_CACHE, LegacyTablesMixin
+from apps.shared.versioning import bump_data_version
+
+from .models import PagoVenta, Sale, SaleDetail, VentaDiaria
+from .services import ReceivablesService, SaleService
+
+SALES_LEGACY_MODELS = (Role, LegacyUser, Cliente, Proveedor, Product, Sale, SaleDetail)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RegisterSaleFromCartTests(LegacyTablesMixin, TestCase):
+    legacy_models = SALES_LEGACY_MODELS
+
+    # savepoint, SELECT ... FOR UPDATE, cabecera, detalles, UPDATE de stock,
+    # movimientos del libro, UPDATE de ventas_diarias, pago inicial y
+    # liberación del savepoint.
+    EXPECTED_QUERIES = 9
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = LegacyUser.objects.create(
+            username="vendedor", password="x", nombre="Vendedor", ap_pat="Prueba", email="vendedor@example.com"
+        )
+        cls.productos = [
+            Product.objects.create(nombre=f"Producto {idx}", cantidad=10, costo_venta_1=Decimal("5.00"), estado=True)
+            for idx in range(20)
+        ]
+
+    def _vender(self, lineas, **kwargs) -> int:
+        return SaleService().register_sale_from_cart(
+            [{"producto_id": producto.producto_id, "cantidad": cantidad} for producto, cantidad in lineas],
+            usuario_id=self.usuario.usuario_id,
+            metodo_pago="efectivo",
+            **kwargs,
+        )
+
+    def _stock(self, producto) -> int:
+        return Product.objects.values_list("cantidad", flat=True).get(pk=producto.pk)
+
+    def test_repeated_lines_are_merged(self):
+        producto = self.productos[0]
+        venta_id = self._vender([(producto, 3), (producto, 3)])
+        self.assertEqual(self._stock(producto), 4)
+        self.assertEqual(SaleDetail.objects.filter(venta_id=venta_id).count(), 2)
+        self.assertEqual(Sale.objects.get(pk=venta_id).total, Decimal("30.00"))
+
+    def test_short_line_rolls_back_the_whole_sale(self):
+        suficiente, escaso = self.productos[:2]
+        for lineas in ([(suficiente, 2), (escaso, 11)], [(escaso, 6), (escaso, 6)]):
+            with self.subTest(lineas=[(p.nombre, c) for p, c in lineas]):
+                with self.assertRaisesMessage(ValueError, "Stock insuficiente"):
+                    self._vender(lineas)
+                self.assertEqual((self._stock(suficiente), self._stock(escaso)), (10, 10))
+                self.assertFalse(Sale.objects.exists())
+                self.assertFalse(MovimientoStock.objects.exists())
+                self.assertFalse(VentaDiaria.objects.exists())
+
+    def test_stock_update_is_guarded_by_quantity(self):
+        # El UPDATE en bloque repite la verificación de stock aunque los
+        # productos en memoria digan que alcanza.
+        producto = self.productos[0]
+        service = SaleService()
+        lineas = service._normalize_cart([{"producto_id": producto.producto_id, "cantidad": 8}])
+        productos = service._lock_products(lineas)
+        Product.objects.filter(pk=producto.pk).update(cantidad=7)
+        with self.assertRaisesMessage(ValueError, "Stock insuficiente"):
+            service._decrement_stock(lineas, productos)
+        self.assertEqual(self._stock(producto), 7)
+
+    def test_side_effects_are_written(self):
+        a, b = self.productos[:2]
+        venta_id = self._vender([(a, 2), (b, 1)], abono=Decimal("4.00"))
+        venta = Sale.objects.get(pk=venta_id)
+        self.assertTrue(venta.numero_factura.startswith("001-001-"))
+        self.assertEqual((venta.total, venta.abono, venta.saldo), (Decimal("15.00"), Decimal("4.00"), Decimal("11.00")))
+
+        movimientos = MovimientoStock.objects.filter(referencia_id=venta_id, tipo=MovimientoStock.TIPO_VENTA)
+        self.assertEqual(
+            dict(movimientos.values_list("producto_id", "cantidad")), {a.producto_id: -2, b.producto_id: -1}
+        )
+
+        diaria = VentaDiaria.objects.get()
+        self.assertEqual((diaria.num_ventas, diaria.unidades, diaria.total), (1, 3, Decimal("15.00")))
+
+        pago = PagoVenta.objects.get(venta_id=venta_id)
+        self.assertEqual((pago.monto, pago.usuario_id), (Decimal("4.00"), self.usuario.usuario_id))
+
+    def test_query_count_does_not_depend_on_lines(self):
+        # Una venta previa crea la fila de ventas_diarias; así todas las
+        # ventas medidas hacen el mismo UPDATE.
+        self._vender([(self.productos[-1], 1)], numero_factura="F-0")
+        for size in (1, len(self.productos) - 1):
+            with self.subTest(lineas=size):
+                lineas = [(producto, 1) for producto in self.productos[:size]]
+                with self.assertNumQueries(self.EXPECTED_QUERIES):
+                    self._vender(lineas, numero_factura=f"F-{size}", abono=Decimal("1.00"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReceivablesTests(LegacyTablesMixin, TestCase):
+    legacy_models = SALES_LEGACY_MODELS
+
+    @classmethod
+    def setUpTestData(cls):
+        ahora = timezone.now()
+        # (saldo de cada venta abierta, días de la más antigua): varios clientes
+        # empatan en saldo total y en antigüedad.
+        deudas = [
+            ((Decimal("30.00"),), 5),
+            ((Decimal("10.00"), Decimal("20.00")), 5),
+            ((Decimal("30.00"),), 9),
+            ((Decimal("15.00"),), 9),
+            ((Decimal("15.00"),), 1),
+            ((Decimal("50.00"), Decimal("0.00")), 3),
+        ]
+        cls.clientes = []
+        for idx, (saldos, dias) in enumerate(deudas):
+            cliente = Cliente.objects.create(nombres=f"Cliente {idx}", ap_pat="Deudor", rut=f"10{idx:06d}")
+            cls.clientes.append(cliente)
+            for orden, saldo in enumerate(saldos):
+                Sale.objects.create(
+                    cliente=cliente,
+                    total=Decimal("60.00"),
+                    abono=Decimal("60.00") - saldo,
+                    saldo=saldo,
+                    fecha_venta=ahora - timedelta(days=dias - orden),
+                )
+        Sale.objects.create(total=Decimal("9.00"), abono=0, saldo=Decimal("9.00"), fecha_venta=ahora)
+        cls.venta = Sale.objects.filter(cliente=cls.clientes[0]).get()
+
+    def test_payment_updates_sale_and_records_row(self):
+        pago = ReceivablesService().register_payment(self.venta.venta_id, "12.5", usuario_id=7, metodo_pago="efectivo")
+        venta = Sale.objects.get(pk=self.venta.pk)
+        self.assertEqual((venta.abono, venta.saldo), (Decimal("42.50"), Decimal("17.50")))
+        self.assertEqual(
+            PagoVenta.objects.filter(venta_id=self.venta.venta_id).values_list("pago_id", "monto", "cliente_id").get(),
+            (pago.pago_id, Decimal("12.50"), self.clientes[0].cliente_id),
+        )
+
+    def test_overpayment_is_rejected(self):
+        service = ReceivablesService()
+        for monto in ("30.01", "0", "-1", "abc"):
+            with self.subTest(monto=monto), self.assertRaises(ValueError):
+                service.register_payment(self.venta.venta_id, monto)
+        venta = Sale.objects.get(pk=self.venta.pk)
+        self.assertEqual((venta.abono, venta.saldo), (Decimal("30.00"), Decimal("30.00")))
+        self.assertFalse(PagoVenta.objects.exists())
+
+        service.register_payment(self.venta.venta_id, "30.00")
+        self.assertEqual(Sale.objects.get(pk=self.venta.pk).saldo, Decimal("0.00"))
+
+    def test_debtors_cursor_walks_every_client_once(self):
+        service = ReceivablesService()
+        deudores = set(c.cliente_id for c in self.clientes)
+        for orden in ("monto", "antiguedad"):
+            for limit in (1, 2, 4):
+                with self.subTest(orden=orden, limit=limit):
+                    filas, cursor = [], None
+                    while True:
+                        pagina, cursor = service.debtors_page(orden=orden, cursor=cursor, limit=limit)
+                        filas.extend(pagina)
+                        if cursor is None:
+                            break
+                    ids = [fila["cliente_id"] for fila in filas]
+                    self.assertEqual(len(ids), len(set(ids)))
+                    self.assertEqual(set(ids), deudores)
+                    if orden == "monto":
+                        claves = [(-fila["saldo_total"], fila["cliente_id"]) for fila in filas]
+                    else:
+                        claves = [(fila["venta_mas_antigua"], fila["cliente_id"]) for fila in filas]
+                    self.assertEqual(claves, sorted(claves))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class HistoryExportJobTests(LegacyTablesMixin, TestCase):
+    legacy_models = SALES_LEGACY_MODELS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = LegacyUser.objects.create(
+            username="vendedor", password="x", nombre="Vendedor", ap_pat="Prueba", email="vendedor@example.com"
+        )
+        Sale.objects.create(total=Decimal("10.00"), abono=Decimal("10.00"), saldo=0, fecha_venta=timezone.now())
+
+    def setUp(self):
+        exports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(exports_dir.cleanup)
+        self.exports_dir = Path(exports_dir.name)
+        self.enterContext(self.settings(EXPORTS_DIR=self.exports_dir))
+        # El trabajo corre en el mismo hilo, dentro de la transacción de la prueba.
+        inmediato = SimpleNamespace(submit=lambda fn, *args: fn(*args))
+        self.enterContext(mock.patch.object(export_jobs, "_get_executor", return_value=inmediato))
+
+    def login(self, rol):
+        user = User.objects.create_user(f"{rol.lower()}-web", password="x")
+        self.client.force_login(user)
+        session = self.client.session
+        session.update({"rol": rol, "legacy_user_id": self.usuario.usuario_id})
+        session.save()
+
+    def _solicitar(self, **datos) -> dict:
+        """Pide la exportación y devuelve el estado del trabajo ya ejecutado."""
+        response = self.client.post(reverse("sale_html:exportar_historial_trabajo"), datos)
+        self.assertEqual(response.status_code, 202)
+        return self.client.get(response.json()["data"]["status_url"]).json()["data"]
+
+    def _archivos(self) -> list:
+        return sorted(path.suffix for path in self.exports_dir.iterdir())
+
+    def test_filters_and_format_are_read_from_post_body(self):
+        self.login("Vendedor")
+        job = export_jobs.get_job(self._solicitar(desde="2024-01-01", hasta="2024-01-31", formato="csv")["job_id"])
+        self.assertEqual(job["formato"], "csv")
+        self.assertEqual(job["params"]["desde"], "2024-01-01")
+        self.assertEqual(job["nombre_descarga"], "historial_ventas_2024-01-01_2024-01-31.csv")
+
+    def test_unchanged_data_reuses_the_artifact(self):
+        self.login("Vendedor")
+        primero = self._solicitar()
+        self.assertEqual((primero["estado"], primero["cacheado"]), ("listo", False))
+        self.assertEqual(self._archivos(), [".json", ".xlsx"])
+
+        with mock.patch("apps.sales.views.build_historial_export") as build:
+            segundo = self._solicitar()
+        build.assert_not_called()
+        self.assertTrue(segundo["cacheado"])
+        self.assertNotEqual(segundo["job_id"], primero["job_id"])
+        self.assertEqual(export_jobs.get_job(segundo["job_id"])["nombre_descarga"], "historial_ventas.xlsx")
+
+        response = self.client.get(segundo["download_url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="historial_ventas.xlsx"', response["Content-Disposition"])
+        response.close()
+
+    def test_new_data_stamp_regenerates_the_artifact(self):
+        self.login("Vendedor")
+        anterior = export_jobs.get_job(self._solicitar()["job_id"])["archivo"]
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version("ventas")
+        job = self._solicitar()
+        self.assertFalse(job["cacheado"])
+        archivo = export_jobs.get_job(job["job_id"])["archivo"]
+        self.assertNotEqual(archivo, anterior)
+        # El archivo anterior y sus metadatos se borran al generar el nuevo.
+        self.assertEqual(sorted(p.name for p in self.exports_dir.iterdir()), [archivo, f"{archivo}.json"])
+
+    def test_status_and_download_check_the_role(self):
+        self.login("Vendedor")
+        job = self._solicitar()
+        self.client.logout()
+        self.login("Optometrista")
+        for url in (job["status_url"], job["download_url"]):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 403)
+                self.assertEqual(response.json(), {"success": False, "message": "Acceso denegado."})
+        self.assertEqual(self.client.post(reverse("sale_html:exportar_historial_trabajo")).status_code, 403)
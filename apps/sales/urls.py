@@ -6,9 +6,24 @@ app_name = "sale_html"
 
 urlpatterns = [
     path("registrar-venta/", views.registrar_venta_page, name="registrar_venta_page"),
+    path("catalogo-productos/", views.catalogo_productos_api, name="catalogo_productos_api"),
     path("revisar-venta/", views.revisar_venta_page, name="revisar_venta_page"),
     path("finalizar-venta-definitiva/", views.finalizar_venta_definitiva, name="finalizar_venta_definitiva"),
     path("boleta/<int:venta_id>/", views.boleta_page, name="boleta_page"),
     path("historial-ventas/", views.historial_ventas_page, name="historial_ventas_page"),
+    path("historial-ventas/api/", views.historial_ventas_api, name="historial_ventas_api"),
+    path("cuentas-por-cobrar/api/", views.cuentas_por_cobrar_api, name="cuentas_por_cobrar_api"),
+    path(
+        "cuentas-por-cobrar/clientes/<int:cliente_id>/",
+        views.saldo_cliente_api,
+        name="saldo_cliente_api",
+    ),
+    path("<int:venta_id>/pagos/", views.registrar_pago_venta, name="registrar_pago_venta"),
+    path("reportes/api/", views.reporte_ventas_api, name="reporte_ventas_api"),
     path("historial-ventas/exportar-excel/", views.exportar_historial_excel, name="exportar_historial_excel"),
+    path(
+        "historial-ventas/exportar-excel/trabajo/",
+        views.exportar_historial_trabajo,
+        name="exportar_historial_trabajo",
+    ),
 ]
@@ -2,22 +2,49 @@ from __future__ import annotations
 
 import json
 
-from io import BytesIO
+from datetime import datetime, timedelta
+from decimal import Decimal
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
-from openpyxl import Workbook
 
-from apps.inventory.services import ProductService
-
-from .services import SaleService
+from apps.accounts.models import LegacyUser
+from apps.inventory.services import ProductCatalogService, ProductService
+from apps.shared.export_jobs import register_export
+from apps.shared.exports import (
+    Column,
+    Sheet,
+    as_date,
+    as_float,
+    as_int,
+    as_text,
+    export_response,
+    requested_format,
+)
+from apps.shared.pagination import clamp_limit
+from apps.shared.views import start_export_job
+
+from .models import Sale, SaleDetail
+from .services import DEBTORS_ORDERING, ReceivablesService, SaleService, SalesRollupService
 
 product_service = ProductService()
+product_catalog = ProductCatalogService()
 sale_service = SaleService()
+sales_rollups = SalesRollupService()
+receivables = ReceivablesService()
+
+METODOS_PAGO = [
+    ("efectivo", "Efectivo"),
+    ("tarjeta", "Tarjeta"),
+    ("transferencia", "Transferencia"),
+    ("mixto", "Mixto"),
+]
 
 
 def _require_seller(request):
@@ -27,34 +54,45 @@ def _require_seller(request):
     return None
 
 
-def _serialize_products():
-    data = []
-    for product in product_service.list_products():
-        price = product.costo_venta_1 or product.costo_unitario or 0
-        data.append(
-            {
-                "producto_id": product.producto_id,
-                "nombre": product.nombre,
-                "precio_unitario": float(price),
-                "codigo": product.codigo or "",
-            }
-        )
-    return json.dumps(data, ensure_ascii=False)
-
-
 @login_required
 def registrar_venta_page(request: HttpRequest) -> HttpResponse:
     redirect_response = _require_seller(request)
     if redirect_response:
         return redirect_response
-    products_json = _serialize_products()
+    # El catálogo ya no va incrustado en el HTML: la página lo pide a
+    # catalogo_productos_api, que el navegador revalida con ETag.
     return render(
         request,
         "registrar_venta.html",
-        {"products_json": products_json, "today": timezone.now().date().isoformat()},
+        {"today": timezone.now().date().isoformat()},
     )
 
 
+@login_required
+@require_GET
+def catalogo_productos_api(request: HttpRequest) -> HttpResponse:
+    """
+    Catálogo de productos activos para el punto de venta. Responde 304 si el
+    navegador ya tiene la versión vigente (If-None-Match).
+    """
+    if request.session.get("rol") not in ("Administrador", "Vendedor"):
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+
+    etag, body = product_catalog.get_catalog()
+    etag = f'"{etag}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            '{"success": true, "data": ' + body + "}",
+            content_type="application/json; charset=utf-8",
+        )
+    response["ETag"] = etag
+    # private + no-cache: el navegador guarda la respuesta pero la revalida
+    # en cada carga, de modo que nunca usa un catálogo desactualizado.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 def revisar_venta_page(request: HttpRequest) -> HttpResponse:
     redirect_response = _require_seller(request)
@@ -161,77 +199,275 @@ def boleta_page(request: HttpRequest, venta_id: int) -> HttpResponse:
     return render(request, "boleta.html", {"venta": venta})
 
 
+def _parse_date(value: str | None):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+HISTORY_FILTER_PARAMS = ("desde", "hasta", "vendedor", "metodo_pago")
+
+
+def _filters_from_params(params) -> dict:
+    try:
+        usuario_id = int(params.get("vendedor") or 0) or None
+    except ValueError:
+        usuario_id = None
+    return {
+        "fecha_desde": _parse_date(params.get("desde")),
+        "fecha_hasta": _parse_date(params.get("hasta")),
+        "usuario_id": usuario_id,
+        "metodo_pago": (params.get("metodo_pago") or "").strip() or None,
+    }
+
+
+def _history_filters(request: HttpRequest) -> dict:
+    return _filters_from_params(request.GET)
+
+
 @login_required
 def historial_ventas_page(request: HttpRequest) -> HttpResponse:
     redirect_response = _require_seller(request)
     if redirect_response:
         return redirect_response
-    ventas = sale_service.get_all_sales_with_details()
-    return render(request, "historial_ventas.html", {"ventas": ventas})
+    filters = _history_filters(request)
+    limit = clamp_limit(request.GET.get("limit"))
+    ventas, next_cursor = sale_service.list_sales_page(
+        cursor=request.GET.get("cursor"), limit=limit, **filters
+    )
+    return render(
+        request,
+        "historial_ventas.html",
+        {
+            "ventas": ventas,
+            "next_cursor": next_cursor,
+            "limit": limit,
+            "filtros": request.GET,
+            "vendedores": LegacyUser.objects.filter(estado=True).order_by("username"),
+            "metodos_pago": METODOS_PAGO,
+        },
+    )
+
+
+@login_required
+def historial_ventas_api(request: HttpRequest) -> JsonResponse:
+    if request.session.get("rol") not in ("Administrador", "Vendedor"):
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    ventas, next_cursor = sale_service.list_sales_page(
+        cursor=request.GET.get("cursor"),
+        limit=clamp_limit(request.GET.get("limit")),
+        **_history_filters(request),
+    )
+    return JsonResponse(
+        {
+            "success": True,
+            "data": [sale_service.serialize_sale_summary(venta) for venta in ventas],
+            "meta": {"count": len(ventas), "next_cursor": next_cursor},
+        }
+    )
+
+
+REPORT_DEFAULT_DAYS = 30
+
+
+def _report_row(row: dict, vendedores: dict) -> dict:
+    data = {key: float(value) if isinstance(value, Decimal) else value for key, value in row.items()}
+    if "fecha" in data:
+        data["fecha"] = row["fecha"].isoformat()
+    if "usuario_id" in data:
+        data["vendedor"] = vendedores.get(row["usuario_id"])
+    return data
+
+
+@login_required
+@require_GET
+def reporte_ventas_api(request: HttpRequest) -> JsonResponse:
+    """
+    Reporte de ventas por rango de fechas desde los agregados diarios.
+    Parámetros: ``desde``/``hasta`` (por defecto los últimos 30 días) y
+    ``agrupar`` con campos separados por coma: fecha, usuario_id, metodo_pago.
+    """
+    if request.session.get("rol") != "Administrador":
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    hasta = _parse_date(request.GET.get("hasta")) or timezone.localdate()
+    desde = _parse_date(request.GET.get("desde")) or hasta - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    agrupar = [campo.strip() for campo in (request.GET.get("agrupar") or "fecha").split(",") if campo.strip()]
+    invalidos = [campo for campo in agrupar if campo not in SalesRollupService.GROUPS]
+    if invalidos:
+        return JsonResponse(
+            {"success": False, "message": f"Agrupación no válida: {', '.join(invalidos)}."}, status=400
+        )
+
+    reporte = sales_rollups.report(desde, hasta, agrupar)
+    vendedores = {}
+    if "usuario_id" in agrupar:
+        ids = {row["usuario_id"] for row in reporte["filas"]}
+        vendedores = dict(LegacyUser.objects.filter(usuario_id__in=ids).values_list("usuario_id", "username"))
+    return JsonResponse(
+        {
+            "success": True,
+            "data": [_report_row(row, vendedores) for row in reporte["filas"]],
+            "meta": {
+                "count": len(reporte["filas"]),
+                "desde": desde.isoformat(),
+                "hasta": hasta.isoformat(),
+                "agrupar": agrupar,
+                "totales": _report_row(reporte["totales"], vendedores),
+            },
+        }
+    )
+
+
+@login_required
+@require_GET
+def cuentas_por_cobrar_api(request: HttpRequest) -> JsonResponse:
+    """
+    Clientes con saldo pendiente, paginados por cursor. ``orden``: ``monto``
+    (mayor deuda primero, por defecto) o ``antiguedad`` (deuda más antigua).
+    """
+    if request.session.get("rol") not in ("Administrador", "Vendedor"):
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    orden = request.GET.get("orden") if request.GET.get("orden") in DEBTORS_ORDERING else "monto"
+    rows, next_cursor = receivables.debtors_page(
+        orden=orden,
+        cursor=request.GET.get("cursor"),
+        limit=clamp_limit(request.GET.get("limit")),
+    )
+    hoy = timezone.localdate()
+    return JsonResponse(
+        {
+            "success": True,
+            "data": [receivables.serialize_debtor(row, hoy) for row in rows],
+            "meta": {"count": len(rows), "next_cursor": next_cursor, "orden": orden},
+        }
+    )
+
+
+@login_required
+@require_GET
+def saldo_cliente_api(request: HttpRequest, cliente_id: int) -> JsonResponse:
+    """Ventas pendientes de un cliente con sus pagos."""
+    if request.session.get("rol") not in ("Administrador", "Vendedor"):
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    balance = receivables.customer_balance(cliente_id)
+    return JsonResponse({"success": True, "data": balance, "meta": {"count": len(balance["ventas"])}})
+
+
+@login_required
+@require_POST
+def registrar_pago_venta(request: HttpRequest, venta_id: int) -> JsonResponse:
+    """
+    Registra un pago sobre una venta con saldo. Acepta formulario o JSON con
+    ``monto``, ``metodo_pago`` y ``observaciones``.
+    """
+    if request.session.get("rol") not in ("Administrador", "Vendedor"):
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    if request.content_type == "application/json":
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"success": False, "message": "JSON inválido."}, status=400)
+    else:
+        payload = request.POST
+    try:
+        pago = receivables.register_payment(
+            venta_id,
+            payload.get("monto"),
+            usuario_id=request.session.get("legacy_user_id"),
+            metodo_pago=payload.get("metodo_pago"),
+            observaciones=payload.get("observaciones"),
+        )
+    except ValueError as exc:
+        return JsonResponse({"success": False, "message": str(exc)}, status=400)
+    saldo = Sale.objects.filter(venta_id=venta_id).values_list("saldo", flat=True).first()
+    return JsonResponse(
+        {
+            "success": True,
+            "data": {
+                "pago_id": pago.pago_id,
+                "venta_id": venta_id,
+                "monto": float(pago.monto),
+                "saldo": float(saldo or 0),
+                "fecha": pago.fecha.isoformat(),
+            },
+        },
+        status=201,
+    )
+
+
+def _cliente_nombre(row: dict) -> str:
+    nombres = row["venta__cliente__nombres"]
+    if nombres is None:
+        return ""
+    return f"{nombres} {row['venta__cliente__ap_pat'] or ''}".strip()
+
+
+HISTORY_EXPORT_COLUMNS = [
+    Column("ID Venta", "venta_id"),
+    Column("Fecha", "venta__fecha_venta", as_date("%d/%m/%Y %H:%M")),
+    Column(
+        "Cliente",
+        value=_cliente_nombre,
+        requires=("venta__cliente__nombres", "venta__cliente__ap_pat"),
+    ),
+    Column("Producto", "producto__nombre", as_text),
+    Column("Cantidad", "cantidad", as_int),
+    Column("Precio Unitario", "precio_unitario", as_float),
+    Column("Subtotal", "subtotal", as_float),
+    Column("Total Venta", "venta__total", as_float),
+    Column("Vendedor", "venta__usuario__username", as_text),
+    Column("Método de Pago", "venta__metodo_pago", as_text),
+    Column("Estado", "venta__estado", as_text),
+]
+
+
+@register_export(
+    "historial_ventas",
+    models=(Sale, SaleDetail),
+    namespaces=("ventas", "productos"),
+    roles=("Administrador", "Vendedor"),
+)
+def build_historial_export(params) -> tuple[list[Sheet], str]:
+    filters = _filters_from_params(params)
+    sheet = Sheet(
+        "Historial de Ventas",
+        sale_service.history_export_queryset(**filters),
+        HISTORY_EXPORT_COLUMNS,
+    )
+    suffix = ""
+    if filters["fecha_desde"] or filters["fecha_hasta"]:
+        desde = filters["fecha_desde"].isoformat() if filters["fecha_desde"] else "inicio"
+        hasta = filters["fecha_hasta"].isoformat() if filters["fecha_hasta"] else "hoy"
+        suffix = f"_{desde}_{hasta}"
+    return [sheet], f"historial_ventas{suffix}"
 
 
 @login_required
 @csrf_exempt
 def exportar_historial_excel(request: HttpRequest) -> HttpResponse:
+    """
+    Exporta el historial (XLSX por defecto, ``?formato=csv`` para CSV) con el
+    motor de exportación compartido. Acepta los mismos filtros que el
+    historial (desde, hasta, vendedor, metodo_pago).
+    """
     redirect_response = _require_seller(request)
     if redirect_response:
         return redirect_response
+    sheets, filename = build_historial_export(request.GET)
+    return export_response(sheets, filename, requested_format(request))
 
-    ventas = sale_service.get_all_sales_with_details()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Historial de Ventas"
 
-    headers = [
-        "ID Venta",
-        "Fecha",
-        "Cliente",
-        "Producto",
-        "Cantidad",
-        "Precio Unitario",
-        "Subtotal",
-        "Total Venta",
-        "Vendedor",
-        "Método de Pago",
-        "Estado",
-    ]
-    ws.append(headers)
-
-    for venta in ventas:
-        cliente_nombre = (
-            f"{venta.cliente.nombres} {venta.cliente.ap_pat or ''}".strip()
-            if venta.cliente
-            else ""
-        )
-        vendedor = venta.usuario.username if venta.usuario else ""
-        fecha = venta.fecha_venta.strftime("%d/%m/%Y %H:%M") if venta.fecha_venta else ""
-        for det in venta.detalles.all():
-            ws.append(
-                [
-                    venta.venta_id,
-                    fecha,
-                    cliente_nombre,
-                    det.producto.nombre if det.producto else "",
-                    det.cantidad or 0,
-                    float(det.precio_unitario or 0),
-                    float(det.subtotal or 0),
-                    float(venta.total or 0),
-                    vendedor,
-                    venta.metodo_pago or "",
-                    venta.estado or "",
-                ]
-            )
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    response = HttpResponse(
-        buffer.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response["Content-Disposition"] = (
-        f'attachment; filename="historial_ventas.xlsx"'
-    )
-    return response
+@login_required
+@require_POST
+def exportar_historial_trabajo(request: HttpRequest) -> JsonResponse:
+    """
+    Variante en segundo plano: devuelve el id del trabajo y la URL de estado.
+    Si el historial no cambió desde la última exportación con los mismos
+    filtros, se reutiliza el archivo ya generado. Los filtros y el formato
+    llegan en el cuerpo del POST.
+    """
+    params = {key: request.POST.get(key) or "" for key in HISTORY_FILTER_PARAMS}
+    return start_export_job(request, "historial_ventas", params, requested_format(request, request.POST))
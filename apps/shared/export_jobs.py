@@ -0,0 +1,250 @@
+"""
+Exportaciones en segundo plano con artefactos cacheados.
+
+Cada exportación se registra con un nombre, una función que construye sus
+hojas a partir de parámetros serializables y los modelos/versiones de datos de
+los que depende. Al solicitarla se calcula una clave con los parámetros y un
+sello de versión de datos; si ya existe el archivo en ``EXPORTS_DIR`` se
+sirve directamente (el nombre de descarga se guarda junto a él en un
+``.json``), y si no se genera en un pool de hilos fuera de la petición. El
+estado de cada trabajo vive en la caché compartida.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .exports import Sheet, iter_csv, write_xlsx
+from .versioning import get_data_versions
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL_SECONDS = 6 * 60 * 60
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_PROCESANDO = "procesando"
+ESTADO_LISTO = "listo"
+ESTADO_ERROR = "error"
+
+
+@dataclass(frozen=True)
+class ExportDefinition:
+    name: str
+    build: Callable[[dict], Tuple[Sequence[Sheet], str]]
+    models: Sequence
+    namespaces: Sequence[str]
+    roles: Sequence[str]
+
+
+_registry: Dict[str, ExportDefinition] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def register_export(name: str, *, models=(), namespaces=(), roles=("Administrador",)):
+    """
+    Decorador que registra una función ``build(params) -> (sheets, filename)``.
+    """
+
+    def decorator(build):
+        _registry[name] = ExportDefinition(name, build, tuple(models), tuple(namespaces), tuple(roles))
+        return build
+
+    return decorator
+
+
+def get_export(name: str) -> Optional[ExportDefinition]:
+    return _registry.get(name)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "EXPORT_JOB_WORKERS", 2),
+            thread_name_prefix="export-job",
+        )
+    return _executor
+
+
+def _exports_dir() -> Path:
+    path = Path(getattr(settings, "EXPORTS_DIR", Path(settings.MEDIA_ROOT) / "exports"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _digest(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def data_stamp(definition: ExportDefinition) -> str:
+    """
+    Sello de versión de datos: conteo y PK máxima de cada tabla (detecta
+    altas y bajas aunque se hagan fuera de la aplicación) más las versiones
+    que los servicios incrementan al modificar filas.
+    """
+    parts = []
+    for model in definition.models:
+        parts.append(model.objects.aggregate(n=Count("pk"), max_pk=Max("pk")))
+    parts.append(get_data_versions(*definition.namespaces))
+    return _digest(parts)
+
+
+def _artifact_path(definition: ExportDefinition, params: dict, fmt: str, stamp: str) -> Path:
+    return _exports_dir() / f"{definition.name}_{_digest([params, fmt])}_{stamp}.{fmt}"
+
+
+def _job_key(job_id: str) -> str:
+    return f"export-job:{job_id}"
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return cache.get(_job_key(job_id))
+
+
+def _save_job(job: dict) -> None:
+    cache.set(_job_key(job["job_id"]), job, timeout=JOB_TTL_SECONDS)
+
+
+def _meta_path(target: Path) -> Path:
+    return target.with_name(f"{target.name}.json")
+
+
+def _read_meta(target: Path) -> Optional[dict]:
+    try:
+        return json.loads(_meta_path(target).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(target: Path, meta: dict) -> None:
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, suffix=".part")
+    with os.fdopen(fd, "w", encoding="utf-8") as output:
+        json.dump(meta, output)
+    os.replace(tmp_name, _meta_path(target))
+
+
+def _write_artifact(sheets: Sequence[Sheet], fmt: str, target: Path) -> None:
+    # Se escribe en un temporal del mismo directorio y se renombra, para que
+    # otro worker nunca sirva un archivo a medio escribir.
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, suffix=".part")
+    try:
+        if fmt == "csv":
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as output:
+                for chunk in iter_csv(sheets[0]):
+                    output.write(chunk)
+        else:
+            with os.fdopen(fd, "wb") as output:
+                write_xlsx(sheets, output)
+        os.replace(tmp_name, target)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def _purge_stale(target: Path) -> None:
+    prefix = target.name.rsplit("_", 1)[0] + "_"
+    vigentes = {target, _meta_path(target)}
+    for path in target.parent.glob(f"{prefix}*"):
+        if path not in vigentes and not path.name.endswith(".part"):
+            path.unlink(missing_ok=True)
+
+
+def _run(job_id: str) -> None:
+    close_old_connections()
+    job = get_job(job_id)
+    if job is None:
+        return
+    try:
+        definition = _registry[job["export"]]
+        job["estado"] = ESTADO_PROCESANDO
+        _save_job(job)
+
+        sheets, filename = definition.build(job["params"])
+        target = _exports_dir() / job["archivo"]
+        # Los metadatos van antes que el archivo: si éste existe, aquéllos también.
+        _write_meta(target, {"nombre_descarga": f"{filename}.{job['formato']}"})
+        _write_artifact(sheets, job["formato"], target)
+        _purge_stale(target)
+
+        job.update(
+            estado=ESTADO_LISTO,
+            nombre_descarga=_read_meta(target)["nombre_descarga"],
+            terminado=timezone.now().isoformat(),
+        )
+    except Exception as exc:
+        logger.exception("Error generando la exportación %s", job_id)
+        job.update(estado=ESTADO_ERROR, error=str(exc))
+    finally:
+        _save_job(job)
+        cache.delete(f"export-running:{job['archivo']}")
+        connections.close_all()
+
+
+def submit_export(name: str, params: Optional[dict] = None, fmt: str = "xlsx") -> dict:
+    """
+    Solicita una exportación. Si el artefacto para estos parámetros y esta
+    versión de datos ya existe, el trabajo nace terminado; si hay otro trabajo
+    idéntico en curso se devuelve ese mismo.
+    """
+    definition = _registry[name]
+    params = params or {}
+    stamp = data_stamp(definition)
+    target = _artifact_path(definition, params, fmt, stamp)
+
+    running_key = f"export-running:{target.name}"
+    running_id = cache.get(running_key)
+    if running_id:
+        job = get_job(running_id)
+        if job and job["estado"] in (ESTADO_PENDIENTE, ESTADO_PROCESANDO):
+            return job
+
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "export": name,
+        "params": params,
+        "formato": fmt,
+        "archivo": target.name,
+        "estado": ESTADO_PENDIENTE,
+        "creado": timezone.now().isoformat(),
+        "cacheado": False,
+    }
+
+    # Un archivo sin metadatos (de una versión anterior) se vuelve a generar.
+    meta = _read_meta(target) if target.exists() else None
+    if meta:
+        job.update(estado=ESTADO_LISTO, cacheado=True, nombre_descarga=meta["nombre_descarga"])
+        _save_job(job)
+        return job
+
+    _save_job(job)
+    if not cache.add(running_key, job["job_id"], timeout=JOB_TTL_SECONDS):
+        # Otro worker ganó la carrera; se reutiliza su trabajo.
+        other = get_job(cache.get(running_key) or "")
+        if other:
+            return other
+    _get_executor().submit(_run, job["job_id"])
+    return job
+
+
+def artifact_path(job: dict) -> Optional[Path]:
+    if job.get("estado") != ESTADO_LISTO:
+        return None
+    path = _exports_dir() / job["archivo"]
+    return path if path.exists() else None
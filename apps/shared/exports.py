@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import csv
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from django.db.models import QuerySet
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_CONTENT_TYPE = "text/csv; charset=utf-8"
+EXPORT_CHUNK_SIZE = 2000
+# Hasta 8 MB el XLSX se arma en memoria; por encima se vuelca a disco.
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+EXPORT_FORMATS = ("xlsx", "csv")
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    Columna de una exportación.
+
+    - ``field``: clave de ``values()`` (o del dict) cuyo valor va a la celda.
+    - ``format``: función opcional aplicada a ese valor.
+    - ``value``: alternativa a ``field`` para columnas calculadas a partir de
+      la fila completa; ``requires`` declara los campos que necesita.
+    """
+
+    header: str
+    field: Optional[str] = None
+    format: Optional[Callable[[Any], Any]] = None
+    value: Optional[Callable[[dict], Any]] = None
+    requires: Sequence[str] = ()
+
+    def fields(self) -> List[str]:
+        names = list(self.requires)
+        if self.field:
+            names.append(self.field)
+        return names
+
+    def render(self, row: dict) -> Any:
+        if self.value is not None:
+            return self.value(row)
+        raw = row.get(self.field) if self.field else None
+        return self.format(raw) if self.format else raw
+
+
+@dataclass
+class Sheet:
+    """
+    Hoja a exportar: un queryset (o cualquier iterable de dicts) y sus columnas.
+    Los querysets se proyectan con ``values()`` y se recorren con
+    ``iterator()``, por lo que nunca se cargan completos en memoria.
+    """
+
+    title: str
+    rows: Iterable
+    columns: Sequence[Column]
+    chunk_size: int = EXPORT_CHUNK_SIZE
+
+    @property
+    def headers(self) -> List[str]:
+        return [column.header for column in self.columns]
+
+    def iter_rows(self) -> Iterator[list]:
+        source = self.rows
+        if isinstance(source, QuerySet):
+            needed = list(dict.fromkeys(name for column in self.columns for name in column.fields()))
+            source = source.values(*needed).iterator(chunk_size=self.chunk_size)
+        for row in source:
+            yield [column.render(row) for column in self.columns]
+
+
+# ---------------------------------------------------------------------------
+# Formateadores reutilizables
+# ---------------------------------------------------------------------------
+def as_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def as_int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def as_text(value) -> str:
+    return "" if value is None else str(value)
+
+
+def as_date(fmt: str = "%d/%m/%Y") -> Callable[[Any], str]:
+    """
+    Formatea fechas/fechas-hora; deja pasar strings ya formateados.
+    """
+
+    def _format(value) -> str:
+        if not value:
+            return ""
+        if isinstance(value, datetime):
+            if timezone.is_aware(value):
+                value = timezone.localtime(value)
+            return value.strftime(fmt)
+        if isinstance(value, date):
+            return value.strftime(fmt)
+        return str(value)
+
+    return _format
+
+
+def _csv_cell(value) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Escritores
+# ---------------------------------------------------------------------------
+def write_xlsx(sheets: Sequence[Sheet], output) -> None:
+    """
+    Escribe las hojas en un workbook write-only: cada fila se serializa al
+    vuelo y no se mantiene el árbol de celdas en memoria.
+    """
+    wb = Workbook(write_only=True)
+    for sheet in sheets:
+        ws = wb.create_sheet(title=sheet.title)
+        ws.append(sheet.headers)
+        for row in sheet.iter_rows():
+            ws.append(row)
+    wb.save(output)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(sheet: Sheet, delimiter: str = ",") -> Iterator[str]:
+    """
+    Genera el CSV línea a línea. Incluye BOM para que Excel detecte UTF-8.
+    """
+    writer = csv.writer(_Echo(), delimiter=delimiter)
+    yield "\ufeff"
+    yield writer.writerow(sheet.headers)
+    for row in sheet.iter_rows():
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def export_response(sheets: Sequence[Sheet], filename: str, fmt: str = "xlsx"):
+    """
+    Respuesta HTTP para una exportación.
+
+    - ``xlsx``: el libro se escribe en un SpooledTemporaryFile y se envía con
+      FileResponse.
+    - ``csv``: se transmite con StreamingHttpResponse sin archivo intermedio.
+      Sólo admite una hoja (la primera).
+    """
+    if fmt == "csv":
+        response = StreamingHttpResponse(iter_csv(sheets[0]), content_type=CSV_CONTENT_TYPE)
+        response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+        return response
+
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    write_xlsx(sheets, output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def requested_format(request, params=None) -> str:
+    """Formato pedido en ``params`` (por defecto, la query string)."""
+    params = request.GET if params is None else params
+    fmt = (params.get("formato") or "xlsx").lower()
+    return fmt if fmt in EXPORT_FORMATS else "xlsx"
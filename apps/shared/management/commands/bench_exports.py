@@ -0,0 +1,158 @@
+"""
+Benchmark del motor de exportación compartido.
+
+Inserta filas sintéticas (productos y líneas de compra) dentro de una
+transacción que se revierte al final y mide, para cada exportación, el tiempo,
+el pico de memoria Python (tracemalloc) y el RSS pico del proceso. Con
+--legacy se añade el patrón anterior (Workbook en memoria + BytesIO) para
+comparar; se ejecuta al final porque ru_maxrss sólo puede crecer. Los
+tiempos incluyen la sobrecarga de tracemalloc, así que sirven para comparar
+modos entre sí, no como latencia absoluta.
+
+    python manage.py bench_exports --rows 100000 --legacy
+"""
+
+from __future__ import annotations
+
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import Workbook
+
+from apps.inventory.models import Compra, CompraDetalle, Product, Proveedor
+from apps.inventory.views import INVENTORY_EXPORT_COLUMNS, PURCHASE_DETAIL_EXPORT_COLUMNS
+from apps.shared.exports import Sheet, iter_csv, write_xlsx
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _legacy_xlsx(sheet: Sheet) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.append(sheet.headers)
+    for row in sheet.iter_rows():
+        ws.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.getvalue()
+
+
+def _stream_xlsx(sheet: Sheet) -> None:
+    with tempfile.TemporaryFile() as output:
+        write_xlsx([sheet], output)
+
+
+def _stream_csv(sheet: Sheet) -> None:
+    with tempfile.TemporaryFile(mode="w", encoding="utf-8") as output:
+        for chunk in iter_csv(sheet):
+            output.write(chunk)
+
+
+class Command(BaseCommand):
+    help = "Mide tiempo y memoria del motor de exportación con datos sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--legacy", action="store_true", help="Incluye el Workbook en memoria anterior.")
+
+    def handle(self, *args, **options):
+        total = options["rows"]
+        results = []
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Insertando {total} productos y {total} líneas de compra sintéticas...")
+                now = timezone.now()
+                Product.objects.bulk_create(
+                    (
+                        Product(
+                            fecha=now,
+                            nombre=f"bench-export-{idx}",
+                            distribuidor="Distribuidor benchmark",
+                            marca=f"Marca {idx % 50}",
+                            tipo_armazon="Completo",
+                            codigo=f"BX{idx:07d}",
+                            cantidad=idx % 40,
+                            costo_unitario=Decimal("12.50"),
+                            costo_total=Decimal("14.38"),
+                            costo_venta_1=Decimal("43.13"),
+                            costo_venta_2=Decimal("28.75"),
+                            estado=True,
+                        )
+                        for idx in range(total)
+                    ),
+                    batch_size=5000,
+                )
+                producto = Product.objects.filter(nombre="bench-export-0").first()
+                proveedor = Proveedor.objects.create(
+                    codigo_proveedor="BENCH-EXP",
+                    razon_social="Proveedor benchmark",
+                    rut="BENCH-EXP",
+                )
+                compra = Compra.objects.create(proveedor=proveedor, estado="borrador")
+                CompraDetalle.objects.bulk_create(
+                    (
+                        CompraDetalle(
+                            compra=compra,
+                            producto=producto,
+                            codigo=f"BX{idx:07d}",
+                            descripcion="Línea sintética",
+                            cantidad=1 + idx % 5,
+                            precio_unitario=Decimal("12.50"),
+                            tarifa_iva=Decimal("0.15"),
+                            valor_total=Decimal("14.38"),
+                        )
+                        for idx in range(total)
+                    ),
+                    batch_size=5000,
+                )
+
+                sheets = {
+                    "inventario": lambda: Sheet(
+                        "Inventario",
+                        Product.objects.filter(nombre__startswith="bench-export-").order_by("producto_id"),
+                        INVENTORY_EXPORT_COLUMNS,
+                    ),
+                    "detalle compras": lambda: Sheet(
+                        "Detalles",
+                        CompraDetalle.objects.filter(compra=compra).order_by("detalle_id"),
+                        PURCHASE_DETAIL_EXPORT_COLUMNS,
+                    ),
+                }
+                modes = [("xlsx streaming", _stream_xlsx), ("csv streaming", _stream_csv)]
+                if options["legacy"]:
+                    modes.append(("xlsx en memoria", _legacy_xlsx))
+
+                for mode, runner in modes:
+                    for dataset, build in sheets.items():
+                        tracemalloc.start()
+                        start = time.perf_counter()
+                        runner(build())
+                        elapsed = time.perf_counter() - start
+                        _current, peak = tracemalloc.get_traced_memory()
+                        tracemalloc.stop()
+                        results.append((dataset, mode, elapsed, peak / (1024 * 1024), _peak_rss_mb()))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(
+            f"{'dataset':<16} {'modo':<16} {'segundos':>9} {'pico py MB':>11} {'RSS pico MB':>12}"
+        )
+        for dataset, mode, elapsed, peak_mb, rss_mb in results:
+            self.stdout.write(f"{dataset:<16} {mode:<16} {elapsed:>9.2f} {peak_mb:>11.1f} {rss_mb:>12.1f}")
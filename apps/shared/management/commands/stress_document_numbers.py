@@ -0,0 +1,97 @@
+"""
+Prueba de concurrencia del asignador de números de documento: varios procesos
+(como los workers de gunicorn), cada uno con varios hilos, piden números de
+la misma serie al mismo tiempo. Al final se verifica que no haya números
+repetidos entre los que quedaron confirmados.
+
+Con ``--rollback-cada N`` una de cada N asignaciones se hace dentro de una
+transacción que se revierte, para comprobar que esos bloques no se reutilizan
+de forma indebida. Usa una serie propia (``prueba_concurrencia`` por defecto),
+así que no toca las series reales.
+
+Necesita una base de datos compartida entre procesos (PostgreSQL o un SQLite
+en archivo).
+
+    python manage.py stress_document_numbers --procesos 8 --hilos 4 --cantidad 500
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test.utils import override_settings
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _asignar(serie: str, cantidad: int, rollback_cada: int) -> list:
+    from apps.shared.numbering import document_numbers
+
+    confirmados = []
+    try:
+        for i in range(1, cantidad + 1):
+            if rollback_cada and i % rollback_cada == 0:
+                try:
+                    with transaction.atomic():
+                        document_numbers.next_value(serie)
+                        raise _Rollback
+                except _Rollback:
+                    continue
+            with transaction.atomic():
+                confirmados.append(document_numbers.next_value(serie))
+    finally:
+        connection.close()
+    return confirmados
+
+
+def _worker(serie: str, bloque: int, hilos: int, cantidad: int, rollback_cada: int) -> list:
+    with override_settings(DOCUMENT_SERIES={serie: {"bloque": bloque, "digitos": 9}}):
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            futuros = [pool.submit(_asignar, serie, cantidad, rollback_cada) for _ in range(hilos)]
+            return [numero for futuro in futuros for numero in futuro.result()]
+
+
+class Command(BaseCommand):
+    help = "Prueba de concurrencia de la numeración de documentos (sin números repetidos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--serie", default="prueba_concurrencia")
+        parser.add_argument("--procesos", type=int, default=os.cpu_count() or 2)
+        parser.add_argument("--hilos", type=int, default=4)
+        parser.add_argument("--cantidad", type=int, default=500, help="Números por hilo.")
+        parser.add_argument("--bloque", type=int, default=20)
+        parser.add_argument("--rollback-cada", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise CommandError("La prueba necesita una base de datos compartida (no SQLite en memoria).")
+        procesos = max(options["procesos"], 1)
+        hilos = max(options["hilos"], 1)
+        argumentos = (options["serie"], max(options["bloque"], 1), hilos, options["cantidad"], options["rollback_cada"])
+        # Cada proceso abre sus propias conexiones.
+        connections.close_all()
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=procesos, initializer=django.setup) as pool:
+            resultados = list(pool.map(_worker, *[[arg] * procesos for arg in argumentos]))
+        elapsed = time.perf_counter() - start
+
+        numeros = [numero for lote in resultados for numero in lote]
+        repetidos = len(numeros) - len(set(numeros))
+        self.stdout.write(
+            f"motor: {connection.vendor}; {procesos} procesos x {hilos} hilos; bloque {argumentos[1]}"
+        )
+        self.stdout.write(
+            f"{len(numeros)} números confirmados en {elapsed:.2f} s "
+            f"({len(numeros) / elapsed:.0f}/s); rango {min(numeros, default=0)}..{max(numeros, default=0)}"
+        )
+        if repetidos:
+            raise CommandError(f"{repetidos} números repetidos")
+        self.stdout.write(self.style.SUCCESS("Sin números repetidos."))
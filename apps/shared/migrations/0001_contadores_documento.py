@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ContadorDocumento",
+            fields=[
+                ("serie", models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ("siguiente", models.BigIntegerField(default=1)),
+            ],
+            options={
+                "verbose_name": "Contador de documentos",
+                "verbose_name_plural": "Contadores de documentos",
+                "db_table": "contadores_documento",
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shared", "0001_contadores_documento"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contadordocumento",
+            name="reserva",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+    ]
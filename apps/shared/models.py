@@ -1,2 +1,23 @@
 from django.db import models
 
+
+class ContadorDocumento(models.Model):
+    """
+    Próximo número libre de cada serie de documentos (fichas, consultas,
+    facturas). Lo usa ``apps.shared.numbering`` en los motores sin secuencias
+    nativas; en PostgreSQL cada serie tiene su propia secuencia.
+    ``reserva`` identifica la última reserva de bloque: si la transacción que
+    la hizo se revierte, vuelve al valor anterior.
+    """
+
+    serie = models.CharField(max_length=40, primary_key=True)
+    siguiente = models.BigIntegerField(default=1)
+    reserva = models.CharField(max_length=32, blank=True, default="")
+
+    class Meta:
+        db_table = "contadores_documento"
+        verbose_name = "Contador de documentos"
+        verbose_name_plural = "Contadores de documentos"
+
+    def __str__(self) -> str:
+        return f"{self.serie}: {self.siguiente}"
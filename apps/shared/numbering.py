@@ -0,0 +1,218 @@
+"""
+Numeración correlativa de documentos (fichas de pacientes, consultas,
+facturas) sin colisiones entre procesos.
+
+Cada serie tiene prefijo, cantidad de dígitos y tamaño de bloque. Cada hilo
+de cada worker reserva un bloque de números en una sola operación y los
+entrega desde memoria; sólo vuelve a la base de datos cuando se le acaba el
+bloque. Los números de un bloque que no se alcanzan a usar (reinicio del
+worker) quedan como huecos, igual que con cualquier secuencia.
+
+- PostgreSQL: una secuencia nativa por serie (``seq_documento_<serie>``) con
+  ``INCREMENT BY`` igual al bloque; ``nextval`` no se revierte con la
+  transacción, así que dos workers nunca reciben el mismo bloque. Si cambia
+  el ``bloque`` configurado, la secuencia se ajusta con ``ALTER SEQUENCE``
+  sin volver a entregar números del último bloque reservado.
+- Otros motores: tabla ``contadores_documento``. La reserva se hace en la
+  conexión del llamador; si ocurre dentro de una transacción que después se
+  revierte, el contador vuelve atrás y el bloque se descarta en lugar de
+  reutilizarse. El bloque queda confirmado con ``transaction.on_commit``;
+  mientras tanto se comprueba que el contador conserve la marca de la
+  reserva (``reserva``), que desaparece si se revierte un savepoint.
+
+Las series se configuran con ``DOCUMENT_SERIES`` en settings, por ejemplo::
+
+    DOCUMENT_SERIES = {"factura": {"prefijo": "002-001-", "digitos": 9, "inicio": 1500}}
+
+``inicio`` sólo se usa al crear la secuencia o el contador de la serie;
+cambiarlo después no mueve una numeración que ya empezó.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Dict
+
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+
+from .models import ContadorDocumento
+
+DEFAULT_BLOCK_SIZE = 20
+DEFAULT_SERIES = {
+    "ficha": {"prefijo": "FM-", "digitos": 8},
+    "consulta": {"prefijo": "CONS-", "digitos": 8},
+    "factura": {"prefijo": "001-001-", "digitos": 9},
+}
+
+_SERIE_NAME = re.compile(r"^[a-z][a-z0-9_]{0,39}$")
+
+
+@dataclass(frozen=True)
+class Serie:
+    nombre: str
+    prefijo: str = ""
+    digitos: int = 6
+    bloque: int = DEFAULT_BLOCK_SIZE
+    inicio: int = 1
+
+    def formatear(self, numero: int) -> str:
+        return f"{self.prefijo}{numero:0{self.digitos}d}"
+
+
+def get_serie(nombre: str) -> Serie:
+    """Configuración de la serie: ``DEFAULT_SERIES`` más ``settings.DOCUMENT_SERIES``."""
+    if not _SERIE_NAME.match(nombre or ""):
+        raise ValueError(f"Nombre de serie inválido: {nombre!r}")
+    config = dict(DEFAULT_SERIES.get(nombre, {}))
+    config.update(getattr(settings, "DOCUMENT_SERIES", {}).get(nombre, {}))
+    serie = Serie(nombre=nombre, **config)
+    if serie.bloque < 1 or serie.inicio < 1:
+        raise ValueError(f"Serie {nombre}: bloque e inicio deben ser positivos")
+    return serie
+
+
+class _Bloque:
+    __slots__ = ("siguiente", "hasta", "confirmado", "serie", "reserva")
+
+    def __init__(self, desde: int, hasta: int, confirmado: bool, serie: str = "", reserva: str = ""):
+        self.siguiente = desde
+        self.hasta = hasta  # exclusivo
+        self.confirmado = confirmado
+        self.serie = serie
+        self.reserva = reserva
+
+    def confirmar(self) -> None:
+        self.confirmado = True
+
+    def vigente(self) -> bool:
+        if self.siguiente >= self.hasta:
+            return False
+        if self.confirmado:
+            return True
+        if not connection.in_atomic_block:
+            # La transacción terminó sin pasar por on_commit: se revirtió.
+            return False
+        # Sigue dentro de una transacción: la reserva vale mientras el
+        # contador conserve su marca (un savepoint revertido la deshace). Es un
+        # UPDATE sin cambios y no un SELECT para que SQLite tome de entrada el
+        # bloqueo de escritura que la reserva siguiente necesitaría.
+        contador = ContadorDocumento.objects.filter(serie=self.serie, reserva=self.reserva)
+        return bool(contador.update(reserva=self.reserva))
+
+
+class DocumentNumberAllocator:
+    def __init__(self):
+        self._local = threading.local()
+        self._secuencias: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _bloques(self) -> Dict[str, _Bloque]:
+        bloques = getattr(self._local, "bloques", None)
+        if bloques is None:
+            bloques = self._local.bloques = {}
+        return bloques
+
+    # ---------------- Reserva ----------------
+    def _preparar_secuencia(self, nombre: str, serie: Serie) -> None:
+        """
+        Crea la secuencia o ajusta su ``INCREMENT BY`` en una conexión aparte,
+        fuera de la transacción del llamador: si ésta se revierte, la
+        secuencia sigue existiendo, y el bloqueo de ``ALTER SEQUENCE`` dura
+        sólo hasta el commit de este ajuste.
+        """
+        aparte = connections.create_connection(connection.alias)
+        try:
+            with aparte.cursor() as cursor:
+                try:
+                    cursor.execute(
+                        f"CREATE SEQUENCE IF NOT EXISTS {nombre} INCREMENT BY {serie.bloque} START WITH {serie.inicio}"
+                    )
+                except IntegrityError:
+                    # Otro worker la creó al mismo tiempo.
+                    pass
+            aparte.set_autocommit(False)
+            with aparte.cursor() as cursor:
+                cursor.execute(
+                    "SELECT increment_by FROM pg_sequences WHERE schemaname = current_schema() AND sequencename = %s",
+                    [nombre],
+                )
+                anterior = cursor.fetchone()[0]
+                if anterior != serie.bloque:
+                    # ALTER SEQUENCE bloquea nextval hasta el commit. Si el bloque se
+                    # achica, se adelanta la secuencia para que el próximo nextval
+                    # empiece después del último bloque entregado con el tamaño anterior.
+                    cursor.execute(f"ALTER SEQUENCE {nombre} INCREMENT BY {serie.bloque}")
+                    cursor.execute(f"SELECT last_value, is_called FROM {nombre}")
+                    ultimo, usada = cursor.fetchone()
+                    if usada and anterior > serie.bloque:
+                        cursor.execute("SELECT setval(%s::regclass, %s)", [nombre, ultimo + anterior - serie.bloque])
+            aparte.commit()
+        finally:
+            aparte.close()
+        with self._lock:
+            self._secuencias[nombre] = serie.bloque
+
+    def _reservar_secuencia(self, serie: Serie) -> _Bloque:
+        nombre = f"seq_documento_{serie.nombre}"
+        if self._secuencias.get(nombre) != serie.bloque:
+            self._preparar_secuencia(nombre, serie)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(%s::regclass), (SELECT increment_by FROM pg_sequences "
+                "WHERE schemaname = current_schema() AND sequencename = %s)",
+                [nombre, nombre],
+            )
+            desde, incremento = cursor.fetchone()
+        return _Bloque(desde, desde + (incremento or 1), confirmado=True)
+
+    def _reservar_tabla(self, serie: Serie) -> _Bloque:
+        en_transaccion = connection.in_atomic_block
+        reserva = uuid.uuid4().hex
+        with transaction.atomic():
+            contadores = ContadorDocumento.objects.filter(serie=serie.nombre)
+            avance = {"siguiente": F("siguiente") + serie.bloque, "reserva": reserva}
+            if not contadores.update(**avance):
+                try:
+                    with transaction.atomic():
+                        ContadorDocumento.objects.create(
+                            serie=serie.nombre, siguiente=serie.inicio + serie.bloque, reserva=reserva
+                        )
+                except IntegrityError:
+                    contadores.update(**avance)
+            hasta = contadores.values_list("siguiente", flat=True).get()
+        bloque = _Bloque(hasta - serie.bloque, hasta, not en_transaccion, serie.nombre, reserva)
+        if en_transaccion:
+            transaction.on_commit(bloque.confirmar)
+        return bloque
+
+    def _reservar(self, serie: Serie) -> _Bloque:
+        if connection.vendor == "postgresql":
+            return self._reservar_secuencia(serie)
+        return self._reservar_tabla(serie)
+
+    # ---------------- API ----------------
+    def next_value(self, nombre: str) -> int:
+        """Siguiente número de la serie; sólo consulta la base al agotar el bloque."""
+        bloques = self._bloques()
+        bloque = bloques.get(nombre)
+        if bloque is None or not bloque.vigente():
+            bloque = bloques[nombre] = self._reservar(get_serie(nombre))
+        valor = bloque.siguiente
+        bloque.siguiente += 1
+        return valor
+
+    def next_number(self, nombre: str) -> str:
+        """Siguiente número de la serie ya formateado con su prefijo (p. ej. ``FM-00000042``)."""
+        return get_serie(nombre).formatear(self.next_value(nombre))
+
+    def reset(self) -> None:
+        """Olvida los bloques del hilo actual (p. ej. después de cambiar la configuración)."""
+        self._bloques().clear()
+
+
+document_numbers = DocumentNumberAllocator()
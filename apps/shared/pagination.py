@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.db.models import F, Q, QuerySet
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _json_default(value):
+    # isoformat completo: DjangoJSONEncoder trunca a milisegundos y el cursor
+    # dejaría de coincidir con filas que guardan microsegundos.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Tipo no serializable en cursor: {type(value).__name__}")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Serializa los valores de la última fila de una página en un token opaco
+    apto para querystrings.
+    """
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str], size: int) -> Optional[list]:
+    """
+    Devuelve la lista de valores del cursor o None si el token es inválido.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def clamp_limit(value, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(limit, 1), maximum)
+
+
+def _order_expression(field: str):
+    if field.startswith("-"):
+        return F(field[1:]).desc(nulls_last=True)
+    return F(field).asc(nulls_last=True)
+
+
+def _after_value(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """
+    Construye el predicado "fila posterior al cursor" para un orden
+    lexicográfico (f1, f2, ...) con NULLs al final.
+    """
+    # Sólo se referencian los campos del orden: en querysets agrupados el
+    # predicado va al HAVING y cualquier otra columna alteraría el GROUP BY.
+    condition = None
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        if value is None:
+            # Dentro del bloque de NULLs sólo avanza el siguiente campo.
+            equal &= Q(**{f"{name}__isnull": True})
+            continue
+        lookup = "lt" if field.startswith("-") else "gt"
+        after = Q(**{f"{name}__{lookup}": value}) | Q(**{f"{name}__isnull": True})
+        condition = equal & after if condition is None else condition | (equal & after)
+        equal &= Q(**{name: value})
+    return Q(pk__in=[]) if condition is None else condition
+
+
+def _row_value(row, field: str):
+    name = field.lstrip("-")
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def paginate_keyset(
+    queryset: QuerySet,
+    ordering: Sequence[str],
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Pagina un queryset por keyset (seek) en lugar de OFFSET.
+
+    ``ordering`` debe terminar en una columna única (normalmente la PK) para
+    que el orden sea total. Devuelve las filas de la página y el cursor de la
+    siguiente, o None si no quedan más filas. Funciona tanto con instancias
+    como con filas de ``values()``.
+    """
+    values = decode_cursor(cursor, len(ordering))
+    qs = queryset.order_by(*[_order_expression(field) for field in ordering])
+    if values is not None:
+        qs = qs.filter(_after_value(ordering, values))
+
+    rows = list(qs[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor([_row_value(rows[-1], field) for field in ordering])
+    return rows, next_cursor
@@ -0,0 +1,292 @@
+"""
+Generador de PDF mínimo, sólo con la biblioteca estándar.
+
+Cubre lo que necesitan los documentos del sistema (certificados, boletas):
+texto con las fuentes estándar Times (sin incrustar, codificación
+WinAnsi/cp1252, así que acentos y eñes salen bien), párrafos con ajuste de
+línea, tablas simples, líneas y un pie de página común. Las páginas se
+agregan solas cuando el contenido no cabe.
+
+La salida es determinista (sin fechas de creación), de modo que el mismo
+contenido produce siempre los mismos bytes.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+import zlib
+from typing import Callable, List, Optional, Sequence
+
+A4 = (595.28, 841.89)
+
+# Anchos (milésimas de em) de los caracteres 32..126 según los AFM estándar.
+_TIMES_ROMAN = (
+    "250 333 408 500 500 833 778 180 333 333 500 564 250 333 250 278 "
+    "500 500 500 500 500 500 500 500 500 500 278 278 564 564 564 444 "
+    "921 722 667 667 722 611 556 722 722 333 389 722 611 889 722 722 "
+    "556 722 667 556 611 722 722 944 722 722 611 333 278 333 469 500 "
+    "333 444 500 444 500 444 333 500 500 278 278 500 278 778 500 500 "
+    "500 500 333 389 278 500 500 722 500 500 444 480 200 480 541"
+)
+_TIMES_BOLD = (
+    "250 333 555 500 500 1000 833 278 333 333 500 570 250 333 250 278 "
+    "500 500 500 500 500 500 500 500 500 500 333 333 570 570 570 500 "
+    "930 722 667 722 722 667 611 778 778 389 500 778 667 944 722 778 "
+    "611 778 722 556 667 722 722 1000 722 722 667 333 278 333 581 500 "
+    "333 500 556 444 556 444 333 500 556 278 333 556 278 833 556 500 "
+    "556 556 444 389 333 556 500 722 500 500 444 394 220 394 520"
+)
+# Signos fuera de ASCII que no se descomponen en una letra base.
+_EXTRA_WIDTHS = {"—": 1000, "–": 500, "•": 350, "°": 400, "º": 310, "ª": 276, "«": 500, "»": 500, "¿": 444, "¡": 333}
+
+FONTS = {
+    "regular": ("F1", "Times-Roman", dict(zip(range(32, 127), map(int, _TIMES_ROMAN.split())))),
+    "bold": ("F2", "Times-Bold", dict(zip(range(32, 127), map(int, _TIMES_BOLD.split())))),
+}
+
+
+def _char_width(char: str, widths: dict) -> int:
+    code = ord(char)
+    if code in widths:
+        return widths[code]
+    if char in _EXTRA_WIDTHS:
+        return _EXTRA_WIDTHS[char]
+    base = unicodedata.normalize("NFKD", char)[:1]
+    return widths.get(ord(base), 500) if base else 500
+
+
+def _encode(text: str) -> bytes:
+    raw = text.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _num(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+class PDFDocument:
+    """
+    Documento con un cursor vertical (``y``) para ir agregando bloques de
+    arriba hacia abajo. Las coordenadas son puntos PDF (origen abajo a la
+    izquierda).
+    """
+
+    def __init__(
+        self,
+        page_size=A4,
+        margin: float = 56,
+        footer: Optional[Callable[["PDFDocument", int, int], None]] = None,
+        footer_height: float = 0,
+        title: str = "",
+    ):
+        self.width, self.height = page_size
+        self.margin = margin
+        self.footer = footer
+        self.footer_height = footer_height
+        self.title = title
+        self.pages: List[List[bytes]] = []
+        self._page: List[bytes] = []
+        self.y = 0.0
+        self.new_page()
+
+    # ---------------- Medidas ----------------
+    @property
+    def content_width(self) -> float:
+        return self.width - 2 * self.margin
+
+    @property
+    def bottom(self) -> float:
+        return self.margin + self.footer_height
+
+    def text_width(self, text: str, font: str = "regular", size: float = 11) -> float:
+        widths = FONTS[font][2]
+        return sum(_char_width(c, widths) for c in text) * size / 1000
+
+    def wrap(self, text: str, width: float, font: str = "regular", size: float = 11) -> List[str]:
+        """Parte el texto en líneas que caben en ``width``; respeta saltos de línea."""
+        lines: List[str] = []
+        space = self.text_width(" ", font, size)
+        for paragraph in (text or "").splitlines() or [""]:
+            current, current_width = [], 0.0
+            for word in paragraph.split():
+                word_width = self.text_width(word, font, size)
+                while word_width > width and len(word) > 1:
+                    # Palabra más ancha que la línea: se corta a la fuerza.
+                    cut = len(word) - 1
+                    while cut > 1 and self.text_width(word[:cut], font, size) > width:
+                        cut -= 1
+                    if current:
+                        lines.append(" ".join(current))
+                        current, current_width = [], 0.0
+                    lines.append(word[:cut])
+                    word = word[cut:]
+                    word_width = self.text_width(word, font, size)
+                extra = word_width + (space if current else 0)
+                if current and current_width + extra > width:
+                    lines.append(" ".join(current))
+                    current, current_width = [word], word_width
+                else:
+                    current.append(word)
+                    current_width += extra
+            lines.append(" ".join(current))
+        return lines
+
+    # ---------------- Primitivas ----------------
+    def new_page(self) -> None:
+        self._page = []
+        self.pages.append(self._page)
+        self.y = self.height - self.margin
+
+    def ensure_space(self, height: float) -> None:
+        if self.y - height < self.bottom:
+            self.new_page()
+
+    def draw_text(self, x: float, y: float, text: str, font: str = "regular", size: float = 11) -> None:
+        if not text:
+            return
+        self._page.append(
+            b"BT /%s %s Tf %s %s Td (%s) Tj ET"
+            % (FONTS[font][0].encode(), _num(size).encode(), _num(x).encode(), _num(y).encode(), _encode(text))
+        )
+
+    def draw_line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.5) -> None:
+        self._page.append(
+            ("%s w %s %s m %s %s l S" % (_num(width), _num(x1), _num(y1), _num(x2), _num(y2))).encode()
+        )
+
+    def draw_rect(self, x: float, y: float, w: float, h: float, fill_gray: Optional[float] = None) -> None:
+        rect = "%s %s %s %s re" % (_num(x), _num(y), _num(w), _num(h))
+        if fill_gray is not None:
+            self._page.append(("q %s g %s f Q" % (_num(fill_gray), rect)).encode())
+        self._page.append(("0.5 w %s S" % rect).encode())
+
+    def aligned_x(self, text: str, font: str, size: float, align: str, x: float, width: float) -> float:
+        if align == "center":
+            return x + (width - self.text_width(text, font, size)) / 2
+        if align == "right":
+            return x + width - self.text_width(text, font, size)
+        return x
+
+    # ---------------- Bloques ----------------
+    def spacer(self, height: float) -> None:
+        self.y -= height
+
+    def rule(self, width: float = 0.8, space: float = 6) -> None:
+        self.ensure_space(space * 2)
+        self.y -= space
+        self.draw_line(self.margin, self.y, self.width - self.margin, self.y, width)
+        self.y -= space
+
+    def paragraph(
+        self,
+        text: str,
+        font: str = "regular",
+        size: float = 11,
+        align: str = "left",
+        leading: Optional[float] = None,
+        space_after: float = 4,
+        indent: float = 0,
+        bullet: str = "",
+        underline: bool = False,
+    ) -> None:
+        leading = leading or size * 1.35
+        x = self.margin + indent
+        width = self.content_width - indent
+        bullet_width = self.text_width(bullet + " ", font, size) if bullet else 0
+        for i, line in enumerate(self.wrap(text, width - bullet_width, font, size)):
+            self.ensure_space(leading)
+            self.y -= leading
+            baseline = self.y + (leading - size) / 2
+            if bullet and i == 0:
+                self.draw_text(x, baseline, bullet, font, size)
+            line_x = self.aligned_x(line, font, size, align, x + bullet_width, width - bullet_width)
+            self.draw_text(line_x, baseline, line, font, size)
+            if underline and line:
+                self.draw_line(line_x, baseline - 1.5, line_x + self.text_width(line, font, size), baseline - 1.5)
+        self.y -= space_after
+
+    def table(
+        self,
+        rows: Sequence[Sequence[str]],
+        widths: Sequence[float],
+        size: float = 9,
+        header: bool = True,
+        padding: float = 4,
+    ) -> None:
+        """Tabla con bordes y celdas centradas; la primera fila es encabezado si ``header``."""
+        scale = self.content_width / sum(widths) if sum(widths) > self.content_width else 1
+        widths = [w * scale for w in widths]
+        leading = size * 1.25
+        for index, row in enumerate(rows):
+            font = "bold" if header and index == 0 else "regular"
+            cells = [self.wrap(str(cell or ""), w - 2 * padding, font, size) for cell, w in zip(row, widths)]
+            height = max(len(lines) for lines in cells) * leading + 2 * padding
+            self.ensure_space(height)
+            x = self.margin
+            for lines, w in zip(cells, widths):
+                self.draw_rect(x, self.y - height, w, height, fill_gray=0.93 if font == "bold" else None)
+                line_y = self.y - padding - size
+                for line in lines:
+                    self.draw_text(self.aligned_x(line, font, size, "center", x, w), line_y, line, font, size)
+                    line_y -= leading
+                x += w
+            self.y -= height
+
+    # ---------------- Salida ----------------
+    def render(self) -> bytes:
+        if self.footer:
+            total = len(self.pages)
+            for number, page in enumerate(self.pages, start=1):
+                self._page = page
+                self.footer(self, number, total)
+
+        objects: List[bytes] = []
+
+        def add(body: bytes) -> int:
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(b"")
+        pages_ref = add(b"")
+        font_refs = {
+            key: add(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % name.encode())
+            for key, name, _ in FONTS.values()
+        }
+        resources = b"<< /Font << %s >> >>" % b" ".join(
+            b"/%s %d 0 R" % (key.encode(), ref) for key, ref in font_refs.items()
+        )
+        kids = []
+        for page in self.pages:
+            stream = zlib.compress(b"\n".join(page))
+            contents = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+            kids.append(
+                add(
+                    b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Resources %s /Contents %d 0 R >>"
+                    % (pages_ref, _num(self.width).encode(), _num(self.height).encode(), resources, contents)
+                )
+            )
+        objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_ref
+        objects[pages_ref - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % ref for ref in kids),
+            len(kids),
+        )
+        info = add(b"<< /Title (%s) /Producer (Oftalmetryc) >>" % _encode(self.title))
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        for offset in offsets:
+            out += b"%010d 00000 n \n" % offset
+        out += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n" % (
+            len(objects) + 1,
+            catalog,
+            info,
+            xref,
+        )
+        # Fuera del formato con %: ahí "%%" se convertiría en "%".
+        out += b"%%EOF\n"
+        return bytes(out)
@@ -0,0 +1,31 @@
+"""Utilidades para las pruebas de las apps que usan tablas heredadas."""
+
+from django.db import connection
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class LegacyTablesMixin:
+    """
+    Crea las tablas heredadas (``managed = False``) que no crean las
+    migraciones. Va antes de ``super().setUpClass()`` porque SQLite no permite
+    cambios de esquema dentro de la transacción de la clase.
+    """
+
+    legacy_models = ()
+
+    @classmethod
+    def setUpClass(cls):
+        existentes = set(connection.introspection.table_names())
+        cls._legacy_created = [m for m in cls.legacy_models if m._meta.db_table not in existentes]
+        with connection.schema_editor() as editor:
+            for model in cls._legacy_created:
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            for model in reversed(cls._legacy_created):
+                editor.delete_model(model)
@@ -1,2 +1,200 @@
-from django.test import TestCase
+import re
+import threading
+from datetime import timedelta
+from decimal import Decimal
 
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.sales.models import PagoVenta
+
+from .numbering import DocumentNumberAllocator
+from .pagination import decode_cursor, encode_cursor, paginate_keyset
+from .pdf import PDFDocument
+
+
+class PDFDocumentTests(SimpleTestCase):
+    def _render(self) -> bytes:
+        doc = PDFDocument(title="Certificado médico")
+        doc.paragraph("Paciente: José Pérez Núñez", font="bold")
+        doc.paragraph("Se certifica que el paciente asistió a control oftalmológico. " * 40)
+        return doc.render()
+
+    def test_trailer_ends_with_eof_marker(self):
+        pdf = self._render()
+        self.assertTrue(pdf.startswith(b"%PDF-1.4\n"))
+        self.assertTrue(pdf.endswith(b"\n%%EOF\n"))
+
+    def test_startxref_points_to_xref_table(self):
+        pdf = self._render()
+        offset = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+        self.assertEqual(pdf[offset : offset + 5], b"xref\n")
+
+    def test_output_is_deterministic(self):
+        self.assertEqual(self._render(), self._render())
+
+
+@override_settings(DOCUMENT_SERIES={"prueba": {"prefijo": "T-", "digitos": 4, "bloque": 5}})
+class DocumentNumberTableTests(TransactionTestCase):
+    """Reserva por bloques con la tabla ``contadores_documento`` (motores sin secuencias)."""
+
+    HILOS = 4
+    POR_HILO = 40
+
+    def test_threads_never_receive_the_same_number(self):
+        allocator = DocumentNumberAllocator()
+        barrera = threading.Barrier(self.HILOS)
+        valores, errores = [], []
+
+        def siguiente():
+            # La base de pruebas de SQLite en memoria usa caché compartida, que
+            # responde "table is locked" en vez de esperar; la reserva fallida
+            # no deja nada en memoria, así que se reintenta.
+            while True:
+                try:
+                    return allocator.next_value("prueba")
+                except OperationalError as exc:
+                    if "locked" not in str(exc):
+                        raise
+
+        def trabajar():
+            try:
+                barrera.wait()
+                valores.extend(siguiente() for _ in range(self.POR_HILO))
+            except Exception as exc:  # se reporta desde el hilo principal
+                errores.append(exc)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(valores), self.HILOS * self.POR_HILO)
+        self.assertEqual(len(set(valores)), len(valores))
+
+    def test_block_reserved_in_rolled_back_transaction_is_discarded(self):
+        propio, ajeno = DocumentNumberAllocator(), DocumentNumberAllocator()
+        with transaction.atomic():
+            revertido = propio.next_value("prueba")
+            transaction.set_rollback(True)
+
+        # El contador volvió atrás: otro worker recibe de nuevo ese bloque.
+        entregados = {ajeno.next_value("prueba") for _ in range(5)}
+        self.assertIn(revertido, entregados)
+        self.assertNotIn(propio.next_value("prueba"), entregados)
+
+    def test_block_reserved_in_rolled_back_savepoint_is_discarded(self):
+        propio, ajeno = DocumentNumberAllocator(), DocumentNumberAllocator()
+        with transaction.atomic():
+            with transaction.atomic():
+                revertido = propio.next_value("prueba")
+                transaction.set_rollback(True)
+            entregados = {ajeno.next_value("prueba") for _ in range(5)}
+            self.assertIn(revertido, entregados)
+            self.assertNotIn(propio.next_value("prueba"), entregados)
+
+    def test_block_reserved_in_committed_transaction_is_kept(self):
+        allocator = DocumentNumberAllocator()
+        with transaction.atomic():
+            primero = allocator.next_value("prueba")
+        self.assertEqual(allocator.next_value("prueba"), primero + 1)
+
+
+class KeysetPaginationTests(TestCase):
+    """``paginate_keyset`` sobre ``pagos_venta`` (tabla administrada, sin tablas heredadas)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        base = timezone.now().replace(microsecond=0)
+        # Montos y clientes repetidos, clientes NULL y fechas que sólo difieren
+        # en microsegundos: todos los casos de empate del cursor.
+        filas = [
+            (1, Decimal("10.10"), 0),
+            (1, Decimal("10.10"), 1),
+            (None, Decimal("5.00"), 2),
+            (2, Decimal("20.00"), 999999),
+            (None, Decimal("10.10"), 3),
+            (3, Decimal("5.00"), 1),
+            (2, Decimal("0.01"), 4),
+        ]
+        for cliente_id, monto, micro in filas:
+            PagoVenta.objects.create(
+                venta_id=1, cliente_id=cliente_id, monto=monto, fecha=base + timedelta(microseconds=micro)
+            )
+
+    def _recorrer(self, qs, ordering, limit):
+        filas, cursor, paginas = [], None, 0
+        while True:
+            pagina, cursor = paginate_keyset(qs, ordering, cursor=cursor, limit=limit)
+            filas.extend(pagina)
+            paginas += 1
+            self.assertLessEqual(paginas, qs.count() + 1)
+            if cursor is None:
+                return filas
+
+    def _esperado(self, filas, ordering):
+        # Orden de referencia en Python: NULLs al final en ambos sentidos.
+        for field in reversed(ordering):
+            name = field.lstrip("-")
+            presentes = sorted(
+                (fila for fila in filas if fila[name] is not None),
+                key=lambda fila: fila[name],
+                reverse=field.startswith("-"),
+            )
+            filas = presentes + [fila for fila in filas if fila[name] is None]
+        return filas
+
+    def test_every_row_once_for_each_ordering(self):
+        qs = PagoVenta.objects.values("pago_id", "cliente_id", "monto", "fecha")
+        for ordering in (
+            ("-monto", "pago_id"),
+            ("fecha", "pago_id"),
+            ("-fecha", "-pago_id"),
+            ("cliente_id", "-monto", "pago_id"),
+            ("-cliente_id", "pago_id"),
+        ):
+            esperado = [fila["pago_id"] for fila in self._esperado(list(qs), ordering)]
+            for limit in (1, 2, 3, len(esperado)):
+                with self.subTest(ordering=ordering, limit=limit):
+                    filas = self._recorrer(qs, ordering, limit)
+                    self.assertEqual([fila["pago_id"] for fila in filas], esperado)
+
+    def test_grouped_queryset_uses_having(self):
+        qs = PagoVenta.objects.filter(cliente_id__isnull=False).values("cliente_id").annotate(total=Sum("monto"))
+        ordering = ("-total", "cliente_id")
+        _pagina, cursor = paginate_keyset(qs, ordering, limit=1)
+        with CaptureQueriesContext(connection) as consultas:
+            paginate_keyset(qs, ordering, cursor=cursor, limit=1)
+        self.assertIn("HAVING", consultas[0]["sql"])
+        filas = self._recorrer(qs, ordering, limit=1)
+        # Clientes 1 y 2 empatan en 20.20 y 20.01: el desempate es cliente_id.
+        self.assertEqual(
+            [(fila["cliente_id"], fila["total"]) for fila in filas],
+            [(1, Decimal("20.20")), (2, Decimal("20.01")), (3, Decimal("5.00"))],
+        )
+
+    def test_cursor_round_trips_decimal_and_microseconds(self):
+        fecha = timezone.now().replace(microsecond=123456)
+        valores = decode_cursor(encode_cursor([Decimal("10.10"), fecha, None, 7]), 4)
+        self.assertEqual(valores, ["10.10", fecha.isoformat(), None, 7])
+
+        qs = PagoVenta.objects.values("pago_id", "fecha")
+        primera, cursor = paginate_keyset(qs, ("fecha", "pago_id"), limit=3)
+        segunda, _cursor = paginate_keyset(qs, ("fecha", "pago_id"), cursor=cursor, limit=3)
+        # La página siguiente empieza un microsegundo después del cursor.
+        self.assertEqual(segunda[0]["fecha"] - primera[-1]["fecha"], timedelta(microseconds=1))
+
+    def test_malformed_cursor_starts_from_the_first_page(self):
+        qs = PagoVenta.objects.values("pago_id")
+        primera, _cursor = paginate_keyset(qs, ("pago_id",), limit=3)
+        for cursor in ("%%%", "no-es-base64!", encode_cursor([1, 2]), "eyJhIjoxfQ", ""):
+            with self.subTest(cursor=cursor):
+                pagina, _siguiente = paginate_keyset(qs, ("pago_id",), cursor=cursor, limit=3)
+                self.assertEqual(pagina, primera)
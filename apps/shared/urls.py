@@ -1,8 +1,12 @@
 from django.urls import path
 from django.views.generic import TemplateView
 
+from . import views
+
 app_name = "shared"
 
 urlpatterns = [
     path("health/", TemplateView.as_view(template_name="core/health.html"), name="health"),
+    path("exportaciones/<str:job_id>/", views.export_job_status, name="export_job_status"),
+    path("exportaciones/<str:job_id>/descargar/", views.export_job_download, name="export_job_download"),
 ]
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _key(namespace: str) -> str:
+    return f"data-version:{namespace}"
+
+
+def get_data_version(namespace: str) -> int:
+    """
+    Versión actual de un conjunto de datos ("productos", "ventas", "compras"...).
+    Los servicios la incrementan cada vez que escriben, de modo que sirve como
+    parte de las claves de caché derivadas de esas tablas.
+    """
+    return cache.get_or_set(_key(namespace), 1, timeout=None)
+
+
+def get_data_versions(*namespaces: str) -> dict:
+    keys = {_key(ns): ns for ns in namespaces}
+    found = cache.get_many(list(keys))
+    return {ns: found.get(key, 1) for key, ns in keys.items()}
+
+
+def _bump(namespaces) -> None:
+    for namespace in namespaces:
+        try:
+            cache.incr(_key(namespace))
+        except ValueError:
+            cache.set(_key(namespace), 2, timeout=None)
+
+
+def bump_data_version(*namespaces: str) -> None:
+    """
+    Incrementa la versión al confirmar la transacción en curso (o de
+    inmediato si no hay ninguna), para no invalidar cachés por escrituras
+    que terminan revirtiéndose.
+    """
+    transaction.on_commit(lambda: _bump(namespaces))
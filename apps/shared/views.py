@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, HttpRequest, JsonResponse
+from django.urls import reverse
+
+from .export_jobs import artifact_path, get_export, get_job, submit_export
+
+
+def job_payload(job: dict) -> dict:
+    data = {
+        "job_id": job["job_id"],
+        "estado": job["estado"],
+        "formato": job["formato"],
+        "cacheado": job.get("cacheado", False),
+        "status_url": reverse("shared:export_job_status", kwargs={"job_id": job["job_id"]}),
+        "download_url": None,
+    }
+    if job["estado"] == "listo":
+        data["download_url"] = reverse("shared:export_job_download", kwargs={"job_id": job["job_id"]})
+    if job.get("error"):
+        data["error"] = job["error"]
+    return data
+
+
+def _forbidden(request: HttpRequest, job: dict | None):
+    if not job:
+        return JsonResponse({"success": False, "message": "Trabajo no encontrado"}, status=404)
+    definition = get_export(job["export"])
+    if not definition or request.session.get("rol") not in definition.roles:
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    return None
+
+
+def start_export_job(request: HttpRequest, name: str, params: dict, fmt: str) -> JsonResponse:
+    """
+    Encola una exportación registrada y devuelve el id del trabajo y su URL
+    de estado. Usado por las vistas "exportar ... /trabajo/" de cada app.
+    """
+    definition = get_export(name)
+    if not definition or request.session.get("rol") not in definition.roles:
+        return JsonResponse({"success": False, "message": "Acceso denegado."}, status=403)
+    job = submit_export(name, params, fmt)
+    return JsonResponse({"success": True, "data": job_payload(job)}, status=202)
+
+
+@login_required
+def export_job_status(request: HttpRequest, job_id: str) -> JsonResponse:
+    job = get_job(job_id)
+    denied = _forbidden(request, job)
+    if denied:
+        return denied
+    return JsonResponse({"success": True, "data": job_payload(job)})
+
+
+@login_required
+def export_job_download(request: HttpRequest, job_id: str):
+    job = get_job(job_id)
+    denied = _forbidden(request, job)
+    if denied:
+        return denied
+    path = artifact_path(job)
+    if not path:
+        return JsonResponse({"success": False, "message": "El archivo aún no está disponible"}, status=409)
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=job.get("nombre_descarga") or path.name)
@@ -131,6 +131,22 @@ else:
         }
     }
 
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+# El backend por archivos se comparte entre los workers de gunicorn de una
+# misma máquina (LocMemCache no), lo que importa para las versiones de datos
+# y el estado de las exportaciones en segundo plano.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", str(BASE_DIR / ".cache")),
+    }
+}
+
 # ---------------------------------------------------------------------------
 # Authentication
 # ---------------------------------------------------------------------------
@@ -173,6 +189,13 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Umbral (inclusive) para considerar un producto con bajo stock
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+
+# Exportaciones XLSX/CSV en segundo plano (apps.shared.export_jobs)
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORTS_DIR = MEDIA_ROOT / "exports"
+
 # ---------------------------------------------------------------------------
 # REST & API defaults (DRF mirrors existing Flask API behaviour)
 # ---------------------------------------------------------------------------
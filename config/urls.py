@@ -13,6 +13,7 @@ urlpatterns = [
     path("ventas/", include(("apps.sales.urls", "sale_html"), namespace="sale_html")),
     path("medical/", include(("apps.medical.urls", "medical"), namespace="medical")),
     path("api/", include(("apps.api.urls", "api"), namespace="api")),
+    path("shared/", include(("apps.shared.urls", "shared"), namespace="shared")),
 ]
 
 legacy_medical_api_patterns = [
@@ -24,10 +25,15 @@ legacy_medical_api_patterns = [
         "api/pacientes-medicos/<int:paciente_id>/consultas/",
         medical_api_views.api_paciente_consultas,
     ),
+    path(
+        "api/pacientes-medicos/<int:paciente_id>/historial/",
+        medical_api_views.api_paciente_historial,
+    ),
     path("api/consultas/", medical_api_views.api_consultas),
     path("api/clientes/<int:cliente_id>/", medical_api_views.api_get_cliente),
     path("api/fichas-clinicas/", medical_api_views.api_fichas_clinicas),
     path("api/fichas-clinicas/<int:ficha_id>/", medical_api_views.api_ficha_clinica_by_id),
+    path("api/fichas-clinicas/examenes/", medical_api_views.api_examenes_lote),
     path(
         "api/fichas-clinicas/<int:ficha_id>/examenes/",
         medical_api_views.api_examenes_por_ficha,
@@ -0,0 +1,47 @@
+/*
+ * Exportaciones en segundo plano: solicita el trabajo, consulta su estado
+ * cada cierto tiempo y descarga el archivo cuando está listo.
+ */
+(function (window) {
+    function getCookie(name) {
+        const match = document.cookie.match(new RegExp('(^|;\\s*)' + name + '=([^;]*)'));
+        return match ? decodeURIComponent(match[2]) : '';
+    }
+
+    function poll(statusUrl, intervalMs, resolve, reject) {
+        fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(payload => {
+                if (!payload.success) throw new Error(payload.message || 'Error');
+                const job = payload.data;
+                if (job.estado === 'listo') return resolve(job);
+                if (job.estado === 'error') throw new Error(job.error || 'Error al generar el archivo');
+                setTimeout(() => poll(statusUrl, intervalMs, resolve, reject), intervalMs);
+            })
+            .catch(reject);
+    }
+
+    // ``opts.params`` (objeto o URLSearchParams) viaja como formulario en el cuerpo del POST.
+    window.solicitarExportacion = function (url, options) {
+        const opts = Object.assign({ intervalMs: 1500, onEstado: null, params: null }, options || {});
+        return fetch(url, {
+            method: 'POST',
+            headers: { 'Accept': 'application/json', 'X-CSRFToken': getCookie('csrftoken') },
+            body: new URLSearchParams(opts.params || {}),
+        })
+            .then(response => {
+                if (!response.ok) throw new Error('Error');
+                return response.json();
+            })
+            .then(payload => {
+                if (!payload.success) throw new Error(payload.message || 'Error');
+                if (opts.onEstado) opts.onEstado(payload.data);
+                if (payload.data.estado === 'listo') return payload.data;
+                return new Promise((resolve, reject) => poll(payload.data.status_url, opts.intervalMs, resolve, reject));
+            })
+            .then(job => {
+                window.location.href = job.download_url;
+                return job;
+            });
+    };
+})(window);